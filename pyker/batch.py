@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2011 Björn Edström <be@bjrn.se>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the University nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE REGENTS AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE REGENTS OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+
+""" vectorized evaluation of many hands at once, using numpy.
+
+Hands are given as an (N, 5), (N, 6) or (N, 7) integer array of card
+codes (see pyker.poker.Card.code) and scored on the same scale as
+pyker.poker.HandClass.score(), by doing the table lookups of
+pyker.evaluator on whole columns at a time.
+
+Large inputs are processed in chunks of rows, so memory use beyond
+the input and output arrays is bounded by the chunk size. Both may be
+numpy.memmap arrays, which makes it possible to score files that do
+not fit in memory.
+"""
+
+import itertools
+
+import numpy
+
+import pyker.evaluator as evaluator
+
+
+# Rows processed at a time. The temporaries are a few dozen bytes per
+# card per row.
+CHUNK_SIZE = 1 << 16
+
+_tables = None
+
+def _numpy_tables():
+    global _tables
+    if _tables is None:
+        t = evaluator.tables()
+        _tables = dict(
+            rows=numpy.array(t['rows'], dtype=numpy.int64),
+            columns=numpy.array(t['columns'], dtype=numpy.int64),
+            rank_table=numpy.array(t['rank_table'], dtype=numpy.int32),
+            flush_table=numpy.array(t['flush_table'], dtype=numpy.int32),
+            flush_suit=numpy.array(t['flush_suit'], dtype=numpy.int8),
+            rank_key=numpy.array(t['rank_key'], dtype=numpy.int64),
+            rank_bit=numpy.array(t['rank_bit'], dtype=numpy.int32),
+            suit_key=numpy.array(t['suit_key'], dtype=numpy.int32),
+            card_mask=numpy.array(t['card_mask'], dtype=numpy.int64),
+            low=t['low'],
+            )
+    return _tables
+
+
+def _evaluate_chunk(cards, out):
+    t = _numpy_tables()
+    cards = numpy.asarray(cards, dtype=numpy.intp)
+
+    # The rank histogram, packed as a base-5 number.
+    key = t['rank_key'][cards].sum(axis=1)
+    out[:] = t['rank_table'][t['rows'][key // t['low']] +
+                             t['columns'][key % t['low']]]
+
+    # The suit histogram, three bits per suit.
+    suit = t['flush_suit'][t['suit_key'][cards].sum(axis=1)]
+    flush = suit >= 0
+    if flush.any():
+        cards = cards[flush]
+        in_suit = (cards & 3) == suit[flush][:, numpy.newaxis]
+        # There is one card per rank in a suit, so the sum is the
+        # bitwise or.
+        bits = (t['rank_bit'][cards] * in_suit).sum(axis=1)
+        out[flush] = t['flush_table'][bits]
+
+
+def evaluate(cards, categories=False, out=None, chunk_size=CHUNK_SIZE):
+    """Score many hands.
+
+    :param cards: hands to score, one per row, five to seven card
+      codes each.
+    :type cards: (N, k) integer array-like.
+    :param categories: also return the hand categories.
+    :type categories: bool.
+    :param out: optional array to write the scores to.
+    :type out: (N,) int32 array.
+    :param chunk_size: number of rows to process at a time.
+    :type chunk_size: int.
+    :returns: (N,) int32 array of scores, same as HandClass.score(),
+      or a tuple (scores, categories) where categories is an (N,)
+      int8 array of HandClass.SCORE (pyker.evaluator.HIGHEST to
+      pyker.evaluator.STRAIGHT_FLUSH) if categories is True.
+    """
+
+    if not hasattr(cards, 'shape'):
+        cards = numpy.asarray(cards)
+
+    if len(cards.shape) != 2 or not 5 <= cards.shape[1] <= 7:
+        raise ValueError('expected an (N, 5), (N, 6) or (N, 7) array, got shape %s' % (cards.shape,))
+
+    n = cards.shape[0]
+    if out is None:
+        out = numpy.empty(n, dtype=numpy.int32)
+
+    for start in xrange(0, n, chunk_size):
+        _evaluate_chunk(cards[start:start + chunk_size],
+                        out[start:start + chunk_size])
+
+    if categories:
+        return out, (out // evaluator.CATEGORY_BASE).astype(numpy.int8)
+    return out
+
+
+def iter_evaluate(chunks, categories=False):
+    """Score a stream of hands, for example read from a file, in
+    bounded memory.
+
+    :param chunks: iterable of (n, k) arrays, see evaluate().
+    :param categories: yield categories as well, see evaluate().
+    :returns: Yields the result of evaluate() for each chunk.
+    """
+
+    for chunk in chunks:
+        yield evaluate(chunk, categories=categories)
+
+
+class Boards(object):
+    """Every board of five cards, summarized to score hole cards
+    against all of them at once.
+
+    Non-flush scores only depend on the ranks of the board, and there
+    are only 6175 distinct ranks of boards, so those are scored once
+    per hole cards and looked up for each board. Flushes need three
+    cards of a suit on the board, and only those boards are scored
+    with the suits.
+
+    The summaries take about 50 MB.
+    """
+
+    def __init__(self):
+        t = _numpy_tables()
+        n = 2598960
+        cards = numpy.fromiter(itertools.chain.from_iterable(
+            itertools.combinations(xrange(52), 5)), dtype=numpy.intp, count=5 * n)
+        cards = cards.reshape(n, 5)
+
+        self.mask = t['card_mask'][cards].sum(axis=1)
+        self.keys, ranks = numpy.unique(t['rank_key'][cards].sum(axis=1),
+                                        return_inverse=True)
+        self.ranks = ranks.astype(numpy.int16)
+        # Cards of each rank, per distinct board ranks.
+        self.rank_counts = (self.keys[:, numpy.newaxis] //
+                            5 ** numpy.arange(13, dtype=numpy.int64)) % 5
+
+        suits = t['suit_key'][cards].sum(axis=1)
+        counts = (suits[:, numpy.newaxis] >> 3 * numpy.arange(4)) & 7
+        self.suited = numpy.flatnonzero(counts.max(axis=1) >= 3)
+        self.suited_suits = suits[self.suited]
+        self.suited_mask = self.mask[self.suited]
+
+    def scores(self, hole):
+        """Score hole cards with every board. The score is -1 where
+        the board is impossible because it has more than four cards of
+        a rank, other boards that share a card with the hole cards are
+        scored as if they did not.
+
+        :param hole: card codes.
+        :returns: (2598960,) int32 array, in the order of
+          itertools.combinations(xrange(52), 5).
+        """
+
+        t = _numpy_tables()
+        hole = numpy.asarray(hole, dtype=numpy.intp)
+
+        keys = self.keys + t['rank_key'][hole].sum()
+        hole_counts = numpy.bincount(hole >> 2, minlength=13)
+        possible = ((self.rank_counts + hole_counts) <= 4).all(axis=1)
+        by_ranks = numpy.empty(len(keys), dtype=numpy.int32)
+        by_ranks[:] = -1
+        keys = keys[possible]
+        by_ranks[possible] = t['rank_table'][t['rows'][keys // t['low']] +
+                                             t['columns'][keys % t['low']]]
+        out = by_ranks[self.ranks]
+
+        suit = t['flush_suit'][self.suited_suits + t['suit_key'][hole].sum()]
+        flush = suit >= 0
+        suit = suit[flush].astype(numpy.int64)
+        mask = self.suited_mask[flush] | t['card_mask'][hole].sum()
+        out[self.suited[flush]] = t['flush_table'][(mask >> 13 * suit) & 0x1fff]
+        return out
+
+    def counts(self, hole_a, hole_b):
+        """Return the boards won and tied by hole_a against hole_b,
+        of the boards that share no card with them.
+        """
+
+        t = _numpy_tables()
+        dead = t['card_mask'][numpy.asarray(list(hole_a) + list(hole_b), dtype=numpy.intp)].sum()
+        valid = (self.mask & dead) == 0
+        a = self.scores(hole_a)
+        b = self.scores(hole_b)
+        return (int(numpy.count_nonzero(valid & (a > b))),
+                int(numpy.count_nonzero(valid & (a == b))))
+
+
+_boards = None
+
+def heads_up_counts(hole_a, hole_b):
+    """Return the runouts won and tied by hole_a against hole_b, with
+    no cards on the board. The first call builds a Boards (about
+    50 MB).
+
+    :param hole_a: two card codes.
+    :param hole_b: two card codes.
+    :returns: (wins, ties)
+    """
+
+    global _boards
+    if _boards is None:
+        _boards = Boards()
+    return _boards.counts(hole_a, hole_b)
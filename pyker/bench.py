@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2011 Björn Edström <be@bjrn.se>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the University nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE REGENTS AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE REGENTS OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+
+""" benchmarks of the hot paths: hand evaluation, pots and the game
+state machine.
+
+Each scenario sets up its input from a seeded random generator, so
+runs are comparable, and is timed without the setup. Scenarios run in
+a child process each, so the peak memory reported is their own. See
+scripts/pyker-bench for the command line interface.
+"""
+
+import gc
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import time
+
+import pyker.evaluator as evaluator
+import pyker.game as game
+import pyker.poker as poker
+import pyker.pots as pots
+import pyker.sim as sim
+
+
+log = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+# (name, description, setup function)
+SCENARIOS = []
+
+
+def scenario(name, description):
+    """Register a scenario. The decorated function is called as f(rng,
+    scale) and returns (number of operations, run function).
+    """
+
+    def register(f):
+        SCENARIOS.append((name, description, f))
+        return f
+    return register
+
+
+@scenario('eval5', 'evaluator.evaluate5 on random 5 card hands')
+def _eval5(rng, scale):
+    hands = [rng.sample(xrange(52), 5) for _ in xrange(int(200000 * scale))]
+    def run():
+        evaluate5 = evaluator.evaluate5
+        for hand in hands:
+            evaluate5(hand)
+    return len(hands), run
+
+
+@scenario('hand-score', 'Hand.score on random 5 card Hands')
+def _hand_score(rng, scale):
+    # Hands cache their score, so new Hands are made for every run.
+    deals = [rng.sample(poker.CARDS, 5) for _ in xrange(int(100000 * scale))]
+    def run():
+        Hand = poker.Hand
+        for cards in deals:
+            Hand(cards).score()
+    return len(deals), run
+
+
+@scenario('eval7', 'evaluator.evaluate7 on random 7 card hands')
+def _eval7(rng, scale):
+    hands = [rng.sample(xrange(52), 7) for _ in xrange(int(200000 * scale))]
+    def run():
+        evaluate7 = evaluator.evaluate7
+        for hand in hands:
+            evaluate7(hand)
+    return len(hands), run
+
+
+@scenario('best-from-seven', 'Hand.best_from_seven on random 7 Cards')
+def _best_from_seven(rng, scale):
+    hands = [rng.sample(poker.CARDS, 7) for _ in xrange(int(20000 * scale))]
+    def run():
+        for hand in hands:
+            poker.Hand.best_from_seven(*hand)
+    return len(hands), run
+
+
+@scenario('enum5', 'evaluator.evaluate5 on all 2,598,960 5 card hands (ignores scale)')
+def _enum5(rng, scale):
+    def run():
+        evaluate5 = evaluator.evaluate5
+        for hand in itertools.combinations(xrange(52), 5):
+            evaluate5(hand)
+    return 2598960, run
+
+
+class _PS(object):
+    def __init__(self, chips):
+        self.chips = chips
+
+
+def _pots_scenario(players):
+    def setup(rng, scale):
+        # Everyone shoves in turn with a random stack, so most posts
+        # cascade over several side pots.
+        tables = [[rng.randint(1, 100) * 10 for _ in xrange(players)]
+                  for _ in xrange(int(20000 * scale / players))]
+        def run():
+            for stacks in tables:
+                p = pots.Pots()
+                for chips in stacks:
+                    p.post(_PS(chips), 1000)
+                list(p.list())
+        return len(tables) * players, run
+    return setup
+
+for _n in (2, 6, 10):
+    scenario('pots%d' % _n, 'Pots.post with %d players going all in' % _n)(_pots_scenario(_n))
+
+
+@scenario('game', 'headless hands through the Game state machine, 4 players calling')
+def _game(rng, scale):
+    hands = int(2000 * scale)
+    random.seed(rng.random())
+
+    t = game.Table(4)
+    g = game.Game(t, game.GameRules(), sink=None)
+    g.set_blinds(20, 10)
+    strategies = {}
+    for i in xrange(4):
+        ps = game.PlayerState(game.Player('p%d' % i), 10**9)
+        t.join(i, ps)
+        strategies[ps] = sim.calling_station
+
+    def run():
+        sim.play(g, strategies, hands)
+    return hands, run
+
+
+@scenario('sim', 'headless hands between 6 random bots')
+def _sim(rng, scale):
+    hands = int(2000 * scale)
+    random.seed(rng.random())
+
+    t = game.Table(6)
+    g = game.Game(t, game.GameRules(), sink=None)
+    g.set_blinds(20, 10)
+    strategies = {}
+    for i in xrange(6):
+        ps = game.PlayerState(game.Player('p%d' % i), 10**6)
+        t.join(i, ps)
+        strategies[ps] = sim.random_strategy(random.Random(rng.random()))
+
+    def run():
+        sim.play(g, strategies, hands)
+    return hands, run
+
+
+def _run_child(conn, f, seed, scale, repeat):
+    try:
+        ops, run = f(random.Random(seed), scale)
+        best = None
+        for _ in xrange(repeat):
+            gc.collect()
+            start = time.time()
+            run()
+            elapsed = time.time() - start
+            best = elapsed if best is None else min(best, elapsed)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        conn.send({'ops': ops, 'seconds': best,
+                   'ops_per_sec': ops / best if best else None,
+                   'peak_rss_kb': peak})
+    except Exception, e:
+        log.exception('scenario failed')
+        conn.send({'error': str(e)})
+    conn.close()
+
+
+def run_scenario(name, seed=0, scale=1.0, repeat=3):
+    """Run a scenario in a child process.
+
+    :returns: dict with 'ops', 'seconds' (best of the repeats),
+      'ops_per_sec' and 'peak_rss_kb', or 'error'.
+    """
+
+    f = dict((n, f) for n, _, f in SCENARIOS)[name]
+    parent, child = multiprocessing.Pipe(duplex=False)
+    p = multiprocessing.Process(target=_run_child,
+                                args=(child, f, seed, scale, repeat))
+    p.start()
+    child.close()
+    try:
+        result = parent.recv()
+    except EOFError:
+        result = {'error': 'scenario process died'}
+    p.join()
+    return result
+
+
+def run(names=None, seed=0, scale=1.0, repeat=3):
+    """Run scenarios (all if names is None).
+
+    :returns: the results as a dict, as saved by save().
+    """
+
+    names = names or [name for name, _, _ in SCENARIOS]
+    results = {}
+    for name in names:
+        log.info('running %s', name)
+        results[name] = run_scenario(name, seed, scale, repeat)
+    return {
+        'version': FORMAT_VERSION,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'seed': seed,
+        'scale': scale,
+        'results': results,
+        }
+
+
+def save(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(results, baseline, threshold=0.1):
+    """Compare results to a baseline.
+
+    :param threshold: the relative slowdown in ops/sec which counts
+      as a regression.
+    :returns: list of (name, ops/sec, baseline ops/sec, ratio,
+      regressed) for the scenarios in both.
+    """
+
+    rows = []
+    for name, r in sorted(results['results'].iteritems()):
+        b = baseline['results'].get(name)
+        if not b or not r.get('ops_per_sec') or not b.get('ops_per_sec'):
+            continue
+        ratio = r['ops_per_sec'] / b['ops_per_sec']
+        rows.append((name, r['ops_per_sec'], b['ops_per_sec'], ratio,
+                     ratio < 1.0 - threshold))
+    return rows
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2011 Björn Edström <be@bjrn.se>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the University nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE REGENTS AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE REGENTS OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+
+""" suit isomorphism and a cache of results keyed by it.
+
+Hands that differ only by a permutation of the suits, such as ace
+king of hearts on a flop with two hearts and ace king of spades on
+the same flop with two spades instead, have the same strength,
+equity and so on. canonicalize() maps cards to one representative of
+their class, so results computed for it can be shared by the whole
+class. Of the 22,100 flops, 1,755 are distinct this way.
+
+The cards are given as groups, such as [hole, board] or [hole of
+player 1, hole of player 2, board]: the order of the cards within a
+group does not matter, but which group a card is in does.
+
+IsoCache caches results by the canonical form:
+
+    >>> cache = IsoCache(100000)
+    >>> cache.exact_equity([string_to_cards('ah kh'), string_to_cards('qs qd')],
+    ...                    board=string_to_cards('2h 7h 9c'))
+    >>> cache.hits, cache.misses, cache.evictions
+"""
+
+import collections
+
+import pyker.equity as equity
+import pyker.evaluator as evaluator
+from pyker.poker import CARDS, Hand
+
+
+def _signatures(groups):
+    # The signature of each suit: per group, the bits of the ranks of
+    # its cards of the suit.
+    n = len(groups)
+    sigs = [[0] * n, [0] * n, [0] * n, [0] * n]
+    for i, group in enumerate(groups):
+        for c in group:
+            sigs[c & 3][i] |= 1 << (c >> 2)
+    return [tuple(sig) for sig in sigs]
+
+
+def canonicalize(groups):
+    """Map groups of card codes to the canonical representative of
+    their class under permutations of the suits.
+
+    Each suit gets a signature, the ranks of its cards in each group.
+    Suits are then renamed in order of signature, so suits with equal
+    signatures, which are the only ones that could be renamed in more
+    than one way, are interchangeable anyway.
+
+    :param groups: groups of card codes.
+    :type groups: [[int]].
+    :returns: tuple (key, groups, perm) where key is a hashable
+      canonical form of the groups, groups the canonical card codes,
+      as sorted tuples, and perm a tuple mapping each suit to its
+      canonical suit.
+    """
+
+    sigs = _signatures(groups)
+    order = sorted(xrange(4), key=sigs.__getitem__, reverse=True)
+    perm = [0] * 4
+    for new, old in enumerate(order):
+        perm[old] = new
+    key = tuple([sigs[old] for old in order])
+    canon = tuple([tuple(sorted([(c & ~3) | perm[c & 3] for c in group]))
+                   for group in groups])
+    return key, canon, tuple(perm)
+
+
+def canonical_key(groups):
+    """Like canonicalize(), but only returns the key.
+    """
+
+    return tuple(sorted(_signatures(groups), reverse=True))
+
+
+class LRUCache(object):
+    """A dict like cache of at most maxsize entries, evicting the
+    least recently used entry when full.
+    """
+
+    def __init__(self, maxsize=100000):
+        if maxsize < 1:
+            raise ValueError('maxsize must be positive')
+        self.maxsize = maxsize
+        self.data = collections.OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key, default=None):
+        """Return the value of key and mark it as recently used, or
+        default if key is not in the cache.
+        """
+
+        try:
+            value = self.data.pop(key)
+        except KeyError:
+            self.misses += 1
+            return default
+        self.data[key] = value
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        data = self.data
+        if key in data:
+            del data[key]
+        elif len(data) >= self.maxsize:
+            data.popitem(last=False)
+            self.evictions += 1
+        data[key] = value
+
+    def clear(self):
+        self.data.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return float(self.hits) / lookups if lookups else 0.0
+
+    def stats(self):
+        """Return the counters as a dict.
+        """
+
+        return {'size': len(self.data), 'maxsize': self.maxsize,
+                'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'hit_rate': self.hit_rate}
+
+
+def _codes(cards):
+    return [c.code for c in cards]
+
+
+class IsoCache(LRUCache):
+    """An LRUCache of results keyed by the canonical form of the
+    cards they are computed from.
+    """
+
+    def lookup(self, name, groups, func):
+        """Return the result of func for groups of cards, computing
+        it only if a result for an isomorphic set of groups is not
+        cached already.
+
+        :param name: name of the kind of result, so different kinds
+          of results for the same cards are kept apart.
+        :param groups: groups of Cards.
+        :type groups: [[Card]].
+        :param func: computes the result given the canonical groups
+          of Cards. The result must be the same for every permutation
+          of suits.
+        """
+
+        key, canon, _ = canonicalize([_codes(group) for group in groups])
+        key = (name, key)
+        marker = self.get(key, self)
+        if marker is not self:
+            return marker
+        value = func([[CARDS[c] for c in group] for group in canon])
+        self.put(key, value)
+        return value
+
+    def best_from_seven(self, *cards):
+        """Cached Hand.best_from_seven().
+        """
+
+        assert len(cards) == 7
+
+        key, canon, perm = canonicalize([_codes(cards)])
+        key = ('best', key)
+        best = self.get(key)
+        if best is None:
+            best = evaluator.best_five(canon[0])
+            self.put(key, best)
+        score, five = best
+        inverse = [0] * 4
+        for old, new in enumerate(perm):
+            inverse[new] = old
+        return Hand([CARDS[(c & ~3) | inverse[c & 3]] for c in five], score)
+
+    def exact_equity(self, holes, board=(), dead=()):
+        """Cached equity.exact_equity(). The result is shared with the
+        caller, and should not be modified.
+        """
+
+        def compute(groups):
+            return equity.exact_equity(groups[:-2], groups[-2], groups[-1])
+        return self.lookup('exact-equity', list(holes) + [board, dead], compute)
@@ -0,0 +1,420 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2011 Björn Edström <be@bjrn.se>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the University nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE REGENTS AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE REGENTS OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+
+""" all-in equity calculation.
+
+For example, the equity of a pair of queens against ace king suited
+on a flop with two hearts:
+
+    >>> r = equity([string_to_cards('qs qd'), string_to_cards('ah kh')],
+    ...            board=string_to_cards('2h 7h 9c'), trials=100000)
+    >>> r.equity, r.interval()
+
+The board is completed at random, and players with unknown hole
+cards (see the opponents parameter) are dealt at random. The trials
+are split in batches which run in a multiprocessing pool. Every batch
+has its own random stream derived from the seed and the batch number,
+so a given seed and batch_size give the same result whatever the
+number of processes.
+
+With omaha=True, the players have four or five hole cards and play
+Omaha instead.
+
+exact_equity() instead enumerates every runout of the board, and
+returns the same kind of result.
+"""
+
+import hashlib
+import itertools
+import logging
+import math
+import multiprocessing
+import os
+import random
+
+import pyker.evaluator as evaluator
+import pyker.omaha
+from pyker.poker import CARDS
+
+
+log = logging.getLogger(__name__)
+
+
+class EquityResult(object):
+    """The outcome of an equity calculation, per player.
+
+    The results are kept as sums over the trials (or, for an exact
+    calculation, the weighted runouts) so partial results can be
+    merged with add().
+    """
+
+    def __init__(self, players, exact=False):
+        self.exact = exact
+        self.trials = 0
+        self.wins = [0] * players
+        self.ties = [0] * players
+        self.shares = [0.0] * players # sum of pot share per trial
+        self.squares = [0.0] * players # sum of squared pot share
+        self.evaluated = 0 # runouts evaluated by exact_equity()
+
+    def add(self, trials, wins, ties, shares, squares):
+        """Add a partial result (as returned by the workers).
+        """
+
+        self.trials += trials
+        for i in xrange(len(self.wins)):
+            self.wins[i] += wins[i]
+            self.ties[i] += ties[i]
+            self.shares[i] += shares[i]
+            self.squares[i] += squares[i]
+
+    @property
+    def win(self):
+        """Fraction of trials won outright, per player."""
+        return [float(w) / self.trials for w in self.wins]
+
+    @property
+    def tie(self):
+        """Fraction of trials tied for the pot, per player."""
+        return [float(t) / self.trials for t in self.ties]
+
+    @property
+    def equity(self):
+        """Expected share of the pot, per player."""
+        return [s / self.trials for s in self.shares]
+
+    @property
+    def stderr(self):
+        """Standard error of the equity, per player. Zero for an exact
+        calculation.
+        """
+
+        if self.exact:
+            return [0.0] * len(self.shares)
+
+        n = self.trials
+        if n < 2:
+            return [float('inf')] * len(self.shares)
+        return [math.sqrt(max(0.0, (sq - s * s / n) / (n - 1)) / n)
+                for s, sq in zip(self.shares, self.squares)]
+
+    def interval(self, z=1.96):
+        """Confidence interval of the equity, per player.
+
+        :param z: number of standard errors, the default gives a 95%
+          interval.
+        :returns: [(low, high)]
+        """
+
+        return [(max(0.0, e - z * se), min(1.0, e + z * se))
+                for e, se in zip(self.equity, self.stderr)]
+
+    def __repr__(self):
+        return '<EquityResult trials=%s equity=%s>' % (
+            self.trials, ' '.join('%.4f' % e for e in self.equity))
+
+
+def _stream_seed(seed, stream):
+    # Derive independent seeds for the random streams of the batches.
+    return int(hashlib.sha1('%d:%d' % (seed, stream)).hexdigest(), 16)
+
+
+def _award(scores, tally):
+    # Update tally, which is (wins, ties, shares, squares, weight),
+    # with the outcome of a runout where the players' hands scored
+    # scores.
+    wins, ties, shares, squares, weight = tally
+    best = max(scores)
+    winners = [i for i, s in enumerate(scores) if s == best]
+    if len(winners) == 1:
+        i = winners[0]
+        wins[i] += weight
+        shares[i] += weight
+        squares[i] += weight
+    else:
+        share = 1.0 / len(winners)
+        for i in winners:
+            ties[i] += weight
+            shares[i] += weight * share
+            squares[i] += weight * share * share
+
+
+def _simulate(args):
+    holes, board, stub, opponents, size, omaha, trials, seed, stream = args
+
+    rng = random.Random(_stream_seed(seed, stream))
+    players = len(holes) + opponents
+    tally = ([0] * players, [0] * players, [0.0] * players,
+             [0.0] * players, 1)
+
+    need = 5 - len(board)
+    dealt = need + size * opponents
+    for _ in xrange(trials):
+        cards = rng.sample(stub, dealt)
+        hands = holes + [cards[i:i + size]
+                         for i in xrange(need, dealt, size)]
+        full_board = board + cards[:need]
+        if omaha:
+            _award(pyker.omaha.evaluate_many(hands, full_board), tally)
+        else:
+            _award([evaluator.evaluate7(hand + full_board) for hand in hands], tally)
+
+    return (trials,) + tally[:4]
+
+
+def _batch_size(trials, processes):
+    # At least four batches per process, so that all of them are busy
+    # and the work stays balanced, but not so small that handing out
+    # batches costs more than running them.
+    return max(1000, trials // (processes * 4))
+
+
+def _codes(cards):
+    return [c.code for c in cards]
+
+
+def _setup(holes, board, dead, opponents, size=2):
+    holes = [_codes(hole) for hole in holes]
+    board = _codes(board)
+    known = sum(holes, []) + board + _codes(dead)
+
+    if len(set(known)) != len(known):
+        raise ValueError('the same card is given more than once')
+    if any(len(hole) != size for hole in holes):
+        raise ValueError('hole cards must be %d cards' % (size,))
+    if len(board) > 5:
+        raise ValueError('the board has at most five cards')
+    if len(holes) + opponents < 2:
+        raise ValueError('at least two players are needed')
+
+    stub = [code for code in xrange(52) if code not in known]
+    if len(stub) < 5 - len(board) + size * opponents:
+        raise ValueError('not enough cards left in the deck')
+
+    return holes, board, stub
+
+
+def equity(holes, board=(), dead=(), opponents=0, trials=100000,
+           target_stderr=None, seed=None, processes=None,
+           batch_size=None, omaha=False):
+    """Estimate the all-in equity of each player by Monte Carlo
+    simulation.
+
+    :param holes: the hole cards of the players with known hands.
+    :type holes: [[Card]].
+    :param board: the community cards dealt so far.
+    :type board: [Card].
+    :param dead: other cards known to be out of the deck.
+    :type dead: [Card].
+    :param opponents: number of additional players with random hole
+      cards. These come after the known hands in the result.
+    :type opponents: int.
+    :param trials: maximum number of trials.
+    :type trials: int.
+    :param target_stderr: stop early once the standard error of every
+      player's equity is at most this.
+    :type target_stderr: float.
+    :param seed: seed for the random streams. A random seed is used
+      if not given.
+    :type seed: int.
+    :param processes: number of worker processes. Defaults to the
+      number of CPUs, 1 runs in this process.
+    :type processes: int.
+    :param batch_size: trials per batch handed to a worker. Defaults
+      to about a quarter of each process's share of the trials, so
+      every process gets work.
+    :type batch_size: int.
+    :param omaha: play Omaha instead of Texas Hold'em. The hole cards
+      are then four or five cards, the same number for everyone,
+      including the opponents (four if there are only opponents), and
+      the hands use exactly two of them. See pyker.omaha.
+    :type omaha: bool.
+    :returns: EquityResult.
+    """
+
+    if omaha:
+        size = len(holes[0]) if holes else 4
+        if size not in (4, 5):
+            raise ValueError('Omaha hole cards must be four or five cards')
+    else:
+        size = 2
+    holes, board, stub = _setup(holes, board, dead, opponents, size)
+
+    if seed is None:
+        seed = random.SystemRandom().getrandbits(64)
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    if batch_size is None:
+        batch_size = _batch_size(trials, processes)
+
+    def batches():
+        for stream, start in enumerate(xrange(0, trials, batch_size)):
+            yield (holes, board, stub, opponents, size, omaha,
+                   min(batch_size, trials - start), seed, stream)
+
+    result = EquityResult(len(holes) + opponents)
+
+    pool = None
+    if processes > 1:
+        pool = multiprocessing.Pool(processes)
+        partials = pool.imap(_simulate, batches())
+    else:
+        partials = (_simulate(args) for args in batches())
+
+    try:
+        for partial in partials:
+            result.add(*partial)
+            if target_stderr is not None and \
+                    max(result.stderr) <= target_stderr:
+                log.debug('target stderr reached after %s trials', result.trials)
+                break
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+    return result
+
+
+def _suit_classes(groups):
+    """Return, per suit index, the index of its class of
+    interchangeable suits: suits in which each group of card codes has
+    the same ranks. The permutations of suits that map every group to
+    itself are exactly those that permute suits within their class.
+    """
+
+    signatures = [tuple(frozenset([c >> 2 for c in group if c & 3 == suit])
+                        for group in groups)
+                  for suit in xrange(4)]
+    return [signatures.index(sig) for sig in signatures]
+
+
+def _suit_subsets(stub, suit, most):
+    # The subsets of the cards of suit in stub with up to most cards,
+    # by size, in increasing order of their rank bits. Each is (rank
+    # bits, and the key, suit count and card mask of its state).
+    ranks = [code >> 2 for code in stub if code & 3 == suit]
+    subsets = []
+    for size in xrange(most + 1):
+        subsets.append(sorted(
+            (sum([1 << r for r in combo]),
+             sum([5 ** r for r in combo]),
+             size << (3 * suit),
+             sum([1 << r for r in combo]) << (13 * suit))
+            for combo in itertools.combinations(ranks, size)))
+    return subsets
+
+
+def exact_equity(holes, board=(), dead=()):
+    """Calculate the all-in equity of each player exactly, by
+    enumerating every possible runout of the board.
+
+    Runouts that are the same up to a permutation of suits which
+    leaves every player's hole cards, the board and the dead cards
+    unchanged give the same outcome. Only one runout of each such
+    class is generated, weighted by the size of the class. For
+    example, with ace king of hearts against queen jack of hearts
+    preflop, the clubs, diamonds and spades are interchangeable and
+    about a sixth of the runouts are evaluated.
+
+    :param holes: the hole cards of the players.
+    :type holes: [[Card]].
+    :param board: the community cards dealt so far.
+    :type board: [Card].
+    :param dead: other cards known to be out of the deck.
+    :type dead: [Card].
+    :returns: EquityResult, where trials is the number of runouts and
+      evaluated the number of runouts evaluated.
+    """
+
+    holes, board, stub = _setup(holes, board, dead, 0)
+    need = 5 - len(board)
+
+    # The runout is dealt a suit at a time, one class of suits after
+    # the other. Within a class of interchangeable suits, the rank
+    # bits of the suits dealt must be non-increasing, which picks one
+    # runout of each class.
+    #
+    # Say the m suits of a class get runs of equal rank bits of
+    # lengths r1, r2, ... Then the class of the runout has
+    # m! / (r1! r2! ...) runouts. This weight is built up while
+    # dealing: it is multiplied by the position of each suit in its
+    # class, and divided by the position of the suit in its run.
+    classes = _suit_classes(holes + [board, _codes(dead)])
+    order = sorted(xrange(4), key=classes.__getitem__)
+    classes = [classes[suit] for suit in order]
+    positions = [classes[:i + 1].count(classes[i]) for i in xrange(4)]
+    subsets = [_suit_subsets(stub, suit, need) for suit in order]
+
+    # The state of each player's hole cards and the known board is
+    # computed once, and the state of the runout is built up a suit
+    # at a time, so each runout only costs a merge and a lookup per
+    # player.
+    bases = [evaluator.state(hole + board) for hole in holes]
+    score = evaluator.score_state
+
+    result = EquityResult(len(holes), exact=True)
+    wins, ties, shares, squares = result.wins, result.ties, result.shares, result.squares
+
+    def deal(i, left, key, suits, mask, weight, prev, run):
+        same = i > 0 and classes[i] == classes[i - 1]
+        position = positions[i]
+        last = i == 3
+        for size in ((left,) if last else xrange(left + 1)):
+            for bits, skey, ssuits, smask in subsets[i][size]:
+                if same:
+                    if bits > prev:
+                        break
+                    r = run + 1 if bits == prev else 1
+                else:
+                    r = 1
+                w = weight * position // r
+                if not last:
+                    deal(i + 1, left - size, key + skey, suits + ssuits,
+                         mask | smask, w, bits, r)
+                    continue
+
+                k, st, m = key + skey, suits + ssuits, mask | smask
+                scores = [score((bkey + k, bsuits + st, bmask | m))
+                          for bkey, bsuits, bmask in bases]
+                best = max(scores)
+                if scores.count(best) == 1:
+                    winner = scores.index(best)
+                    wins[winner] += w
+                    shares[winner] += w
+                    squares[winner] += w
+                else:
+                    _award(scores, (wins, ties, shares, squares, w))
+                result.trials += w
+                result.evaluated += 1
+
+    deal(0, need, 0, 0, 0, 1, None, 0)
+
+    return result
@@ -0,0 +1,553 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2011 Björn Edström <be@bjrn.se>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the University nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE REGENTS AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE REGENTS OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+""" table driven hand evaluation on integer card codes.
+
+Cards are given as codes in 0..51 (see pyker.poker.Card.code): code
+// 4 is the rank, 0 for Twos up to 12 for Aces, and code % 4 is the
+suit.
+
+The evaluators return the same integer score as
+pyker.poker.HandClass.score(), so scores from this module and
+HandClass objects can be compared and converted freely.
+"""
+
+import array
+import hashlib
+import itertools
+import logging
+import mmap
+import os
+import struct
+import sys
+
+
+log = logging.getLogger(__name__)
+
+# Hand categories, which are also the most significant "digit" of a
+# score. These are the same as HandClass.SCORE.
+HIGHEST = 0
+PAIR = 1
+TWO_PAIR = 2
+THREE_OF_A_KIND = 3
+STRAIGHT = 4
+FLUSH = 5
+FULL_HOUSE = 6
+FOUR_OF_A_KIND = 7
+STRAIGHT_FLUSH = 8
+
+CATEGORY_BASE = 13**5
+
+
+def category(score):
+    """Return the hand category (HIGHEST...STRAIGHT_FLUSH) of a score.
+    """
+
+    return score // CATEGORY_BASE
+
+
+def _score(cat, ranks):
+    # See HandClass.score(): the category followed by the ranks as
+    # a base-13 number, most significant rank first.
+    score = 0
+    for r in ranks:
+        score = score * 13 + r
+    return cat * CATEGORY_BASE + score
+
+
+def _straight_high(bits):
+    """Given a bitmask of ranks, return the rank of the highest card
+    in the best straight, or None.
+    """
+
+    for high in xrange(12, 3, -1):
+        straight = 0x1f << (high - 4)
+        if bits & straight == straight:
+            return high
+
+    # The wheel, where the ace is low, is Five high.
+    if bits & 0x100f == 0x100f:
+        return 3
+
+    return None
+
+
+def _flush_score(bits):
+    """Score the best flush or straight flush for a bitmask of (at
+    least five) ranks of the same suit.
+    """
+
+    high = _straight_high(bits)
+    if high is not None:
+        return _score(STRAIGHT_FLUSH, (high,))
+    return _score(FLUSH, [r for r in xrange(12, -1, -1) if bits & (1 << r)][:5])
+
+
+def _rank_score(counts):
+    """Score the best hand, not considering flushes, given the number
+    of cards of each rank (at least five cards in total).
+    """
+
+    desc = [r for r in xrange(12, -1, -1) if counts[r]]
+    fours = [r for r in desc if counts[r] == 4]
+    threes = [r for r in desc if counts[r] == 3]
+    twos = [r for r in desc if counts[r] == 2]
+
+    if fours:
+        kicker = [r for r in desc if r != fours[0]][0]
+        return _score(FOUR_OF_A_KIND, (fours[0], kicker))
+
+    if threes and (len(threes) > 1 or twos):
+        return _score(FULL_HOUSE, (threes[0], max(threes[1:] + twos)))
+
+    high = _straight_high(sum([1 << r for r in desc]))
+    if high is not None:
+        return _score(STRAIGHT, (high,))
+
+    if threes:
+        kickers = [r for r in desc if r != threes[0]][:2]
+        return _score(THREE_OF_A_KIND, [threes[0]] + kickers)
+
+    if len(twos) >= 2:
+        kicker = [r for r in desc if r not in twos[:2]][0]
+        return _score(TWO_PAIR, twos[:2] + [kicker])
+
+    if twos:
+        kickers = [r for r in desc if r != twos[0]][:3]
+        return _score(PAIR, [twos[0]] + kickers)
+
+    return _score(HIGHEST, desc[:5])
+
+
+# Non-flush hands only depend on the multiset of ranks. Each card
+# contributes 5**rank to a key, which is unique since there are at
+# most four cards per rank. That key is too sparse to index a table
+# directly, so it is split into the ranks Two to Eight (the low
+# part, key % 5**7) and Nine to Ace (the high part), and a minimal
+# perfect hash is built from the two parts:
+#
+#   index = _ROWS[key // _LOW] + _COLUMNS[key % _LOW]
+#
+# All low parts are numbered in order of number of cards, so the low
+# parts that can complete a given high part are a contiguous range of
+# _COLUMNS, and the high parts are assigned an offset into the table
+# each.
+
+_LOW = 5**7
+_LOW_RANKS = 7
+_HIGH_RANKS = 6
+
+
+def _multisets(num_ranks, max_cards):
+    """Yields (num cards, counts) for all multisets of ranks with at
+    most max_cards cards and at most four cards per rank.
+    """
+
+    def rec(counts, left):
+        if len(counts) == num_ranks:
+            yield max_cards - left, counts
+            return
+        for n in xrange(min(4, left) + 1):
+            for m in rec(counts + [n], left - n):
+                yield m
+
+    return rec([], max_cards)
+
+
+def _key(counts, offset=0):
+    return sum([n * 5**(offset + r) for r, n in enumerate(counts)])
+
+
+def _build_rank_table(min_cards, max_cards):
+    lows = sorted(_multisets(_LOW_RANKS, max_cards))
+    first = {} # number of cards -> first column
+    columns = [-1] * _LOW
+    for column, (size, counts) in enumerate(lows):
+        first.setdefault(size, column)
+        columns[_key(counts)] = column
+    first[max_cards + 1] = len(lows)
+
+    rows = [-1] * 5**_HIGH_RANKS
+    table = []
+    for size, counts in sorted(_multisets(_HIGH_RANKS, max_cards)):
+        lo_min = max(0, min_cards - size)
+        lo_max = max_cards - size
+        rows[_key(counts)] = len(table) - first[lo_min]
+        for size_low, counts_low in lows[first[lo_min]:first[lo_max + 1]]:
+            table.append(_rank_score(counts_low + counts))
+
+    return rows, columns, table
+
+
+def _build_flush_table():
+    table = [-1] * (1 << 13)
+    for bits in xrange(1 << 13):
+        if bin(bits).count('1') >= 5:
+            table[bits] = _flush_score(bits)
+    return table
+
+
+def _build_flush_suit_table():
+    table = [-1] * (1 << 12)
+    for key in xrange(1 << 12):
+        for suit in xrange(4):
+            if (key >> (3 * suit)) & 7 >= 5:
+                table[key] = suit
+    return table
+
+
+# The tables cover hands of five to seven cards. They take a moment
+# to build, so they are built once and saved to a file (see
+# tables_path()), which later processes read. Nothing is loaded
+# until the first evaluation.
+#
+# The file starts with a header and a directory of tables, followed
+# by the tables themselves as little endian int32s:
+#
+#   magic (8 bytes), version (uint32), number of tables (uint32),
+#   SHA-1 of everything after the header (20 bytes)
+#   number of tables * (name (8 bytes), offset (uint64), count (uint64))
+#
+# Seven cards have at most seven of a suit, so three bits per suit
+# are enough to count them. The flush suit table maps such counts to
+# the suit with five or more cards, or -1. At most one suit can have
+# five cards, and if one does, no full house or four of a kind is
+# possible, so the flush (or straight flush) is the best hand.
+
+TABLES_MAGIC = 'PYKEREVT'
+TABLES_VERSION = 1
+
+_HEADER = struct.Struct('<8sII20s')
+_ENTRY = struct.Struct('<8sQQ')
+_TABLE_NAMES = ('rows', 'columns', 'rank', 'flush', 'flushst')
+
+_ROWS = _COLUMNS = _RANK_TABLE = _FLUSH_TABLE = _FLUSH_SUIT = None
+
+
+def tables_path():
+    """Return the path of the tables file. This is the environment
+    variable PYKER_TABLES if set, otherwise evaluator.tables next to
+    this module.
+    """
+
+    return os.environ.get('PYKER_TABLES') or \
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'evaluator.tables')
+
+
+def _build_tables():
+    rows, columns, rank_table = _build_rank_table(5, 7)
+    return [array.array('i', t) for t in (rows, columns, rank_table,
+                                          _build_flush_table(),
+                                          _build_flush_suit_table())]
+
+
+def _pack_tables(tabs):
+    entries = []
+    offset = _HEADER.size + _ENTRY.size * len(tabs)
+    data = []
+    for name, tab in zip(_TABLE_NAMES, tabs):
+        entries.append(_ENTRY.pack(name, offset, len(tab)))
+        if sys.byteorder != 'little':
+            tab = array.array('i', tab)
+            tab.byteswap()
+        data.append(tab.tostring())
+        offset += len(data[-1])
+    body = ''.join(entries + data)
+    return _HEADER.pack(TABLES_MAGIC, TABLES_VERSION, len(tabs),
+                        hashlib.sha1(body).digest()) + body
+
+
+def _unpack_tables(buf):
+    magic, version, count, digest = _HEADER.unpack_from(buf, 0)
+    if magic != TABLES_MAGIC or version != TABLES_VERSION or \
+            count != len(_TABLE_NAMES):
+        raise ValueError('unknown format or version')
+    if hashlib.sha1(buf[_HEADER.size:]).digest() != digest:
+        raise ValueError('checksum mismatch')
+
+    tabs = []
+    for i, name in enumerate(_TABLE_NAMES):
+        entry_name, offset, n = _ENTRY.unpack_from(buf, _HEADER.size + i * _ENTRY.size)
+        if entry_name.rstrip('\0') != name:
+            raise ValueError('unexpected table %r' % (entry_name,))
+        tab = array.array('i')
+        tab.fromstring(buf[offset:offset + 4 * n])
+        if sys.byteorder != 'little':
+            tab.byteswap()
+        tabs.append(tab)
+    return tabs
+
+
+def save_tables(path=None):
+    """Build the lookup tables and save them to a file, replacing it
+    atomically if it exists.
+
+    :param path: defaults to tables_path().
+    """
+
+    # Only needed here, and slow to import.
+    import tempfile
+
+    path = path or tables_path()
+    data = _pack_tables(_build_tables())
+    fd, tmp = tempfile.mkstemp(prefix='.evaluator-', dir=os.path.dirname(path) or '.')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp, 0644)
+        os.rename(tmp, path)
+    except:
+        os.unlink(tmp)
+        raise
+    log.debug('saved evaluator tables to %s', path)
+
+
+def _read_tables(path):
+    # The tables are copied out of the mapping, which is not needed
+    # after that.
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        return _unpack_tables(mapped)
+    finally:
+        mapped.close()
+
+
+def _load_tables():
+    global _ROWS, _COLUMNS, _RANK_TABLE, _FLUSH_TABLE, _FLUSH_SUIT
+
+    path = tables_path()
+    try:
+        tabs = _read_tables(path)
+    except (IOError, OSError, ValueError, struct.error), e:
+        log.info('building evaluator tables, could not load %s: %s', path, e)
+        try:
+            save_tables(path)
+            tabs = _read_tables(path)
+        except (IOError, OSError), e:
+            log.warning('could not save evaluator tables to %s: %s', path, e)
+            tabs = _build_tables()
+
+    _ROWS, _COLUMNS, _RANK_TABLE, _FLUSH_TABLE, _FLUSH_SUIT = tabs
+
+# Per card code lookups.
+_RANK_KEY = [5**(code // 4) for code in xrange(52)]
+_RANK_BIT = [1 << (code // 4) for code in xrange(52)]
+_SUIT_KEY = [1 << (3 * (code % 4)) for code in xrange(52)]
+_CARD_MASK = [1 << (13 * (code % 4) + code // 4) for code in xrange(52)]
+
+
+def tables():
+    """Return the lookup tables used by the evaluators, building them
+    if needed. This is meant for alternative implementations of the
+    evaluators, such as pyker.batch.
+
+    :returns: dict with the arrays 'rows', 'columns', 'rank_table',
+      'flush_table' and 'flush_suit', the lists 'rank_key',
+      'rank_bit', 'suit_key' and 'card_mask', and the integer 'low'. See the comments in this
+      module for how they fit together.
+    """
+
+    if _RANK_TABLE is None:
+        _load_tables()
+
+    return {
+        'rows': _ROWS,
+        'columns': _COLUMNS,
+        'rank_table': _RANK_TABLE,
+        'flush_table': _FLUSH_TABLE,
+        'flush_suit': _FLUSH_SUIT,
+        'rank_key': _RANK_KEY,
+        'rank_bit': _RANK_BIT,
+        'suit_key': _SUIT_KEY,
+        'card_mask': _CARD_MASK,
+        'low': _LOW,
+        }
+
+
+def evaluate5(cards):
+    """Score a five card hand.
+
+    :param cards: five card codes.
+    :type cards: [int].
+    :returns: int, same as HandClass.score().
+    """
+
+    if _RANK_TABLE is None:
+        _load_tables()
+
+    a, b, c, d, e = cards
+
+    if a & 3 == b & 3 == c & 3 == d & 3 == e & 3:
+        rb = _RANK_BIT
+        return _FLUSH_TABLE[rb[a] | rb[b] | rb[c] | rb[d] | rb[e]]
+
+    rk = _RANK_KEY
+    key = rk[a] + rk[b] + rk[c] + rk[d] + rk[e]
+    return _RANK_TABLE[_ROWS[key // _LOW] + _COLUMNS[key % _LOW]]
+
+
+def evaluate7(cards):
+    """Score the best five card hand out of seven cards.
+
+    :param cards: seven card codes.
+    :type cards: [int].
+    :returns: int, same as HandClass.score().
+    """
+
+    if _RANK_TABLE is None:
+        _load_tables()
+
+    a, b, c, d, e, f, g = cards
+
+    sk = _SUIT_KEY
+    suit = _FLUSH_SUIT[sk[a] + sk[b] + sk[c] + sk[d] + sk[e] + sk[f] + sk[g]]
+    if suit < 0:
+        rk = _RANK_KEY
+        key = rk[a] + rk[b] + rk[c] + rk[d] + rk[e] + rk[f] + rk[g]
+        return _RANK_TABLE[_ROWS[key // _LOW] + _COLUMNS[key % _LOW]]
+
+    bits = 0
+    for card in cards:
+        if card & 3 == suit:
+            bits |= _RANK_BIT[card]
+    return _FLUSH_TABLE[bits]
+
+
+def evaluate(cards):
+    """Score the best five card hand out of five, six or seven cards.
+
+    :param cards: card codes.
+    :type cards: [int].
+    :returns: int, same as HandClass.score().
+    """
+
+    if _RANK_TABLE is None:
+        _load_tables()
+
+    assert 5 <= len(cards) <= 7
+
+    key = suits = 0
+    for card in cards:
+        key += _RANK_KEY[card]
+        suits += _SUIT_KEY[card]
+
+    suit = _FLUSH_SUIT[suits]
+    if suit < 0:
+        return _RANK_TABLE[_ROWS[key // _LOW] + _COLUMNS[key % _LOW]]
+
+    bits = 0
+    for card in cards:
+        if card & 3 == suit:
+            bits |= _RANK_BIT[card]
+    return _FLUSH_TABLE[bits]
+
+
+def best_five(cards):
+    """Find the best five card hand out of five, six or seven cards.
+
+    :param cards: card codes.
+    :type cards: [int].
+    :returns: (score, cards) where cards is a tuple of the five card
+      codes making up the best hand.
+    """
+
+    score = evaluate(cards)
+    for hand in itertools.combinations(cards, 5):
+        if evaluate5(hand) == score:
+            return score, hand
+
+
+# Incremental evaluation. A set of cards is summarized by a state
+# (rank key, suit counts, card mask), where the card mask has bit 13 *
+# suit + rank set for each card. The states of disjoint sets of cards
+# are combined with merge(), so the cards shared by many hands, such
+# as the board, only need to be summarized once.
+
+EMPTY_STATE = (0, 0, 0)
+
+
+def state(cards):
+    """Summarize cards for incremental evaluation.
+
+    :param cards: card codes.
+    :type cards: [int].
+    :returns: state tuple.
+    """
+
+    key = suits = mask = 0
+    for card in cards:
+        key += _RANK_KEY[card]
+        suits += _SUIT_KEY[card]
+        mask |= _CARD_MASK[card]
+    return key, suits, mask
+
+
+def merge(a, b):
+    """Combine the states of two disjoint sets of cards.
+    """
+
+    return a[0] + b[0], a[1] + b[1], a[2] | b[2]
+
+
+def add_card(st, card):
+    """Add a card to a state.
+    """
+
+    return st[0] + _RANK_KEY[card], st[1] + _SUIT_KEY[card], st[2] | _CARD_MASK[card]
+
+
+def score_ranks(key):
+    """Score the best five card hand of a rank key (the sum of the
+    rank_key entries of five to seven cards), not counting flushes.
+
+    :returns: int, same as HandClass.score().
+    """
+
+    if _RANK_TABLE is None:
+        _load_tables()
+
+    return _RANK_TABLE[_ROWS[key // _LOW] + _COLUMNS[key % _LOW]]
+
+
+def score_state(st):
+    """Score the best five card hand of a state of five, six or seven
+    cards.
+
+    :returns: int, same as HandClass.score().
+    """
+
+    if _RANK_TABLE is None:
+        _load_tables()
+
+    key, suits, mask = st
+    suit = _FLUSH_SUIT[suits]
+    if suit < 0:
+        return _RANK_TABLE[_ROWS[key // _LOW] + _COLUMNS[key % _LOW]]
+    return _FLUSH_TABLE[(mask >> (13 * suit)) & 0x1fff]
@@ -32,6 +32,7 @@ import logging
 import random
 import sys
 
+import pyker.evaluator as evaluator
 from pyker.poker import *
 from pyker.pots import Pots
 
@@ -114,10 +115,145 @@ class GameError(Exception):
     pass
 
 
+# Events reported by the Game to its sink, with their arguments.
+# print_event() prints them the way the Game always has.
+_EVENT_FORMATS = {
+    'state': lambda label: label,
+    'bets': lambda bets: 'bets: ' + ' '.join(('%s=%s' % (k.player, v) for (k, v) in bets.iteritems())),
+    'dealer': lambda ps: '%s is dealer' % (ps.player,),
+    'hole': lambda ps: 'dealt hole cards to %s' % (ps.player,),
+    'flop': lambda flop: 'flop is %s' % (' '.join(map(str, flop)),),
+    'turn': lambda turn: 'turn is %s' % (turn,),
+    'river': lambda river: 'river is %s' % (river,),
+    'blind': lambda ps, which: '%s posting %s blind' % (ps.player, which),
+    'to-act': lambda ps: '%s to act' % (ps.player,),
+    'action': lambda ps, name, chips: name if chips is None else '%s %s' % (name, chips),
+    'no-chips': lambda ps: '%s has no chips left' % (ps.player,),
+    'sole-player': lambda ps: '%s is the sole player with chips left - skipping' % (ps.player,),
+    'community': lambda cards: 'community cards are %s' % ' '.join(map(str, cards)),
+    'hand': lambda ps, score: '%s has %s, best hand is %s' % (ps.player, ' '.join(map(str, ps.hole)), HandClass.from_score(score)),
+    'won': lambda ps, chips: '%s won %s from a pot' % (ps.player, chips),
+    'returned': lambda ps, chips: '%s gets %s back from a pot no one contests' % (ps.player, chips),
+    'end': lambda: 'hand is over',
+    }
+
+
+def print_event(event, *args):
+    """An event sink which prints the events to stdout. This is the
+    default sink of a Game.
+    """
+
+    print _EVENT_FORMATS[event](*args)
+
+
+class Action(object):
+    """A context to execute the options of the player to act. An
+    Action is yielded from the betting rounds with the set of valid
+    options.
+    """
+
+    __slots__ = ('game', 'ps', 'options')
+
+    def __init__(self, game, ps, options):
+        self.game = game
+        self.ps = ps
+        self.options = options
+
+    def _event(self, name, chips=None):
+        if self.game.sink is not None:
+            self.game.sink('action', self.ps, name, chips)
+
+    def action_check(self):
+        if 'check' not in self.options:
+            raise GameError('invalid check')
+        self._event('check')
+        self.game.post(self.ps, 0)
+
+    def action_call(self):
+        if 'call' not in self.options:
+            raise GameError('invalid call')
+        self._event('call')
+        # XXX: All in etc
+        bets = self.game.bets
+        self.game.post(self.ps, max(bets.values()) - bets.get(self.ps, 0))
+
+    def action_raise(self, chips):
+        """Raise, putting in chips in total: more than the amount to
+        call, and at most the player's chips.
+        """
+
+        if 'raise' not in self.options or chips > self.ps.chips:
+            raise GameError('invalid raise')
+        bets = self.game.bets
+        to_call = max(bets.values()) - bets.get(self.ps, 0) if bets else 0
+        if chips <= to_call:
+            raise GameError('invalid raise: %s chips, must be more than %s to call' % (chips, to_call))
+        self._event('raise', chips)
+        self.game.post(self.ps, chips)
+
+    def action_bet(self, chips):
+        """Bet chips, at least one and at most the player's chips.
+        """
+
+        if 'bet' not in self.options or chips > self.ps.chips:
+            raise GameError('invalid bet')
+        if chips <= 0:
+            raise GameError('invalid bet: %s chips' % (chips,))
+        self._event('bet', chips)
+        self.game.post(self.ps, chips)
+
+    def action_fold(self):
+        self._event('fold')
+        self.game.active.remove(self.ps)
+
+    def take(self, decision):
+        """Take a decision: one of 'check', 'call' or 'fold', or a
+        tuple ('bet', chips) or ('raise', chips).
+        """
+
+        if isinstance(decision, tuple):
+            name, args = decision[0], decision[1:]
+        else:
+            name, args = decision, ()
+        try:
+            f = getattr(self, 'action_' + name)
+        except AttributeError:
+            raise GameError('invalid action %s' % (name,))
+        stats = self.game.stats
+        if stats is None:
+            f(*args)
+        else:
+            start = stats.clock()
+            f(*args)
+            stats.observe_action(name, stats.clock() - start)
+
+
+_OPENING_OPTIONS = frozenset(['fold', 'bet', 'check'])
+_FACING_BET_OPTIONS = frozenset(['fold', 'call', 'raise'])
+
+
 class Game(object):
-    def __init__(self, table, rules):
+    def __init__(self, table, rules, sink=print_event, rng=None, stats=None):
+        """Create a Game.
+
+        :param table: the Table the game is played at.
+        :param rules: the GameRules.
+        :param sink: callable receiving the events of the game as
+          sink(event, *args), see print_event(). None to run
+          headless, without any output.
+        :param rng: random generator for this table's deck, such as a
+          random.Random. The random module by default.
+        :param stats: a pyker.stats.GameStats to record timings and
+          counters in, or None.
+        """
+
         self.table = table
         self.rules = rules
+        self.sink = sink
+        self.stats = stats
+
+        # The deck is reused between games.
+        self.deck = Deck(rng=rng)
 
         # The dealer button is a piece of state that changes between
         # successive games. Most other state is state for the actual
@@ -127,6 +263,11 @@ class Game(object):
         # Seed for the state machine.
         self.state = 'init'
 
+        # The players who have acted in the betting round in progress,
+        # or None, and the Action waiting for a decision.
+        self.acted = None
+        self.pending = None
+
     def set_blinds(self, big, small):
         self.bb = big
         self.sb = small
@@ -138,10 +279,22 @@ class Game(object):
             if p is not None:
                 return p
 
+    def _find_active(self, i):
+        # Like Table.find(), but skips players who are seated without
+        # taking part in the game.
+        while True:
+            i = self.table.find(i)
+            if self.table.get(i) in self.active:
+                return i
+            i += 1
+
     def post(self, ps, chips):
         _chips = chips
 
+        all_in = ps.chips > 0
         self.pots.post(ps, chips)
+        if self.stats is not None and all_in and ps.chips == 0:
+            self.stats.count('all-ins')
 
         # Update bets. This doesn't care about side pots etc, it's
         # just what the player attempted to match this betting round.
@@ -150,7 +303,8 @@ class Game(object):
         except:
             self.bets[ps] = _chips
 
-        print 'bets:', ' '.join(('%s=%s' % (k.player, v) for (k, v) in self.bets.iteritems()))
+        if self.sink is not None:
+            self.sink('bets', self.bets)
 
     # modifies: self.pots, self.bets, self.active,
     # self.deck, self.flop, self.turn, self.river,
@@ -173,18 +327,19 @@ class Game(object):
         self.bets = {} # ps -> attempted bet
 
         # The deck
-        deck = []
-        for suit in 'hscd':
-            for rank in map(Rank, range(2, 15)):
-                deck.append(Card(rank, suit))
-        random.shuffle(deck)
-        self.deck = deck
+        self.deck.reset()
 
         # The community cards.
         self.flop = []
         self.turn = None
         self.river = None
 
+        # Evaluator state of the hole and community cards of each
+        # player, and the score of their best five card hand, updated
+        # as the cards are dealt.
+        self.hand_states = {}
+        self.hand_scores = {}
+
         # We could advance the dealer when the game has ended, but
         # since that can happen at multiple places it's more
         # convienient to do it once, here. If we want a particular
@@ -194,133 +349,227 @@ class Game(object):
 
     # modifies: self.deck
     def _state_deal_hole_cards(self):
-        dealer = self.table.find(self.dealer)
-        print '%s is dealer' % (self.table.get(dealer).player)
+        dealer = self._find_active(self.dealer)
+        if self.sink is not None:
+            self.sink('dealer', self.table.get(dealer))
 
         for pos in range(dealer + 1,
                          dealer + 1 + self.table.num_seats):
             ps = self.table.get(pos)
-            if ps is None:
+            if ps is None or ps not in self.active:
                 continue
-            ps.hole, self.deck = self.deck[0:2], self.deck[2:]
+            ps.hole = self.deck.deal_many(2)
+            self.hand_states[ps] = evaluator.state([c.code for c in ps.hole])
+            if self.stats is not None:
+                self.stats.count('evaluator-state')
 
-            print 'dealt hole cards to %s' % (ps.player)
+            if self.sink is not None:
+                self.sink('hole', ps)
 
     # modifies: self.deck, self.flop
     def _state_deal_flop(self):
-        burn, flop, self.deck = self.deck[0], \
-            self.deck[1:4], self.deck[4:]
+        self.deck.burn()
+        flop = self.deck.deal_many(3)
 
         self.flop = flop
-        print 'flop is %s' % (' '.join(map(str, flop)))
+        if self.sink is not None:
+            self.sink('flop', flop)
+        for card in flop:
+            self._add_community(card, card is flop[-1])
 
     # modifies: self.deck, self.turn
     def _state_deal_turn(self):
-        burn, turn, self.deck = self.deck[0], \
-            self.deck[1], self.deck[2:]
+        self.deck.burn()
+        turn = self.deck.deal()
 
         self.turn = turn
-        print 'turn is %s' % (turn,)
+        if self.sink is not None:
+            self.sink('turn', turn)
+        self._add_community(turn)
 
     # modifies: self.deck, self.river
     def _state_deal_river(self):
-        burn, river, self.deck = self.deck[0], \
-            self.deck[1], self.deck[2:]
+        self.deck.burn()
+        river = self.deck.deal()
 
         self.river = river
-        print 'river is %s' % (river,)
+        if self.sink is not None:
+            self.sink('river', river)
+        self._add_community(river)
+
+    def snapshot(self):
+        """Take a snapshot of the game, between steps of the state
+        machine or while a player is to act.
+
+        :returns: GameState.
+        """
+
+        seats = self.table.seats
+        index = {}
+        entries = []
+        for seat, ps in enumerate(seats):
+            if ps is None:
+                entries.append(None)
+            else:
+                index[ps] = seat
+                hole = getattr(ps, 'hole', None)
+                entries.append((ps.player, ps.chips,
+                                tuple(hole) if hole is not None else None))
+
+        st = GameState()
+        st.seats = tuple(entries)
+        st.rules = self.rules
+        st.state = self.state
+        st.sub_state = getattr(self, 'sub_state', None)
+        st.dealer = self.dealer
+        st.pos = getattr(self, 'pos', 0)
+        st.blinds = (getattr(self, 'bb', None), getattr(self, 'sb', None))
+
+        deck = self.deck
+        getstate = getattr(deck.rng, 'getstate', None)
+        st.deck = (tuple(deck.cards), deck.pos, deck.size,
+                   getstate() if getstate is not None else None)
+
+        active = getattr(self, 'active', None)
+        if active is None:
+            # No hand played yet.
+            st.active = st.acted = st.to_act = st.options = st.hand = None
+            return st
+
+        st.active = frozenset([index[ps] for ps in active])
+        st.acted = frozenset([index[ps] for ps in self.acted]) \
+            if self.acted is not None else None
+        if self.pending is not None:
+            st.to_act = index[self.pending.ps]
+            st.options = self.pending.options
+        else:
+            st.to_act = st.options = None
+
+        pots = self.pots
+        st.hand = (
+            tuple([(index[ps], n) for ps, n in self.bets.iteritems()]),
+            tuple([(index[ps], n) for ps, n in pots.contrib.iteritems()]),
+            tuple(pots.levels), pots.started,
+            tuple(self.flop), self.turn, self.river,
+            tuple([(index[ps], v) for ps, v in self.hand_states.iteritems()]),
+            tuple([(index[ps], v) for ps, v in self.hand_scores.iteritems()]),
+            )
+        return st
+
+    def _add_community(self, card, score=True):
+        states = self.hand_states
+        code = card.code
+        for ps in self.active:
+            states[ps] = st = evaluator.add_card(states[ps], code)
+            if score:
+                self.hand_scores[ps] = evaluator.score_state(st)
+        if self.stats is not None:
+            self.stats.count('evaluator-add-card', len(self.active))
+            if score:
+                self.stats.count('evaluator-score', len(self.active))
+
+    def hand_score(self, ps):
+        """Return the score of the best five card hand of a player,
+        from the hole cards and the community cards dealt so far.
+        This is a lookup, the score is kept up to date as the cards
+        are dealt.
+
+        :param ps: a player in the game, who has not folded.
+        :returns: int, same as HandClass.score(), or None before the
+          flop.
+        """
+
+        return self.hand_scores.get(ps)
+
+    def hand_class(self, ps):
+        """Like hand_score(), but returns the HandClass.
+        """
+
+        score = self.hand_scores.get(ps)
+        return HandClass.from_score(score) if score is not None else None
 
     # modifies: self.pos
     # calls: self.post
     def _state_post_blinds(self):
-        pos = self.table.find(self.dealer)
-        print '%s is dealer' % (self.table.get(pos).player)
+        pos = self._find_active(self.dealer)
+        if self.sink is not None:
+            self.sink('dealer', self.table.get(pos))
 
         # If there are only two players, the dealer will post the
         # small blinds. Otherwise, it's the next player.
-        if self.table.players() > 2:
+        if len(self.active) > 2:
             pos += 1
 
-        player_sb_idx = self.table.find(pos)
+        player_sb_idx = self._find_active(pos)
         player_sb = self.table.get(player_sb_idx)
 
-        print '%s posting small blind' % (player_sb.player,)
+        if self.sink is not None:
+            self.sink('blind', player_sb, 'small')
         self.post(player_sb, self.sb)
 
-        player_bb_idx = self.table.find(player_sb_idx + 1)
+        player_bb_idx = self._find_active(player_sb_idx + 1)
         player_bb = self.table.get(player_bb_idx)
 
-        print '%s posting big blind' % (player_bb.player,)
+        if self.sink is not None:
+            self.sink('blind', player_bb, 'big')
         self.post(player_bb, self.bb)
 
         self.pos = player_bb_idx + 1
 
     # modifies: self.pos, self.bets
     # calls: self.post
-    def _state_betting(self):
-        acted = set()
+    def _state_betting(self, resume=False):
+        # The state of the round is kept in the Game rather than in
+        # the generator, so a round can be resumed (see GameState).
+        if not resume:
+            self.acted = set()
+        acted = self.acted
 
         while self.active:
             # betting round continues until everyone has acted and
             # bet the same amount (or all-in)
+            top = max(self.bets.itervalues()) if self.bets else 0
 
-            if len(acted) == len(self.active):
-                val = self.bets.values()
-                # XXX: All in
-                if all((v == val[0] for v in val)):
+            if acted >= self.active:
+                if all((pso.chips == 0 or self.bets.get(pso, 0) == top
+                        for pso in self.active)):
                     break
 
             i = self.table.find(self.pos)
             ps = self.table.get(i)
 
-            print '%s to act' % (ps.player,)
+            # Players who have folded, or had no chips when the game
+            # started, don't act.
+            if ps not in self.active:
+                self.pos = i + 1
+                continue
+
+            if self.sink is not None:
+                self.sink('to-act', ps)
 
-            # Construct a setof valid options for the player.
-            options = set(['fold'])
-            if not self.bets or sum(self.bets.values()) == 0:
-                options.add('bet') # open
-                options.add('check')
+            # The valid options for the player.
+            if top == 0:
+                options = _OPENING_OPTIONS
             else:
                 # TODO (bjorn): BB can check here (which is the same
                 # as call).
-                options.add('call')
-                options.add('raise')
-
-            # A context to execute the options.
-            class Action(object):
-                def action_check(iself):
-                    if 'check' not in options:
-                        raise GameError('invalid check')
-                    print 'check'
-                    self.post(ps, 0)
-                def action_call(iself):
-                    if 'call' not in options:
-                        raise GameError('invalid call')
-                    print 'call'
-                    # XXX: All in etc
-                    self.post(ps, max(self.bets.values()) - self.bets.get(ps, 0))
-                def action_raise(iself, chips):
-                    if 'raise' not in options or chips > ps.chips:
-                        raise GameError('invalid raise')
-                    print 'raise', chips
-                    self.post(ps, chips)
-                def action_bet(iself, chips):
-                    if 'bet' not in options or chips > ps.chips:
-                        raise GameError('invalid bet')
-                    print 'bet', chips
-                    self.post(ps, chips)
-                def action_fold(iself):
-                    print 'fold'
-                    self.active.remove(ps)
-
-            if ps.chips and len([pso for pso in self.active if pso.chips]) > 1:
+                options = _FACING_BET_OPTIONS
+
+            # A player must act if someone else can still call, or if
+            # there is a bet to call.
+            if ps.chips and (self.bets.get(ps, 0) < top or
+                             len([pso for pso in self.active if pso.chips]) > 1):
                 # Yield execution to the main loop.
-                yield options, Action()
+                self.pending = Action(self, ps, options)
+                yield options, self.pending
+                self.pending = None
             else:
                 if ps.chips == 0:
-                    print '%s has no chips left' % (ps.player,)
+                    if self.sink is not None:
+                        self.sink('no-chips', ps)
                 else:
-                    print '%s is the sole player with chips left - skipping' % (ps.player,)
+                    if self.sink is not None:
+                        self.sink('sole-player', ps)
                     break
 
             acted.add(ps)
@@ -328,27 +577,43 @@ class Game(object):
 
         self.bets = {}
         self.pos = self.dealer + 1
+        self.acted = None
+        self.pending = None
 
     # modifies:
     def _state_showdown(self):
         if not self.active:
             return
 
-        print 'community cards are %s' % ' '.join(map(str, self.flop + [self.turn, self.river]))
-
-        relative = []
-        for ps in self.active:
-            best = Hand.best_from_seven(*(ps.hole + self.flop + [self.turn, self.river]))
-            print '%s has %s, best hand is %s' % (ps.player, ' '.join(map(str, ps.hole)), best.classify())
-            relative.append((best, ps))
-        relative.sort(reverse=True)
-
-        for stakes, total in self.pots.list():
-            ordering = [(best, ps) for (best, ps) in relative if ps in stakes]
-            winners = [w for w in ordering if w[0] == ordering[0][0]]
-            won = total / len(winners)
-            for _, ps in winners:
-                print '%s won %s from a pot' % (ps.player, won)
+        if self.sink is not None:
+            self.sink('community', self.flop + [self.turn, self.river])
+
+        # The button is the first player dealt in from the dealer
+        # seat, which may be empty or have a busted player.
+        button = self.dealer
+        while self.table.get(button) not in self.hand_states:
+            button += 1
+
+        # Score every player once, starting left of the button: odd
+        # chips of split pots go to the tied players in that order.
+        classes = {} # score -> [ps]
+        for j in xrange(self.table.num_seats):
+            ps = self.table.get(button + 1 + j)
+            if ps not in self.active:
+                continue
+            best = self.hand_scores[ps]
+            if self.sink is not None:
+                self.sink('hand', ps, best)
+            classes.setdefault(best, []).append(ps)
+        rankings = [classes[best] for best in sorted(classes, reverse=True)]
+
+        settled = self.pots.settle(rankings)
+        if self.stats is not None:
+            self.stats.count('pots', len(settled))
+        for total, payouts in settled:
+            for ps, won in payouts:
+                if self.sink is not None:
+                    self.sink('won' if ps in self.active else 'returned', ps, won)
                 ps.chips += won
 
     def loop(self):
@@ -356,23 +621,41 @@ class Game(object):
             yield self.game()
 
     def game(self):
+        """Run the next transition of the state machine. Returns a
+        generator which yields once: the actions of a betting round,
+        see _state_betting(), or None.
+        """
+
+        if self.stats is not None:
+            return self.stats.step(self, self._transition())
+        return self._transition()
+
+    def _transition(self):
         ret = None
         # Transitions for the game state machine.
-        if self.state == 'init':
-            print 'INIT'
+        if self.acted is not None:
+            # A betting round was left unfinished, which is how a
+            # Game forked from a GameState starts: pick it up again.
+            ret = self._state_betting(resume=True)
+        elif self.state == 'init':
+            if self.sink is not None:
+                self.sink('state', 'INIT')
             self._state_init()
             self.state = 'deal-hole'
         elif self.state == 'deal-hole':
-            print 'DEALING CARDS'
+            if self.sink is not None:
+                self.sink('state', 'DEALING CARDS')
             self._state_deal_hole_cards()
             self.state = 'blinds'
         elif self.state == 'blinds':
-            print 'POSTING BLINDS'
+            if self.sink is not None:
+                self.sink('state', 'POSTING BLINDS')
             self._state_post_blinds()
             self.state = 'betting'
             self.sub_state = 'preflop'
         elif self.state == 'betting':
-            print 'BETTING', self.sub_state
+            if self.sink is not None:
+                self.sink('state', 'BETTING ' + self.sub_state)
             ret = self._state_betting()
             if self.sub_state == 'preflop':
                 self.state = 'deal-flop'
@@ -383,24 +666,30 @@ class Game(object):
             elif self.sub_state == 'river':
                 self.state = 'showdown'
         elif self.state == 'deal-flop':
-            print 'DEALING FLOP'
+            if self.sink is not None:
+                self.sink('state', 'DEALING FLOP')
             self._state_deal_flop()
             self.state = 'betting'
             self.sub_state = 'flop'
         elif self.state == 'deal-turn':
-            print 'DEALING TURN'
+            if self.sink is not None:
+                self.sink('state', 'DEALING TURN')
             self._state_deal_turn()
             self.state = 'betting'
             self.sub_state = 'turn'
         elif self.state == 'deal-river':
-            print 'DEALING RIVER'
+            if self.sink is not None:
+                self.sink('state', 'DEALING RIVER')
             self._state_deal_river()
             self.state = 'betting'
             self.sub_state = 'river'
         elif self.state == 'showdown':
-            print 'SHOWDOWN'
+            if self.sink is not None:
+                self.sink('state', 'SHOWDOWN')
             self._state_showdown()
             self.state = 'init'
+            if self.sink is not None:
+                self.sink('end')
         else:
             raise AssertionError('invalid state %s' % (self.state,))
 
@@ -408,6 +697,138 @@ class Game(object):
 
 
 
+class GameState(object):
+    """An immutable snapshot of a Game, see Game.snapshot(), for
+    searching and what-if analysis from the middle of a hand.
+
+    fork() gives a new Game which continues from the snapshot exactly
+    as the original would have, and apply() the snapshot after a
+    decision. Players are identified by seat: to_act is the seat of
+    the player to act, or None between steps, such as when the hand
+    is over, and chips the chips of each seat.
+
+    The deck is included, with the state of its random generator, so
+    the cards to come are the same as in the original Game unless a
+    different rng is given to fork().
+    """
+
+    __slots__ = ('seats', 'rules', 'state', 'sub_state', 'dealer', 'pos',
+                 'blinds', 'deck', 'active', 'acted', 'to_act', 'options',
+                 'hand')
+
+    @property
+    def chips(self):
+        return tuple([entry[1] if entry is not None else None
+                      for entry in self.seats])
+
+    @property
+    def hand_over(self):
+        """True if no hand is in progress."""
+        return self.state == 'init' and self.acted is None
+
+    def fork(self, sink=None, rng=None):
+        """Create a Game from the snapshot, with new PlayerStates
+        (of the same Players).
+
+        :param sink: event sink of the new Game, see Game.
+        :param rng: random generator for the deck of the new Game.
+          By default a copy of the generator of the original Game.
+        :returns: Game.
+        """
+
+        num_seats = len(self.seats)
+        table = Table(num_seats)
+        players = [None] * num_seats
+        for seat, entry in enumerate(self.seats):
+            if entry is not None:
+                player, chips, hole = entry
+                ps = players[seat] = PlayerState(player, chips)
+                if hole is not None:
+                    ps.hole = list(hole)
+                table.seats[seat] = ps
+
+        cards, pos, size, rng_state = self.deck
+        if rng is None and rng_state is not None:
+            # Seeded, as seeding from the system is slow.
+            rng = random.Random(0)
+            rng.setstate(rng_state)
+        game = Game(table, self.rules, sink=sink, rng=rng)
+        deck = game.deck
+        deck.cards[:] = cards
+        deck.pos = pos
+        deck.size = size
+
+        game.state = self.state
+        if self.sub_state is not None:
+            game.sub_state = self.sub_state
+        game.dealer = self.dealer
+        game.pos = self.pos
+        game.bb, game.sb = self.blinds
+        if self.active is None:
+            return game
+
+        game.active = set([players[i] for i in self.active])
+        if self.acted is not None:
+            game.acted = set([players[i] for i in self.acted])
+        (bets, contrib, levels, started, flop, turn, river,
+         hand_states, hand_scores) = self.hand
+        game.bets = dict([(players[i], n) for i, n in bets])
+        pots = game.pots = Pots()
+        pots.contrib = dict([(players[i], n) for i, n in contrib])
+        pots.levels = list(levels)
+        pots.started = started
+        game.flop = list(flop)
+        game.turn = turn
+        game.river = river
+        game.hand_states = dict([(players[i], v) for i, v in hand_states])
+        game.hand_scores = dict([(players[i], v) for i, v in hand_scores])
+        return game
+
+    def advance(self):
+        """Run the game on to the next decision, or to the end of the
+        hand. Starts a new hand if none is in progress.
+
+        :returns: GameState.
+        :raises GameError: if there are too few players for a new hand.
+        """
+
+        game = self.fork()
+        _advance(game, None, self.hand_over)
+        return game.snapshot()
+
+    def apply(self, decision):
+        """Take a decision for the player to act, and run the game on
+        to the next decision, or to the end of the hand.
+
+        :param decision: see Action.take().
+        :returns: GameState.
+        """
+
+        if self.to_act is None:
+            raise GameError('no player to act')
+        game = self.fork()
+        actions = game.game().next()
+        options, action = actions.next()
+        action.take(decision)
+        _advance(game, actions, False)
+        return game.snapshot()
+
+
+def _advance(game, actions, new_hand):
+    # Step game until a player is to act or the hand is over.
+    while True:
+        if actions is not None:
+            try:
+                actions.next()
+                return
+            except StopIteration:
+                actions = None
+        if game.state == 'init' and game.acted is None and not new_hand:
+            return
+        new_hand = False
+        actions = game.game().next()
+
+
 def test_pots():
     p1 = Player('player 1', 5000)
     p2 = Player('player 2', 3000)
@@ -0,0 +1,498 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2011 Björn Edström <be@bjrn.se>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the University nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE REGENTS AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE REGENTS OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+
+""" compact binary hand histories.
+
+A HistoryWriter attached to a Game records every hand played, and a
+HistoryReader gives them back and can replay them through the Game
+state machine:
+
+    >>> writer = HistoryWriter(open('hands.pkh', 'wb'))
+    >>> writer.attach(game)
+    >>> play(game, strategies, 1000)
+    >>> writer.close()
+
+    >>> reader = HistoryReader('hands.pkh')
+    >>> game = reader.replay(17)
+
+The file is a header, the hands as length prefixed records and an
+index block followed by a fixed size footer:
+
+    header   "PYKERHH\0", version (uint32)
+    record   length (varint), hand
+    ...
+    index    number of offsets (varint), offset deltas (varint)
+    footer   index offset (uint64), number of hands (uint64),
+             hands per offset (uint32), "PYKERHIX"
+
+A hand is, all numbers varints unless noted:
+
+    number of seats, dealer seat, small blind, big blind,
+    number of players, then per player:
+        seat, stack, hole cards (two bytes)
+    number of board cards (byte), board cards (bytes)
+    number of actions, then per action:
+        player index * 8 + action, chips for bet and raise
+
+Cards are their codes (see poker.Card). Only the players with chips
+at the start of the hand are recorded. The index has the offset of
+every INDEX_INTERVAL:th record, so finding a hand reads at most that
+many record lengths. A file that was never closed has no index, and
+is scanned when opened instead.
+"""
+
+import mmap
+import struct
+
+from pyker.game import Game, GameRules, Player, PlayerState, Table
+from pyker.poker import CARDS
+
+
+HISTORY_MAGIC = 'PYKERHH\0'
+HISTORY_VERSION = 1
+INDEX_MAGIC = 'PYKERHIX'
+INDEX_INTERVAL = 256
+
+_HEADER = struct.Struct('<8sI')
+_FOOTER = struct.Struct('<QQI8s')
+
+ACTIONS = ('check', 'call', 'raise', 'bet', 'fold')
+_ACTION_CODES = dict((name, i) for i, name in enumerate(ACTIONS))
+
+
+def _put_varint(out, n):
+    while n > 0x7f:
+        out.append((n & 0x7f) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _get_varint(buf, pos):
+    b = ord(buf[pos])
+    if b < 0x80:
+        return b, pos + 1
+    n = b & 0x7f
+    shift = 7
+    while True:
+        pos += 1
+        b = ord(buf[pos])
+        n |= (b & 0x7f) << shift
+        if b < 0x80:
+            return n, pos + 1
+        shift += 7
+
+
+class HandRecord(object):
+    """The history of one hand.
+
+    The dealer is the first player seated from the dealer seat on.
+    players is a list of (seat, stack, hole) for the players with
+    chips at the start of the hand, in seat order, where stack is
+    their chips before the blinds and hole their two card codes. The
+    board is the card codes of the community cards dealt, and actions
+    a list of (player index, action, chips) in the order they were
+    taken, where the index is into players, action one of ACTIONS and
+    chips None except for bets and raises.
+    """
+
+    __slots__ = ('num_seats', 'dealer', 'small_blind', 'big_blind',
+                 'players', 'board', 'actions')
+
+    def __init__(self, num_seats, dealer, small_blind, big_blind,
+                 players=None, board=None, actions=None):
+        self.num_seats = num_seats
+        self.dealer = dealer
+        self.small_blind = small_blind
+        self.big_blind = big_blind
+        self.players = players if players is not None else []
+        self.board = board if board is not None else []
+        self.actions = actions if actions is not None else []
+
+    def __eq__(self, other):
+        return isinstance(other, HandRecord) and \
+            all(getattr(self, k) == getattr(other, k) for k in self.__slots__)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return '<HandRecord dealer=%s players=%s board=%s actions=%s>' % (
+            self.dealer, self.players, self.board, self.actions)
+
+    def encode(self):
+        """Return the hand as a string, without the length prefix."""
+
+        out = bytearray()
+        put = _put_varint
+        put(out, self.num_seats)
+        put(out, self.dealer)
+        put(out, self.small_blind)
+        put(out, self.big_blind)
+        put(out, len(self.players))
+        for seat, stack, hole in self.players:
+            put(out, seat)
+            put(out, stack)
+            out.append(hole[0])
+            out.append(hole[1])
+        out.append(len(self.board))
+        out.extend(self.board)
+        put(out, len(self.actions))
+        for index, name, chips in self.actions:
+            code = _ACTION_CODES[name]
+            put(out, index * 8 + code)
+            if chips is not None:
+                put(out, chips)
+        return str(out)
+
+    @classmethod
+    def decode(cls, buf, pos=0):
+        """Decode a hand from a string or mmap.
+
+        :returns: tuple (HandRecord, position after the hand).
+        """
+
+        get = _get_varint
+        num_seats, pos = get(buf, pos)
+        dealer, pos = get(buf, pos)
+        small_blind, pos = get(buf, pos)
+        big_blind, pos = get(buf, pos)
+        n, pos = get(buf, pos)
+        players = []
+        for _ in xrange(n):
+            seat, pos = get(buf, pos)
+            stack, pos = get(buf, pos)
+            players.append((seat, stack, (ord(buf[pos]), ord(buf[pos + 1]))))
+            pos += 2
+        n = ord(buf[pos])
+        board = [ord(c) for c in buf[pos + 1:pos + 1 + n]]
+        pos += 1 + n
+        n, pos = get(buf, pos)
+        actions = []
+        for _ in xrange(n):
+            code, pos = get(buf, pos)
+            name = ACTIONS[code & 7]
+            if name == 'bet' or name == 'raise':
+                chips, pos = get(buf, pos)
+            else:
+                chips = None
+            actions.append((code >> 3, name, chips))
+        return cls(num_seats, dealer, small_blind, big_blind,
+                   players, board, actions), pos
+
+
+class _Recorder(object):
+    """An event sink recording the hands of a game, and passing the
+    events on to the sink it replaced.
+    """
+
+    def __init__(self, writer, game, sink):
+        self.writer = writer
+        self.game = game
+        self.sink = sink
+        self.hand = None
+        self.index = {}
+
+    def __call__(self, event, *args):
+        hand = self.hand
+        if event == 'state':
+            if args[0] == 'INIT':
+                self._start()
+        elif hand is None:
+            pass
+        elif event == 'action':
+            ps, name, chips = args
+            hand.actions.append((self.index[ps], name, chips))
+        elif event == 'hole':
+            ps = args[0]
+            i = self.index[ps]
+            seat, stack, _ = hand.players[i]
+            hand.players[i] = (seat, stack, (ps.hole[0].code, ps.hole[1].code))
+        elif event == 'dealer':
+            # Not necessarily the seat of the dealer, but where the
+            # game starts looking for one.
+            hand.dealer = self.game.dealer % hand.num_seats
+        elif event == 'flop':
+            hand.board.extend([c.code for c in args[0]])
+        elif event == 'turn' or event == 'river':
+            hand.board.append(args[0].code)
+        elif event == 'end':
+            self.writer.write(hand)
+            self.hand = None
+
+        if self.sink is not None:
+            self.sink(event, *args)
+
+    def _start(self):
+        game = self.game
+        table = game.table
+        self.hand = hand = HandRecord(table.num_seats, 0, game.sb, game.bb)
+        self.index.clear()
+        for seat, ps in enumerate(table.seats):
+            if ps is not None and ps.chips > 0:
+                self.index[ps] = len(hand.players)
+                hand.players.append((seat, ps.chips, None))
+
+
+class HistoryWriter(object):
+    """Writes hands to a file, buffered.
+    """
+
+    def __init__(self, f, buffer_size=1 << 16):
+        """Create a HistoryWriter.
+
+        :param f: a file opened for writing in binary mode. Closed
+          with the HistoryWriter.
+        :param buffer_size: bytes to buffer before writing to f.
+        """
+
+        self.f = f
+        self.buffer_size = buffer_size
+        self.buffer = bytearray(_HEADER.pack(HISTORY_MAGIC, HISTORY_VERSION))
+        self.offset = 0 # of the start of the buffer in the file
+        self.hands = 0
+        self.index = []
+
+    def attach(self, game):
+        """Record the hands played by game, from the next hand on. The
+        events are still passed on to the sink of the game.
+        """
+
+        game.sink = _Recorder(self, game, game.sink)
+
+    def write(self, hand):
+        """Write a HandRecord."""
+
+        data = hand.encode()
+        if self.hands % INDEX_INTERVAL == 0:
+            self.index.append(self.offset + len(self.buffer))
+        self.hands += 1
+        _put_varint(self.buffer, len(data))
+        self.buffer.extend(data)
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        self.f.write(self.buffer)
+        self.offset += len(self.buffer)
+        del self.buffer[:]
+        self.f.flush()
+
+    def close(self):
+        """Write the index and close the file."""
+
+        index_offset = self.offset + len(self.buffer)
+        _put_varint(self.buffer, len(self.index))
+        prev = 0
+        for offset in self.index:
+            _put_varint(self.buffer, offset - prev)
+            prev = offset
+        self.buffer.extend(_FOOTER.pack(index_offset, self.hands,
+                                        INDEX_INTERVAL, INDEX_MAGIC))
+        self.flush()
+        self.f.close()
+
+
+class _ReplayDeck(object):
+    """A deck dealing given cards in order. Burnt cards are not
+    recorded, so burning is a no-op.
+    """
+
+    def __init__(self, cards):
+        self.cards = cards
+        self.pos = 0
+
+    def reset(self, dead=()):
+        self.pos = 0
+
+    def deal(self):
+        if self.pos >= len(self.cards):
+            raise ValueError('no cards left in deck')
+        self.pos += 1
+        return self.cards[self.pos - 1]
+
+    def deal_many(self, n):
+        return [self.deal() for _ in xrange(n)]
+
+    def burn(self):
+        pass
+
+    def __len__(self):
+        return len(self.cards) - self.pos
+
+
+def replay(hand, sink=None):
+    """Play a hand again through the Game state machine.
+
+    :param hand: the HandRecord.
+    :param sink: event sink of the game, see Game.
+    :returns: the Game after the hand. Its table has a PlayerState
+      for each recorded player, with the name of the seat, such as
+      "seat 3".
+    :raises ValueError: if the game does not go as recorded.
+    """
+
+    # Imported here as pyker.sim imports the game too.
+    from pyker.sim import play
+
+    table = Table(hand.num_seats)
+    players = []
+    for seat, stack, hole in hand.players:
+        ps = PlayerState(Player('seat %d' % seat), stack)
+        table.join(seat, ps)
+        players.append(ps)
+
+    # The hole cards are dealt starting left of the dealer, who is the
+    # first player from the dealer seat on.
+    first = 0
+    while first < len(players) and hand.players[first][0] < hand.dealer:
+        first += 1
+    first = (first + 1) % len(players) if players else 0
+    cards = []
+    for i in range(first, len(players)) + range(first):
+        cards.extend([CARDS[c] for c in hand.players[i][2]])
+    cards.extend([CARDS[c] for c in hand.board])
+
+    game = Game(table, GameRules(), sink=sink)
+    game.deck = _ReplayDeck(cards)
+    game.set_blinds(hand.big_blind, hand.small_blind)
+    game.dealer = hand.dealer - 1
+
+    actions = iter(hand.actions)
+    def strategy(game, ps, options):
+        try:
+            index, name, chips = actions.next()
+        except StopIteration:
+            raise ValueError('hand has more actions than recorded')
+        if players[index] is not ps:
+            raise ValueError('%s acted, but %s was recorded' % (ps.player, players[index].player))
+        return name if chips is None else (name, chips)
+
+    play(game, dict.fromkeys(players, strategy), 1)
+    return game
+
+
+class HistoryReader(object):
+    """Reads hands from a file written by HistoryWriter. The file is
+    memory mapped and the hands are decoded from it as they are read.
+    """
+
+    def __init__(self, path):
+        self.f = open(path, 'rb')
+        try:
+            self.map = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+        except:
+            self.f.close()
+            raise
+        try:
+            self._open()
+        except:
+            self.close()
+            raise
+
+    def _open(self):
+        m = self.map
+        if len(m) < _HEADER.size:
+            raise ValueError('not a hand history file')
+        magic, version = _HEADER.unpack(m[:_HEADER.size])
+        if magic != HISTORY_MAGIC:
+            raise ValueError('not a hand history file')
+        if version != HISTORY_VERSION:
+            raise ValueError('unsupported hand history version %d' % (version,))
+
+        self.start = _HEADER.size
+        self.end = len(m)
+        if len(m) >= _HEADER.size + _FOOTER.size:
+            index_offset, hands, interval, magic = \
+                _FOOTER.unpack(m[len(m) - _FOOTER.size:])
+            if magic == INDEX_MAGIC:
+                self.end = index_offset
+                self.hands = hands
+                self.interval = interval
+                self.index = []
+                n, pos = _get_varint(m, index_offset)
+                offset = 0
+                for _ in xrange(n):
+                    delta, pos = _get_varint(m, pos)
+                    offset += delta
+                    self.index.append(offset)
+                return
+
+        # Not closed: index every record, ignoring a last incomplete
+        # one.
+        self.interval = 1
+        self.index = []
+        pos = self.start
+        while pos < self.end:
+            try:
+                length, data = _get_varint(m, pos)
+            except IndexError:
+                break
+            if data + length > self.end:
+                break
+            self.index.append(pos)
+            pos = data + length
+        self.end = pos
+        self.hands = len(self.index)
+
+    def close(self):
+        self.map.close()
+        self.f.close()
+
+    def __len__(self):
+        return self.hands
+
+    def _offset(self, i):
+        if not 0 <= i < self.hands:
+            raise IndexError('hand %d out of range' % (i,))
+        pos = self.index[i // self.interval]
+        for _ in xrange(i % self.interval):
+            length, pos = _get_varint(self.map, pos)
+            pos += length
+        return pos
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.hands
+        length, pos = _get_varint(self.map, self._offset(i))
+        return HandRecord.decode(self.map, pos)[0]
+
+    def __iter__(self):
+        m = self.map
+        pos = self.start
+        decode = HandRecord.decode
+        for _ in xrange(self.hands):
+            length, pos = _get_varint(m, pos)
+            hand, pos = decode(m, pos)
+            yield hand
+
+    def replay(self, i, sink=None):
+        """Replay hand i, see replay()."""
+
+        return replay(self[i], sink)
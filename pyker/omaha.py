@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2011 Björn Edström <be@bjrn.se>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the University nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE REGENTS AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE REGENTS OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+
+""" Omaha hand evaluation.
+
+In Omaha a hand must use exactly two of the four (PLO4) or five
+(PLO5) hole cards and exactly three of the board cards. Rather than
+evaluating all 60 (or 100) five card hands at the river, the
+evaluation is split in two, using the tables of pyker.evaluator:
+
+  * Non-flush hands only depend on ranks, so the rank keys of the
+    pairs of hole cards and of the triples of board cards are summed
+    and looked up, after removing duplicates: a paired board or hole
+    has fewer distinct triples or pairs.
+
+  * A flush needs three board cards of a suit, so it is only looked
+    for in such a suit, and only with the hole cards of that suit.
+
+And if the board is not paired, no full house or four of a kind is
+possible, so when a flush is found the rank lookups are skipped.
+
+The work on the board is shared between players by evaluate_many(),
+which is what the equity calculations use (see
+pyker.equity.equity(..., omaha=True)).
+"""
+
+import itertools
+
+import pyker.evaluator as evaluator
+
+
+_tables = None
+
+def _get_tables():
+    global _tables
+    if _tables is None:
+        _tables = evaluator.tables()
+    return _tables
+
+
+def _prepare_board(board):
+    # Distinct rank keys of the triples, and per suit with three or
+    # more cards, the distinct rank masks of its triples.
+    t = _get_tables()
+    rank_key = t['rank_key']
+    rank_bit = t['rank_bit']
+
+    keys = set()
+    for a, b, c in itertools.combinations(board, 3):
+        keys.add(rank_key[a] + rank_key[b] + rank_key[c])
+
+    flush = {}
+    for suit in xrange(4):
+        cards = [c for c in board if c & 3 == suit]
+        if len(cards) >= 3:
+            flush[suit] = set([rank_bit[a] | rank_bit[b] | rank_bit[c]
+                               for a, b, c in itertools.combinations(cards, 3)])
+
+    ranks = [c >> 2 for c in board]
+    paired = len(set(ranks)) < len(ranks)
+
+    return sorted(keys), flush, paired
+
+
+def _evaluate(hole, board_keys, board_flush, paired):
+    t = _get_tables()
+    rank_key = t['rank_key']
+    rank_bit = t['rank_bit']
+
+    best = -1
+    if board_flush:
+        flush_table = t['flush_table']
+        for suit, masks in board_flush.iteritems():
+            suited = [c for c in hole if c & 3 == suit]
+            for a, b in itertools.combinations(suited, 2):
+                bits = rank_bit[a] | rank_bit[b]
+                for mask in masks:
+                    score = flush_table[bits | mask]
+                    if score > best:
+                        best = score
+        if best >= 0 and not paired:
+            # Nothing without a flush beats a flush.
+            return best
+
+    score_ranks = evaluator.score_ranks
+    for hole_key in set([rank_key[a] + rank_key[b]
+                         for a, b in itertools.combinations(hole, 2)]):
+        for board_key in board_keys:
+            score = score_ranks(hole_key + board_key)
+            if score > best:
+                best = score
+    return best
+
+
+def _check(hole, board):
+    if not 4 <= len(hole) <= 5:
+        raise ValueError('Omaha hole cards must be four or five cards')
+    if not 3 <= len(board) <= 5:
+        raise ValueError('the board must have three to five cards')
+
+
+def evaluate(hole, board):
+    """Score the best Omaha hand, using exactly two hole cards and
+    three board cards.
+
+    :param hole: four or five card codes.
+    :type hole: [int].
+    :param board: three to five card codes.
+    :type board: [int].
+    :returns: int, same as HandClass.score().
+    """
+
+    _check(hole, board)
+    return _evaluate(hole, *_prepare_board(board))
+
+
+def evaluate_many(holes, board):
+    """Score the best Omaha hand of each of several hole hands on the
+    same board, doing the work on the board once.
+
+    :param holes: hands of four or five card codes.
+    :type holes: [[int]].
+    :param board: three to five card codes.
+    :type board: [int].
+    :returns: [int], the score of each hand.
+    """
+
+    for hole in holes:
+        _check(hole, board)
+    prepared = _prepare_board(board)
+    return [_evaluate(hole, *prepared) for hole in holes]
+
+
+def best_five(hole, board):
+    """Find the best Omaha hand.
+
+    :returns: (score, cards) where cards is a tuple of the two hole
+      card codes and the three board card codes making up the hand.
+    """
+
+    score = evaluate(hole, board)
+    for two in itertools.combinations(hole, 2):
+        for three in itertools.combinations(board, 3):
+            if evaluator.evaluate5(two + three) == score:
+                return score, two + three
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2011 Björn Edström <be@bjrn.se>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the University nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE REGENTS AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE REGENTS OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+
+""" outs: the cards to come that change a hand, for each player.
+
+On the flop or the turn, analyze() deals each unseen card in turn
+and scores every player's hand with it, and on the flop also every
+river after it, so for each card it is known which hand class each
+player makes, who wins and each player's equity after it:
+
+    >>> r = analyze([string_to_cards('ah kh'), string_to_cards('qs qd')],
+    ...             board=string_to_cards('2h 7h qc'))
+    >>> r.outs(0)
+    {<class 'pyker.poker.Flush'>: [...]}
+    >>> r.equity
+
+The board (and each player's hole cards with it) is summarized once
+with pyker.evaluator.state(), and each card only costs adding it to
+the players' states and a lookup per player. Cards held by any of the
+players, on the board or dead are not dealt, so a multiway pot is
+analyzed in one sweep.
+"""
+
+import pyker.evaluator as evaluator
+from pyker.poker import CARDS, HAND_CLASSES, Card
+
+
+def _code(card):
+    return card.code if isinstance(card, Card) else card
+
+
+class Runout(object):
+    """The outcome of one card to come.
+
+    :ivar card: the card code.
+    :ivar scores: the players' scores with it.
+    :ivar winners: the indexes of the players with the best score.
+    :ivar equity: the players' equity with it. On the turn, where the
+      card is the river, the share of the pot.
+    """
+
+    __slots__ = ('card', 'scores', 'winners', 'equity')
+
+    def __init__(self, card, scores, winners, equity):
+        self.card = card
+        self.scores = scores
+        self.winners = winners
+        self.equity = equity
+
+    def category(self, player):
+        """The hand category of a player with this card."""
+        return self.scores[player] // evaluator.CATEGORY_BASE
+
+    def __repr__(self):
+        return '<Runout %s winners=%s>' % (CARDS[self.card], self.winners)
+
+
+class OutsResult(object):
+    """The outcome of every card to come.
+
+    :ivar scores: the players' scores now.
+    :ivar leaders: the indexes of the players with the best score now.
+    :ivar runouts: a Runout per unseen card, by card code.
+    """
+
+    def __init__(self, scores, runouts):
+        self.scores = scores
+        best = max(scores)
+        self.leaders = [i for i, s in enumerate(scores) if s == best]
+        self.runouts = runouts
+
+    @property
+    def equity(self):
+        """The players' equity, over all runouts to the river."""
+
+        n = len(self.runouts)
+        return [sum([r.equity[i] for r in self.runouts]) / n
+                for i in xrange(len(self.scores))]
+
+    def _group(self, cards):
+        groups = {}
+        for r in cards:
+            groups.setdefault(HAND_CLASSES[r[1]], []).append(r[0])
+        return groups
+
+    def outs(self, player, ties=False):
+        """The cards after which player has the best hand, alone or,
+        if ties is True, tied. For a player behind, these are the
+        outs.
+
+        :returns: dict of HandClass subclass to the card codes that
+          make the player that hand.
+        """
+
+        return self._group([(r.card, r.category(player)) for r in self.runouts
+                            if player in r.winners and (ties or len(r.winners) == 1)])
+
+    def improvements(self, player):
+        """The cards that give player a better hand category than now,
+        whether it wins or not.
+
+        :returns: dict of HandClass subclass to card codes.
+        """
+
+        now = self.scores[player] // evaluator.CATEGORY_BASE
+        return self._group([(r.card, r.category(player)) for r in self.runouts
+                            if r.category(player) > now])
+
+    def __repr__(self):
+        return '<OutsResult leaders=%s equity=%s>' % (
+            self.leaders, ' '.join('%.4f' % e for e in self.equity))
+
+
+def _shares(scores, shares):
+    # Add the pot shares of a runout to shares.
+    best = max(scores)
+    winners = [i for i, s in enumerate(scores) if s == best]
+    share = 1.0 / len(winners)
+    for i in winners:
+        shares[i] += share
+    return winners
+
+
+def analyze(holes, board, dead=()):
+    """Analyze the next card for each player.
+
+    :param holes: the hole cards of the players.
+    :type holes: [[Card]] or [[int]].
+    :param board: the flop or the turn.
+    :type board: [Card] or [int].
+    :param dead: other cards known to be out of the deck.
+    :type dead: [Card] or [int].
+    :returns: OutsResult.
+    :raises ValueError: if the board is not three or four cards, or
+      the same card is given more than once.
+    """
+
+    holes = [[_code(c) for c in hole] for hole in holes]
+    board = [_code(c) for c in board]
+    known = sum(holes, []) + board + [_code(c) for c in dead]
+    if len(board) not in (3, 4):
+        raise ValueError('expected a flop or a turn')
+    if not holes or any(len(hole) != 2 for hole in holes):
+        raise ValueError('expected two hole cards per player')
+    if len(set(known)) != len(known):
+        raise ValueError('the same card is given more than once')
+
+    score = evaluator.score_state
+    add_card = evaluator.add_card
+    states = [evaluator.state(hole + board) for hole in holes]
+    n = len(holes)
+    unseen = [c for c in xrange(52) if c not in known]
+
+    runouts = []
+    for card in unseen:
+        after = [add_card(st, card) for st in states]
+        scores = [score(st) for st in after]
+
+        shares = [0.0] * n
+        winners = _shares(scores, shares)
+        if len(board) == 3:
+            # Deal each river after the turn card.
+            shares = [0.0] * n
+            for river in unseen:
+                if river == card:
+                    continue
+                _shares([score(add_card(st, river)) for st in after], shares)
+            shares = [x / (len(unseen) - 1) for x in shares]
+        runouts.append(Runout(card, scores, winners, shares))
+
+    return OutsResult([score(st) for st in states], runouts)
@@ -28,29 +28,50 @@
 # OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
 # SUCH DAMAGE.
 
+import random
+
+import pyker.evaluator as evaluator
+import pyker.omaha as omaha
+
 # TODO (bjorn): I'm not sure how it happened, but the code below
 # turned out to be too-god-d**n-object-oriented :-) Should perhaps
 # rewrite to be either more pythonic, or adapt OOP fully.
 
+# Cards are interned: there are exactly 13 Rank objects and 52 Card
+# objects, created once when this module is loaded. Constructing a
+# Rank or a Card (or parsing one from a string) returns one of these
+# singletons, so no allocation happens per hand, and equality is
+# identity.
+#
+# Every Card also carries a compact integer code in 0..51, laid out so
+# that code // 4 is the rank (0 for Twos, 12 for Aces) and code % 4 is
+# the suit index in SUITS. Ordering cards by code is the same as
+# ordering them by (rank, suit).
+
+SUITS = 'cdhs'
+
+
 class Rank(object):
     """A Rank object for playing card ranks, representing Twos,
     Threes, Fours, Fives, Sixs, Sevens, Eights, Nines, Tens, Jacks,
     Queens, Kings and Aces.
     """
 
-    def __init__(self, rank):
-        """Construct a Rank.
+    __slots__ = ('rank',)
+
+    def __new__(cls, rank):
+        """Return the Rank singleton.
 
         :param rank: 2,3,4,5,6,7,8,9,'t','j','q','k','a'.
         :param rank: int or str.
         """
 
         if rank in ('t', 'T', 'j', 'J', 'q', 'Q', 'k', 'K', 'a', 'A'):
-            self.rank = self.__RANKS.index(rank.lower())
-        else:
-            self.rank = rank
+            rank = cls.__RANKS.index(rank.lower())
 
-        assert self.rank in xrange(2, 15)
+        assert rank in xrange(2, 15)
+
+        return RANKS[rank - 2]
 
     def __hash__(self):
         return hash(self.rank)
@@ -84,6 +105,9 @@ class Rank(object):
     def __repr__(self):
         return '<Rank %s>' % (self.rank,)
 
+    def __reduce__(self):
+        return (Rank, (self.rank,))
+
     __RANKS = 'xx23456789tjqka'
 
     @staticmethod
@@ -100,13 +124,15 @@ class Card(object):
     """A playing card, which has a rank and a suit.
     """
 
+    __slots__ = ('rank', 'suit', 'code')
+
     HEART = 'h'
     SPADES = 's'
     CLUBS = 'c'
     DIAMONDS = 'd'
 
-    def __init__(self, rank, suit):
-        """Create a new playing card.
+    def __new__(cls, rank, suit):
+        """Return the playing card singleton.
 
         You probably want to use Card.from_string().
 
@@ -117,13 +143,12 @@ class Card(object):
         :type suit: str.
         """
 
-        self.rank = rank
-        self.suit = suit
+        assert suit in ('h', 's', 'c', 'd')
 
-        assert self.suit in ('h', 's', 'c', 'd')
+        return CARDS[(rank.rank - 2) * 4 + SUITS.index(suit)]
 
     def __cmp__(self, other):
-        return cmp((self.rank, self.suit), (other.rank, other.suit))
+        return cmp(self.code, other.code)
 
     def __str__(self):
         return '%s%s' % (self.rank, self.suit)
@@ -131,26 +156,157 @@ class Card(object):
     def __repr__(self):
         return '<Card rank=%r suit=%s>' % (self.rank, self.suit)
 
+    def __reduce__(self):
+        return (card_from_code, (self.code,))
+
     @staticmethod
     def from_string(s):
         """Construct a new Card from the string representation.
         """
 
         try:
-            rank_str, suit = s[0], s[1]
-        except:
-            raise ValueError('Invalid Card %s' % (s,))
-        rank = Rank.from_string(rank_str)
-        try:
-            return Card(rank, suit)
-        except AssertionError:
+            return _CARDS_BY_STRING[s[0].lower() + s[1]]
+        except (IndexError, KeyError, TypeError):
             raise ValueError('Invalid Card %s' % (s,))
 
+
+def _make_ranks():
+    ranks = []
+    for r in xrange(2, 15):
+        rank = object.__new__(Rank)
+        rank.rank = r
+        ranks.append(rank)
+    return tuple(ranks)
+
+def _make_cards():
+    cards = []
+    for code in xrange(52):
+        card = object.__new__(Card)
+        card.rank = RANKS[code // 4]
+        card.suit = SUITS[code % 4]
+        card.code = code
+        cards.append(card)
+    return tuple(cards)
+
+# The 13 Rank singletons, Twos first.
+RANKS = _make_ranks()
+
+# The 52 Card singletons, indexed by card code.
+CARDS = _make_cards()
+
+_CARDS_BY_STRING = dict((str(c), c) for c in CARDS)
+
+
+def card_from_code(code):
+    """Return the Card with the given integer code (0..51).
+    """
+
+    return CARDS[code]
+
+
+class Deck(object):
+    """A deck of cards to deal from.
+
+    The cards are kept in one array which is reused between hands.
+    Cards are dealt from a cursor, and each card is picked at random
+    from the undealt part of the array as it is dealt (a partial
+    Fisher-Yates shuffle), so dealing a hand costs the same whatever
+    the number of hands dealt before, and only the cards actually
+    dealt are shuffled.
+    """
+
+    def __init__(self, cards=CARDS, rng=None):
+        """Create a new Deck.
+
+        :param cards: the cards in the deck, Cards by default, but
+          anything works, such as card codes.
+        :param rng: random generator to shuffle with, such as a
+          random.Random. The random module by default.
+        """
+
+        self.cards = list(cards)
+        self.rng = rng if rng is not None else random
+        self.size = len(self.cards) # excluding dead cards
+        self.pos = 0
+
+    def reset(self, dead=()):
+        """Put all cards back into the deck, except the dead cards.
+
+        :param dead: cards that may not be dealt.
+        """
+
+        self.pos = 0
+        self.size = len(self.cards)
+        cards = self.cards
+        for card in dead:
+            # Move dead cards past the end of the deck.
+            i = cards.index(card)
+            if i >= self.size:
+                continue
+            self.size -= 1
+            cards[i], cards[self.size] = cards[self.size], cards[i]
+
+    def deal(self):
+        """Deal a card."""
+
+        i = self.pos
+        n = self.size - i
+        if n <= 0:
+            raise ValueError('no cards left in deck')
+        j = i + int(self.rng.random() * n)
+        cards = self.cards
+        card = cards[j]
+        cards[j] = cards[i]
+        cards[i] = card
+        self.pos = i + 1
+        return card
+
+    def deal_many(self, n):
+        """Deal n cards.
+
+        :returns: list of cards.
+        """
+
+        return [self.deal() for _ in xrange(n)]
+
+    def burn(self):
+        """Discard a card."""
+
+        self.deal()
+
+    def __len__(self):
+        return self.size - self.pos
+
+
 class HandClass(object):
+    """The classification of a five card hand, such as a Flush with
+    given kickers. HandClasses are immutable, compare and hash by
+    score(), and compute the score at most once.
+    """
+
+    __slots__ = ('_cached_score',)
+
+    def _set(self, **fields):
+        # Set fields in __init__, which is the only place they are
+        # set.
+        for name, value in fields.iteritems():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('%s is immutable' % (self.__class__.__name__,))
+
+    def __delattr__(self, name):
+        raise AttributeError('%s is immutable' % (self.__class__.__name__,))
+
     def score(self):
         """Calculate an integer score for this hand classification.
         """
 
+        try:
+            return self._cached_score
+        except AttributeError:
+            pass
+
         # Scoring works by considering each HandClass as a tuple, most
         # significant information first, and converting this tuple to
         # a base-13 integer (because their are 13 unique ranks).
@@ -163,32 +319,102 @@ class HandClass(object):
         #
         # The most significant item in the tuple is the type of the
         # hand class itself. This we get from HandClass.SCORE:
-        score = self.SCORE * 13**5
+        score = 0
 
         # HandClasses implement _score() which returns the remaining
         # tuple of Ranks, ordered with most significant information
         # first:
-        ranks = self._score()
-        for i, r in enumerate(reversed(ranks)): #xrange(len(ranks)):
+        for r in self._score():
             # Subtract 2 so we can use a base-13 number instead of
             # base-15.
-            score += (r.rank - 2) * 13**i
+            score = score * 13 + r.rank - 2
+        score += self.SCORE * 13**5
+
+        object.__setattr__(self, '_cached_score', score)
         return score
 
+    def sort_key(self):
+        """Return a key for sorting, weakest first. The same as
+        score().
+        """
+
+        return self.score()
+
     def _score(self):
         raise NotImplementedError('not implemented')
 
-    def __cmp__(self, other):
-        return cmp(self.score(), other.score())
+    @classmethod
+    def _from_ranks(cls, ranks):
+        # Inverse of _score().
+        return cls(*ranks)
+
+    @staticmethod
+    def from_score(score):
+        """Construct the HandClass for an integer score, as returned
+        by score() or by the functions in pyker.evaluator.
+        """
+
+        if not 0 <= score < len(HAND_CLASSES) * 13**5:
+            raise ValueError('not a hand score: %r' % (score,))
+        cls = HAND_CLASSES[score // 13**5]
+        rest = score % 13**5
+        ranks = []
+        for _ in xrange(cls.DIGITS):
+            ranks.append(RANKS[rest % 13])
+            rest //= 13
+        ranks.reverse()
+        hc = cls._from_ranks(ranks)
+        object.__setattr__(hc, '_cached_score', score)
+        return hc
+
+    def __eq__(self, other):
+        if not isinstance(other, HandClass):
+            return NotImplemented
+        return self.score() == other.score()
+
+    def __ne__(self, other):
+        if not isinstance(other, HandClass):
+            return NotImplemented
+        return self.score() != other.score()
+
+    def __lt__(self, other):
+        if not isinstance(other, HandClass):
+            return NotImplemented
+        return self.score() < other.score()
+
+    def __le__(self, other):
+        if not isinstance(other, HandClass):
+            return NotImplemented
+        return self.score() <= other.score()
+
+    def __gt__(self, other):
+        if not isinstance(other, HandClass):
+            return NotImplemented
+        return self.score() > other.score()
+
+    def __ge__(self, other):
+        if not isinstance(other, HandClass):
+            return NotImplemented
+        return self.score() >= other.score()
+
+    def __hash__(self):
+        return hash(self.score())
+
+    def __reduce__(self):
+        return (_hand_class_from_score, (self.score(),))
 
     def __repr__(self):
-        return '<%s %r>' % (self.__class__.__name__, self.__dict__)
+        fields = ['%s=%r' % (name, getattr(self, name)) for name in self.__slots__]
+        return '<%s %s>' % (self.__class__.__name__, ' '.join(fields))
 
 class StraightFlush(HandClass):
+    __slots__ = ('highest',)
+
     SCORE = 8
+    DIGITS = 1
 
     def __init__(self, highest):
-        self.highest = highest
+        self._set(highest=highest)
 
     def _score(self):
         return (self.highest,)
@@ -197,11 +423,13 @@ class StraightFlush(HandClass):
         return 'Straight Flush, %s High' % (self.highest.pretty(),)
 
 class FourOfAKind(HandClass):
+    __slots__ = ('four', 'kicker')
+
     SCORE = 7
+    DIGITS = 2
 
     def __init__(self, four, kicker):
-        self.four = four
-        self.kicker = kicker
+        self._set(four=four, kicker=kicker)
 
     def _score(self):
         return (self.four, self.kicker)
@@ -210,11 +438,13 @@ class FourOfAKind(HandClass):
         return 'Four of a Kind of %ss, kicker %s' % (self.four.pretty(), self.kicker.pretty())
 
 class FullHouse(HandClass):
+    __slots__ = ('three', 'two')
+
     SCORE = 6
+    DIGITS = 2
 
     def __init__(self, three, two):
-        self.three = three
-        self.two = two
+        self._set(three=three, two=two)
 
     def _score(self):
         return (self.three, self.two)
@@ -223,22 +453,32 @@ class FullHouse(HandClass):
         return 'Full House, 3 %ss and 2 %ss' % (self.three.pretty(), self.two.pretty())
 
 class Flush(HandClass):
+    __slots__ = ('kickers',)
+
     SCORE = 5
+    DIGITS = 5
 
     def __init__(self, kickers):
-        self.kickers = kickers
+        self._set(kickers=kickers)
 
     def _score(self):
         return  self.kickers
 
+    @classmethod
+    def _from_ranks(cls, ranks):
+        return cls(tuple(ranks))
+
     def __str__(self):
         return 'Flush with %s' % (', '.join(map(lambda s: s.pretty(), self.kickers)),)
 
 class Straight(HandClass):
+    __slots__ = ('highest',)
+
     SCORE = 4
+    DIGITS = 1
 
     def __init__(self, highest):
-        self.highest = highest
+        self._set(highest=highest)
 
     def _score(self):
         return (self.highest,)
@@ -247,26 +487,33 @@ class Straight(HandClass):
         return 'Straight, %s High' % (self.highest.pretty(),)
 
 class ThreeOfAKind(HandClass):
+    __slots__ = ('three', 'kickers')
+
     SCORE = 3
+    DIGITS = 3
 
     def __init__(self, three, kickers):
-        self.three = three
-        self.kickers = kickers
+        self._set(three=three, kickers=kickers)
 
     def _score(self):
         return (self.three,) + self.kickers
 
+    @classmethod
+    def _from_ranks(cls, ranks):
+        return cls(ranks[0], tuple(ranks[1:]))
+
     def __str__(self):
         kickers = ', '.join(map(lambda s: s.pretty(), self.kickers))
         return 'Three of a Kind of %ss with %s' % (self.three.pretty(), kickers)
 
 class TwoPair(HandClass):
+    __slots__ = ('high_pair', 'low_pair', 'kicker')
+
     SCORE = 2
+    DIGITS = 3
 
     def __init__(self, high_pair, low_pair, kicker):
-        self.high_pair = high_pair
-        self.low_pair = low_pair
-        self.kicker = kicker
+        self._set(high_pair=high_pair, low_pair=low_pair, kicker=kicker)
 
     def _score(self):
         return (self.high_pair, self.low_pair, self.kicker)
@@ -275,46 +522,100 @@ class TwoPair(HandClass):
         return 'Two Pairs of %ss and %ss, kicker %s' % (self.high_pair.pretty(), self.low_pair.pretty(), self.kicker.pretty())
 
 class Pair(HandClass):
+    __slots__ = ('pair', 'kickers')
+
     SCORE = 1
+    DIGITS = 4
 
     def __init__(self, pair, kickers):
-        self.pair = pair
-        self.kickers = kickers
+        self._set(pair=pair, kickers=kickers)
 
     def _score(self):
         return (self.pair,) + self.kickers
 
+    @classmethod
+    def _from_ranks(cls, ranks):
+        return cls(ranks[0], tuple(ranks[1:]))
+
     def __str__(self):
         kickers = ', '.join(map(lambda s: s.pretty(), self.kickers))
         return 'Pair of %ss with %s' % (self.pair.pretty(), kickers)
 
 class Highest(HandClass):
+    __slots__ = ('kickers',)
+
     SCORE = 0
+    DIGITS = 5
 
     def __init__(self, kickers):
-        self.kickers = kickers
+        self._set(kickers=kickers)
 
     def _score(self):
         return self.kickers
 
+    @classmethod
+    def _from_ranks(cls, ranks):
+        return cls(tuple(ranks))
+
     def __str__(self):
         return 'Highest Cards %s' % (', '.join(map(lambda s: s.pretty(), self.kickers)),)
 
+# The HandClass subclasses by category, weakest first, see
+# pyker.evaluator.category().
+HAND_CLASSES = (Highest, Pair, TwoPair, ThreeOfAKind, Straight, Flush,
+                FullHouse, FourOfAKind, StraightFlush)
+
+def _hand_class_from_score(score):
+    # For pickling.
+    return HandClass.from_score(score)
+
+
 class Hand(object):
     """A poker hand which is conceptually a set of cards.
+
+    Hands are immutable, and are compared, and hashed, by strength:
+    two hands with different cards but the same score are equal. The
+    score and the classification are computed at most once.
     """
 
-    def __init__(self, cards):
+    __slots__ = ('cards', '_cached_score', '_cached_class')
+
+    def __init__(self, cards, score=None):
         """Create a new Hand.
 
         :param cards: A list of Cards.
         :type cards: [Card].
+        :param score: the score of the cards, if already known.
+        :type score: int.
         """
 
-        self.cards = cards
+        object.__setattr__(self, 'cards', tuple(cards))
+        if score is not None:
+            object.__setattr__(self, '_cached_score', score)
 
-    def __cmp__(self, other):
-        return cmp(self.classify(), other.classify())
+    def __setattr__(self, name, value):
+        raise AttributeError('Hand is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('Hand is immutable')
+
+    def score(self):
+        """Calculate the integer score of this hand, without
+        constructing its HandClass.
+
+        :returns: int, same as self.classify().score().
+        """
+
+        try:
+            return self._cached_score
+        except AttributeError:
+            pass
+
+        assert len(self.cards) == 5
+
+        score = evaluator.evaluate5([c.code for c in self.cards])
+        object.__setattr__(self, '_cached_score', score)
+        return score
 
     def classify(self):
         """Attempt to classify this hand to a subclass of HandClass.
@@ -322,68 +623,55 @@ class Hand(object):
         :returns: A HandClass instance.
         """
 
-        assert len(self.cards) == 5
+        try:
+            return self._cached_class
+        except AttributeError:
+            hc = HandClass.from_score(self.score())
+            object.__setattr__(self, '_cached_class', hc)
+            return hc
+
+    def sort_key(self):
+        """Return a key for sorting, weakest first. The same as
+        score().
+        """
 
-        ranks = sorted((c.rank for c in self.cards))
-
-        # Highest card if straight
-        straight = None
-
-        # Special case when ace is low:
-        if ranks == [Rank(2), Rank(3), Rank(4), Rank(5), Rank('A')]:
-            straight = Rank(5)
-
-        # All the other ("normal") straights:
-        elif ranks == map(Rank, range(ranks[0].rank, ranks[4].rank + 1)):
-            straight = ranks[4]
-
-        # Is a flush?
-        flush = all((c.suit == self.cards[0].suit
-                     for c in self.cards))
-
-        # We now have enough info to determine three hand classes:
-        if straight is not None and flush:
-            return StraightFlush(straight)
-
-        if flush:
-            return Flush((ranks[4], ranks[3], ranks[2], ranks[1], ranks[0]))
-
-        if straight is not None:
-            return Straight(straight)
-
-        # Determine pairs, required for further classifications.
-        pairs = {}
-        for r in ranks:
-            try:
-                pairs[r] += 1
-            except:
-                pairs[r] = 1
-        has = {
-            1: [],
-            2: [],
-            3: [],
-            4: [],
-            }
-        for r, num in pairs.iteritems():
-            has[num].append(r)
+        return self.score()
 
-        if has[4]:
-            return FourOfAKind(max(has[4]), max(has[1]))
+    def __eq__(self, other):
+        if not isinstance(other, Hand):
+            return NotImplemented
+        return self.score() == other.score()
 
-        if has[3] and has[2]:
-            return FullHouse(max(has[3]), max(has[2]))
+    def __ne__(self, other):
+        if not isinstance(other, Hand):
+            return NotImplemented
+        return self.score() != other.score()
 
-        if has[3]:
-            return ThreeOfAKind(max(has[3]), (max(has[1]), min(has[1])))
+    def __hash__(self):
+        return hash(self.score())
+
+    def __lt__(self, other):
+        if not isinstance(other, Hand):
+            return NotImplemented
+        return self.score() < other.score()
 
-        if len(has[2]) == 2:
-            return TwoPair(max(has[2]), min(has[2]), max(has[1]))
+    def __le__(self, other):
+        if not isinstance(other, Hand):
+            return NotImplemented
+        return self.score() <= other.score()
 
-        if len(has[2]) == 1:
-            kick = sorted(has[1])
-            return Pair(max(has[2]), (kick[2], kick[1], kick[0]))
+    def __gt__(self, other):
+        if not isinstance(other, Hand):
+            return NotImplemented
+        return self.score() > other.score()
 
-        return Highest((ranks[4], ranks[3], ranks[2], ranks[1], ranks[0]))
+    def __ge__(self, other):
+        if not isinstance(other, Hand):
+            return NotImplemented
+        return self.score() >= other.score()
+
+    def __reduce__(self):
+        return (Hand, (self.cards, self.score()))
 
     @staticmethod
     def best_from_seven(*cards):
@@ -393,15 +681,27 @@ class Hand(object):
         :type *cards: [Card]
         :returns: Hand
         """
-        # Instead of thinking of this as "7 choose 5", we think of "7
-        # remove 2" which is easier to implement.
+        assert len(cards) == 7
 
-        best = None
-        for r1 in range(7):
-            for r2 in range(r1 + 1, 7):
-                hand = Hand([cards[i] for i in range(7) if i not in (r1, r2)])
-                best = hand if best is None else max(best, hand)
-        return best
+        score, best = evaluator.best_five([c.code for c in cards])
+        return Hand([CARDS[code] for code in best], score)
+
+    @staticmethod
+    def best_from_omaha(hole, board):
+        """Given four or five hole cards and three to five board
+        cards, construct the best 5 card Omaha hand: two hole cards
+        and three board cards.
+
+        :param hole: the hole cards.
+        :type hole: [Card]
+        :param board: the board.
+        :type board: [Card]
+        :returns: Hand
+        """
+
+        score, best = omaha.best_five([c.code for c in hole],
+                                      [c.code for c in board])
+        return Hand([CARDS[code] for code in best], score)
 
     @staticmethod
     def from_string(s):
@@ -414,6 +714,18 @@ class Hand(object):
         return '<Hand %s>' % (' '.join(map(str, self.cards)))
 
 
+def score_best(cards):
+    """Given five to seven cards, calculate the integer score of the
+    best 5 card hand, without constructing any Hand.
+
+    :param cards: list of cards
+    :type cards: [Card]
+    :returns: int, same as Hand.best_from_seven(*cards).score().
+    """
+
+    return evaluator.evaluate([c.code for c in cards])
+
+
 def string_to_cards(s):
     """Given a string, return a list of Cards.
     """
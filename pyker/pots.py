@@ -30,6 +30,7 @@
 """ module for handling multiple pots.
 """
 
+import bisect
 import logging
 
 log = logging.getLogger(__name__)
@@ -37,14 +38,25 @@ log = logging.getLogger(__name__)
 
 class Pots(object):
     """Keeps track of the different pots, who has stakes in each etc.
+
+    Only the total contribution of each player is stored, together
+    with the sorted contribution levels at which some player went
+    all-in. The main pot is everything up to the lowest level, the
+    first side pot everything between the lowest and the next level
+    and so on, with a last unlimited pot above the highest level. The
+    pots are derived from this when asked for, in one pass over the
+    players sorted by contribution, so posting is O(log n) in the
+    number of all-ins, whatever the number of pots.
     """
 
     def __init__(self):
         self.clear()
 
     def clear(self):
-        self.pots = {} # name -> ps -> num chips
-        self.pots_limited = {} # name -> limited?
+        self.contrib = {} # ps -> num chips in total
+        self.levels = [] # sorted all-in contributions
+        self.started = False
+        self._pots = None
 
     def post(self, ps, chips):
         """Post a bet into the pots.
@@ -63,76 +75,90 @@ class Pots(object):
           (which can happen if the player calls, for example).
         """
 
-        if not self.pots:
-            # Create main pot
+        if not self.started:
             log.debug('creating pot 0')
-            self.pots[0] = {}
-            self.pots_limited[0] = False
-
-        # Find the pots this player has a stake in and has not fully
-        # contributed to:
-        new_pots = []
-        for pot_idx, stakes in self.pots.iteritems():
-            if ps.chips == 0 or chips == 0:
-                break
-
-            if ps not in stakes:
-                stakes[ps] = 0
-
-            # Determine how many chips to post in this pot, and
-            # whether it means player goes all-in.
-            all_in = False
-            post = chips
-            if self.pots_limited[pot_idx]:
-                post = min(post, max(stakes.values()) - stakes[ps])
-            if post >= ps.chips:
-                post = ps.chips
-                all_in = True
-
-            # Move chipts from the player to the pot
-            ps.chips -= post
-            stakes[ps] += post
-            chips -= post
-
-            log.debug('%s posts %s in pot %s - player has %s remaining. All In: %s' % (ps, post, pot_idx, ps.chips, all_in))
-
-            # Mark this as a limited pot: further bets may create a
-            # side pot.
-            if all_in:
-                self.pots_limited[pot_idx] = True
-
-                # Maybe move chips to a side pot
-                new_side_pot = {}
-                for other_ps, value in stakes.iteritems():
-                    if value > stakes[ps]:
-                        new_side_pot[other_ps] = value - stakes[ps]
-                        stakes[other_ps] = stakes[ps]
-                if new_side_pot:
-                    new_pots.append(new_side_pot)
-
-        for new_pot in new_pots:
-            i = max(self.pots.keys()) + 1
-            self.pots[i] = new_pot
-            self.pots_limited[i] = False
-
-        # Player has remaining chips. Create new pot
-        if ps.chips and chips:
-            i = max(self.pots.keys()) + 1
-            self.pots[i] = {}
-            self.pots_limited[i] = False
-
-            log.debug('creating pot %s', i)
-
-            self.pots[i][ps] = chips
-            ps.chips -= chips
-            log.debug('%s posts %s in pot %s - player has %s remaining' % (ps, chips, i, ps.chips))
-            chips = 0
-
-        log.debug('pots:')
-        for name, pot in self.pots.iteritems():
-            log.debug('pot %d (limited: %s)' % (name, self.pots_limited[name]))
-            for k, v in pot.iteritems():
-                log.debug('\t%s\t%s', k, v)
+            self.started = True
+            self._pots = None
+
+        if ps.chips == 0 or chips <= 0:
+            return
+
+        post = min(chips, ps.chips)
+        ps.chips -= post
+        total = self.contrib[ps] = self.contrib.get(ps, 0) + post
+        self._pots = None
+
+        log.debug('%s posts %s - player has %s remaining. All In: %s' % (ps, post, ps.chips, ps.chips == 0))
+
+        # Mark the level of the all-in: further bets above it go to a
+        # side pot.
+        if ps.chips == 0:
+            self._add_level(total)
+
+    def _add_level(self, level):
+        i = bisect.bisect_left(self.levels, level)
+        if i == len(self.levels) or self.levels[i] != level:
+            self.levels.insert(i, level)
+
+    def add_pot(self, stakes, limited=False):
+        """Add a pot on top of the existing ones, such as for setting
+        up the pots of a game in progress.
+
+        :param stakes: dict of ps -> num chips in the pot.
+        :param limited: True if the pot is limited: further bets are
+          capped at the highest stake in the pot, with the excess
+          going to a side pot.
+        """
+
+        self.started = True
+        self._pots = None
+        for ps, chips in stakes.iteritems():
+            self.contrib[ps] = self.contrib.get(ps, 0) + chips
+        if limited and stakes:
+            self._add_level(max([self.contrib[ps] for ps in stakes]))
+
+    def _build(self):
+        pots = {}
+        pots_limited = {}
+        bounds = []
+        if self.started:
+            players = sorted(self.contrib.iteritems(), key=lambda (ps, n): n)
+            amounts = [n for ps, n in players]
+            low = 0
+            for high in self.levels + [None]:
+                # Everyone who has contributed more than the previous
+                # level has a stake in this pot.
+                first = bisect.bisect_right(amounts, low)
+                if high is None:
+                    stakes = dict((ps, n - low) for ps, n in players[first:])
+                    if not stakes and pots:
+                        break
+                else:
+                    stakes = dict((ps, min(n, high) - low) for ps, n in players[first:])
+                i = len(pots)
+                pots[i] = stakes
+                pots_limited[i] = high is not None
+                bounds.append(low)
+                low = high
+        self._pots = pots, pots_limited, bounds
+
+    @property
+    def pots(self):
+        """Dict of pot index -> ps -> num chips, 0 being the main pot.
+        """
+
+        if self._pots is None:
+            self._build()
+        return self._pots[0]
+
+    @property
+    def pots_limited(self):
+        """Dict of pot index -> whether the pot is limited.
+        """
+
+        if self._pots is None:
+            self._build()
+        return self._pots[1]
 
     def list(self):
         """Yields information about pots and which players have stakes
@@ -142,6 +168,57 @@ class Pots(object):
           players and total is the total amount in the pot.
         """
 
-        for name, pot in self.pots.iteritems():
+        pots = self.pots
+        for name in xrange(len(pots)):
+            pot = pots[name]
             if pot:
                 yield pot.keys(), sum(pot.values())
+
+    def settle(self, rankings):
+        """Pay out all pots.
+
+        Each pot goes to the best ranked players with a stake in it,
+        split evenly. Odd chips that can not be split go one each to
+        the tied winners in the order they are given in the ranking.
+        Pots that no ranked player has a stake in (everyone in it has
+        folded) are given back to the players that contributed.
+
+        :param rankings: list of lists of players, best hand first,
+          each list being players with equal hands. Players that have
+          folded should not be in it.
+        :returns: list of (total, [(ps, chips)]) with the winnings of
+          each pot, in pot order. The chips are not added to the
+          players.
+        """
+
+        if self._pots is None:
+            self._build()
+        pots, _, bounds = self._pots
+        contrib = self.contrib
+
+        # Higher pots have fewer players with a stake, so the best
+        # ranked players with a stake in a pot are never ranked higher
+        # than those of the pot below.
+        rank = 0
+        result = []
+        for i in xrange(len(pots)):
+            stakes = pots[i]
+            total = sum(stakes.itervalues())
+            if not stakes:
+                continue
+            low = bounds[i]
+            winners = []
+            while rank < len(rankings):
+                winners = [ps for ps in rankings[rank] if contrib.get(ps, 0) > low]
+                if winners:
+                    break
+                rank += 1
+
+            if not winners:
+                result.append((total, stakes.items()))
+                continue
+
+            share, odd = divmod(total, len(winners))
+            result.append((total, [(ps, share + (1 if j < odd else 0))
+                                   for j, ps in enumerate(winners)]))
+        return result
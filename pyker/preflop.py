@@ -0,0 +1,499 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2011 Björn Edström <be@bjrn.se>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the University nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE REGENTS AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE REGENTS OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+
+""" heads-up preflop all-in equities, precomputed.
+
+There are 1326 * 1225 heads-up preflop matchups, but only 47,008 up
+to a permutation of the suits and the order of the players (see
+pyker.canonical). generate() computes each of them exactly, in a
+multiprocessing pool, and saves the number of runouts won and tied in
+a table file, along with the equities of the 169 * 169 starting hand
+classes (AA, AKs, AKo, ...). The table is shipped with the package as
+preflop.table.
+
+Each matchup is computed with pyker.batch.Boards, which scores both
+hole cards with every board at once, in about 50 ms. Without numpy,
+pyker.equity.exact_equity() is used instead, which takes seconds per
+matchup. Either way the work is saved to a checkpoint file as it is
+done, and a generate() that is interrupted continues from the
+checkpoint when run again. See scripts/pyker-preflop.
+
+A PreflopTable answers a lookup of two exact hole cards, or of two
+classes, in constant time:
+
+    >>> t = PreflopTable.load()
+    >>> t.equity(string_to_cards('ah kh'), string_to_cards('qs qd'))
+    >>> t.class_equity('AKs', 'QQ')
+
+The table file is
+
+    header: magic (8 bytes), version, number of matchups (uint32),
+            sha1 of the rest of the file (20 bytes)
+    matchups: canonical hole cards of both players (4 bytes), runouts
+              won and tied by the first player (uint32 each), sorted
+    classes: the equity of each class against each class (float32),
+             169 * 169, by class_index()
+
+all little endian. The checkpoint file is a header of magic and
+version, followed by matchups in the same format, in any order.
+"""
+
+import array
+import hashlib
+import itertools
+import logging
+import multiprocessing
+import os
+import struct
+import sys
+
+import pyker.equity as equity
+from pyker.canonical import canonicalize, canonical_key
+from pyker.poker import CARDS, Card
+
+try:
+    import pyker.batch as batch
+except ImportError:
+    # Without numpy, matchups are computed with exact_equity().
+    batch = None
+
+
+log = logging.getLogger(__name__)
+
+
+PREFLOP_MAGIC = 'PYKERPFT'
+CHECKPOINT_MAGIC = 'PYKERPFC'
+PREFLOP_VERSION = 1
+
+# Runouts of the board for every matchup, 48 choose 5.
+RUNOUTS = 1712304
+
+CLASSES = 169
+
+_HEADER = struct.Struct('<8sII20s')
+_CHECKPOINT_HEADER = struct.Struct('<8sI')
+_RECORD = struct.Struct('<4BII')
+
+_RANK_CHARS = '23456789TJQKA'
+
+
+def table_path():
+    """Return the path of the table file. This is the environment
+    variable PYKER_PREFLOP if set, otherwise preflop.table next to
+    this module.
+    """
+
+    return os.environ.get('PYKER_PREFLOP') or \
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'preflop.table')
+
+
+def _code(card):
+    return card.code if isinstance(card, Card) else card
+
+
+def class_index(a, b):
+    """Return the index of the starting hand class of two hole cards,
+    from 0 to 168. With rank indexes from 0 (Two) to 12 (Ace), a pair
+    is rank * 14, suited hands high * 13 + low and offsuit hands
+    low * 13 + high.
+
+    :param a: Card or card code.
+    :param b: Card or card code.
+    """
+
+    a, b = _code(a), _code(b)
+    high, low = max(a >> 2, b >> 2), min(a >> 2, b >> 2)
+    if high != low and (a & 3) != (b & 3):
+        return low * 13 + high
+    return high * 13 + low
+
+
+def class_name(index):
+    """Return the name of a starting hand class, such as 'AKs'."""
+
+    row, column = divmod(index, 13)
+    if row == column:
+        return _RANK_CHARS[row] * 2
+    if row > column:
+        return _RANK_CHARS[row] + _RANK_CHARS[column] + 's'
+    return _RANK_CHARS[column] + _RANK_CHARS[row] + 'o'
+
+
+def parse_class(name):
+    """Return the index of a starting hand class given by name, such
+    as 'AKs', 'AKo' or 'TT'.
+
+    :raises ValueError: if the name is invalid.
+    """
+
+    try:
+        high, low = [_RANK_CHARS.index(c) for c in name[:2].upper()]
+    except ValueError:
+        raise ValueError('invalid hand class %s' % (name,))
+    kind = name[2:].lower()
+    if high < low:
+        high, low = low, high
+    if high == low and kind == '':
+        return high * 13 + low
+    if high != low and kind == 's':
+        return high * 13 + low
+    if high != low and kind == 'o':
+        return low * 13 + high
+    raise ValueError('invalid hand class %s' % (name,))
+
+
+def _orient(hole_a, hole_b):
+    # The key of the matchup, and whether the players are swapped in
+    # it. The order of the players is chosen by the smaller key.
+    key_ab = canonical_key([hole_a, hole_b])
+    key_ba = canonical_key([hole_b, hole_a])
+    if key_ab <= key_ba:
+        return key_ab, False
+    return key_ba, True
+
+
+def _starting_hands():
+    # One representative of each starting hand up to suits, with the
+    # number of hands it represents.
+    reps = {}
+    for hole in itertools.combinations(xrange(52), 2):
+        key = canonical_key([hole])
+        if key in reps:
+            reps[key][1] += 1
+        else:
+            reps[key] = [hole, 1]
+    return sorted(reps.values())
+
+
+# The matchups, and for each ordered pair of starting hands (up to
+# suits) its class cell, weight, matchup index and whether the
+# players are swapped in the matchup. See _enumerate().
+_matchups = _cells = None
+
+def _enumerate():
+    global _matchups, _cells
+    if _matchups is not None:
+        return _matchups, _cells
+
+    found = {}
+    pairs = []
+    for hole_a, n in _starting_hands():
+        cell = class_index(*hole_a) * CLASSES
+        for hole_b in itertools.combinations(xrange(52), 2):
+            if hole_b[0] in hole_a or hole_b[1] in hole_a:
+                continue
+            key, swapped = _orient(hole_a, hole_b)
+            if key in found:
+                found[key][3] += n
+            else:
+                groups = [hole_b, hole_a] if swapped else [hole_a, hole_b]
+                _, (a, b), _ = canonicalize(groups)
+                found[key] = [key, a, b, n]
+            pairs.append((cell + class_index(*hole_b), n, key, swapped))
+
+    _matchups = [tuple(m) for m in sorted(found.values())]
+    index = dict((m[0], i) for i, m in enumerate(_matchups))
+    _cells = [(cell, n, index[key], swapped) for cell, n, key, swapped in pairs]
+    return _matchups, _cells
+
+
+def matchups():
+    """Return the heads-up matchups up to suits and the order of the
+    players.
+
+    :returns: a list of (key, hole_a, hole_b, weight), sorted by key,
+      where hole_a and hole_b are the canonical hole cards (tuples of
+      card codes) and weight the number of ordered pairs of hole
+      cards the matchup represents.
+    """
+
+    return list(_enumerate()[0])
+
+
+def exact_counts(hole_a, hole_b):
+    """Return the runouts won and tied by hole_a against hole_b.
+
+    :param hole_a: card codes.
+    :param hole_b: card codes.
+    :returns: (wins, ties)
+    """
+
+    if batch is not None:
+        return batch.heads_up_counts(hole_a, hole_b)
+    r = equity.exact_equity([[CARDS[c] for c in hole_a],
+                             [CARDS[c] for c in hole_b]])
+    return r.wins[0], r.ties[0]
+
+
+def _pack_holes(hole_a, hole_b):
+    # The canonical hole cards of a matchup as the little endian
+    # uint32 of their bytes in a record.
+    (a1, a2), (b1, b2) = hole_a, hole_b
+    return a1 | a2 << 8 | b1 << 16 | b2 << 24
+
+
+class PreflopTable(object):
+    """The equities of the heads-up preflop matchups.
+    """
+
+    def __init__(self, holes, wins, ties, classes):
+        """Create a table. See load().
+
+        :param holes: the canonical hole cards of each matchup, packed
+          as by _pack_holes().
+        :param wins: the runouts won by hole_a, per matchup.
+        :param ties: the runouts tied, per matchup.
+        :param classes: the equity of each class against each class,
+          169 * 169 floats.
+        """
+
+        self.wins = wins
+        self.ties = ties
+        self.classes = classes
+        self.index = dict(itertools.izip(holes, itertools.count()))
+
+    @classmethod
+    def load(cls, path=None):
+        """Load a table file.
+
+        :param path: defaults to table_path().
+        :raises ValueError: if the file is not a valid table.
+        """
+
+        with open(path or table_path(), 'rb') as f:
+            buf = f.read()
+        magic, version, n, digest = _HEADER.unpack_from(buf, 0)
+        if magic != PREFLOP_MAGIC or version != PREFLOP_VERSION:
+            raise ValueError('unknown format or version')
+        if hashlib.sha1(buffer(buf, _HEADER.size)).digest() != digest:
+            raise ValueError('checksum mismatch')
+        if len(buf) != _HEADER.size + n * _RECORD.size + 4 * CLASSES * CLASSES:
+            raise ValueError('unexpected size')
+
+        # A record is three uint32s: the hole cards, as packed by
+        # _pack_holes(), the wins and the ties.
+        records = array.array('I')
+        records.fromstring(buf[_HEADER.size:_HEADER.size + n * _RECORD.size])
+        classes = array.array('f')
+        classes.fromstring(buf[_HEADER.size + n * _RECORD.size:])
+        if sys.byteorder != 'little':
+            records.byteswap()
+            classes.byteswap()
+        return cls(records[0::3], records[1::3], records[2::3], classes)
+
+    def __len__(self):
+        return len(self.wins)
+
+    def counts(self, hole_a, hole_b):
+        """Return the runouts won, lost and tied by hole_a against
+        hole_b, of RUNOUTS.
+
+        :param hole_a: two Cards or card codes.
+        :param hole_b: two Cards or card codes.
+        :raises ValueError: if the hole cards share a card.
+        """
+
+        hole_a = [_code(c) for c in hole_a]
+        hole_b = [_code(c) for c in hole_b]
+        if len(set(hole_a + hole_b)) != 4:
+            raise ValueError('expected four different cards')
+        _, swapped = _orient(hole_a, hole_b)
+        groups = [hole_b, hole_a] if swapped else [hole_a, hole_b]
+        i = self.index[_pack_holes(*canonicalize(groups)[1])]
+        wins, ties = self.wins[i], self.ties[i]
+        losses = RUNOUTS - wins - ties
+        if swapped:
+            return losses, wins, ties
+        return wins, losses, ties
+
+    def equity(self, hole_a, hole_b):
+        """Return the equity of hole_a against hole_b."""
+
+        wins, _, ties = self.counts(hole_a, hole_b)
+        return (wins + 0.5 * ties) / RUNOUTS
+
+    def class_equity(self, class_a, class_b):
+        """Return the equity of a starting hand class against another,
+        averaged over the hole cards of the classes that do not share
+        a card.
+
+        :param class_a: class name, such as 'AKs', or index.
+        :param class_b: class name or index.
+        """
+
+        if isinstance(class_a, basestring):
+            class_a = parse_class(class_a)
+        if isinstance(class_b, basestring):
+            class_b = parse_class(class_b)
+        return self.classes[class_a * CLASSES + class_b]
+
+
+def _class_table(wins, ties):
+    # The class equities, from the matchups in the order of
+    # matchups().
+    shares = [0.0] * (CLASSES * CLASSES)
+    weights = [0] * (CLASSES * CLASSES)
+    for cell, n, i, swapped in _enumerate()[1]:
+        w, t = wins[i], ties[i]
+        if swapped:
+            w = RUNOUTS - w - t
+        shares[cell] += n * (w + 0.5 * t)
+        weights[cell] += n
+    return array.array('f', [s / (w * RUNOUTS) for s, w in zip(shares, weights)])
+
+
+def save_table(results, path=None):
+    """Save a table file, replacing it atomically if it exists.
+
+    :param results: (hole_a, hole_b, wins, ties) for every matchup.
+    :param path: defaults to table_path().
+    """
+
+    import tempfile
+
+    results = sorted(results, key=lambda r: canonical_key(r[:2]))
+    if [canonical_key(r[:2]) for r in results] != [m[0] for m in _enumerate()[0]]:
+        raise ValueError('expected one result per matchup')
+    classes = _class_table([r[2] for r in results], [r[3] for r in results])
+    if sys.byteorder != 'little':
+        classes.byteswap()
+
+    body = ''.join([_RECORD.pack(*(tuple(a) + tuple(b) + (w, t)))
+                    for a, b, w, t in results]) + classes.tostring()
+    data = _HEADER.pack(PREFLOP_MAGIC, PREFLOP_VERSION, len(results),
+                        hashlib.sha1(body).digest()) + body
+
+    path = path or table_path()
+    fd, tmp = tempfile.mkstemp(prefix='.preflop-', dir=os.path.dirname(path) or '.')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp, 0644)
+        os.rename(tmp, path)
+    except:
+        os.unlink(tmp)
+        raise
+    log.debug('saved preflop table to %s', path)
+
+
+def read_checkpoint(path):
+    """Return the matchups done in a checkpoint file, as a dict of key
+    to (hole_a, hole_b, wins, ties). A missing file has none, and a
+    partly written matchup at the end is ignored.
+    """
+
+    done = {}
+    try:
+        f = open(path, 'rb')
+    except IOError:
+        return done
+    with f:
+        header = f.read(_CHECKPOINT_HEADER.size)
+        if not header:
+            return done
+        magic, version = _CHECKPOINT_HEADER.unpack(header)
+        if magic != CHECKPOINT_MAGIC or version != PREFLOP_VERSION:
+            raise ValueError('%s is not a checkpoint file' % (path,))
+        while True:
+            data = f.read(_RECORD.size)
+            if len(data) < _RECORD.size:
+                break
+            a1, a2, b1, b2, w, t = _RECORD.unpack(data)
+            done[canonical_key([(a1, a2), (b1, b2)])] = ((a1, a2), (b1, b2), w, t)
+    return done
+
+
+def _compute_batch(args):
+    pairs, compute = args
+    return [(a, b) + tuple(compute(a, b)) for a, b in pairs]
+
+
+def generate(path=None, checkpoint=None, jobs=1, batch_size=16, limit=None,
+             compute=exact_counts):
+    """Compute the matchups, and save the table file when all are done.
+
+    :param path: the table file, defaults to table_path().
+    :param checkpoint: the checkpoint file, defaults to path with
+      .checkpoint appended. It is removed when the table is saved.
+    :param jobs: number of processes.
+    :param batch_size: matchups per task given to a process.
+    :param limit: compute at most this many matchups, then stop.
+    :param compute: function of (hole_a, hole_b) returning the
+      runouts (wins, ties) of hole_a.
+    :returns: the number of matchups left to compute.
+    """
+
+    path = path or table_path()
+    checkpoint = checkpoint or path + '.checkpoint'
+
+    done = read_checkpoint(checkpoint)
+    total = matchups()
+    todo = [(a, b) for key, a, b, _ in total if key not in done]
+    log.info('%d matchups done, %d left', len(done), len(todo))
+    if limit is not None:
+        todo = todo[:limit]
+
+    if todo:
+        exists = os.path.exists(checkpoint) and os.path.getsize(checkpoint) > 0
+        if exists:
+            # Drop a partly written matchup at the end.
+            with open(checkpoint, 'r+b') as f:
+                f.truncate(_CHECKPOINT_HEADER.size + len(done) * _RECORD.size)
+
+        work = [(todo[i:i + batch_size], compute)
+                for i in xrange(0, len(todo), batch_size)]
+        if jobs > 1:
+            pool = multiprocessing.Pool(jobs)
+            results = pool.imap_unordered(_compute_batch, work)
+        else:
+            pool = None
+            results = itertools.imap(_compute_batch, work)
+
+        try:
+            with open(checkpoint, 'ab') as f:
+                if not exists:
+                    f.write(_CHECKPOINT_HEADER.pack(CHECKPOINT_MAGIC, PREFLOP_VERSION))
+                for computed in results:
+                    for a, b, w, t in computed:
+                        f.write(_RECORD.pack(*(tuple(a) + tuple(b) + (w, t))))
+                        done[canonical_key([a, b])] = (a, b, w, t)
+                    f.flush()
+                    os.fsync(f.fileno())
+                    log.info('%d matchups done', len(done))
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+
+    left = len(total) - len(done)
+    if not left:
+        save_table(done.values(), path)
+        os.unlink(checkpoint)
+    return left
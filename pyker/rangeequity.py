@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2011 Björn Edström <be@bjrn.se>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the University nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE REGENTS AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE REGENTS OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+
+""" range against range equity, using numpy.
+
+The equity of every combination of one range (see pyker.ranges)
+against every combination of another, on a given board:
+
+    >>> r = range_equity(parse_range('TT+, AKs'), parse_range('22+, AT+'),
+    ...                  board=string_to_cards('ah 7s 2c'))
+    >>> r.equity, r.matrix().shape
+
+Every runout of the board is enumerated, or with samples=N that many
+random runouts are drawn (preflop there are far too many runouts to
+enumerate). For each runout the seven card score of each combination
+is computed once, with pyker.batch, and the scores of the two ranges
+are compared with numpy broadcasting, for all pairs of combinations
+at once. Pairs of combinations that share a card, and combinations
+that share a card with the runout, are left out.
+
+The runouts are processed in chunks, so memory use is bounded by the
+chunk size (in cells of runouts times pairs of combinations) and the
+size of the result, a few arrays of one entry per pair.
+"""
+
+import itertools
+import random
+
+import numpy
+
+import pyker.batch as batch
+from pyker.poker import Card
+
+
+# Cells compared at a time. A cell is a runout with a pair of
+# combinations, or a runout with eight combinations to score: the
+# temporaries are a few bytes per pair, and a few dozen bytes per
+# combination scored.
+CHUNK_CELLS = 1 << 23
+
+
+def _code(card):
+    return card.code if isinstance(card, Card) else card
+
+
+def _masks(cards):
+    # Bitmasks of the cards, an (N, k) array, as an (N,) uint64 array.
+    one = numpy.uint64(1)
+    masks = numpy.zeros(cards.shape[0], dtype=numpy.uint64)
+    for j in xrange(cards.shape[1]):
+        masks |= numpy.left_shift(one, cards[:, j].astype(numpy.uint64))
+    return masks
+
+
+class RangeEquityResult(object):
+    """The outcome of a range against range calculation.
+
+    The results are kept as sums over the runouts, per pair of
+    combinations, so partial results can be merged with add().
+
+    :ivar combos_a: the combinations of the first range, an (A, 2)
+      array of card codes.
+    :ivar combos_b: the combinations of the second range, (B, 2).
+    :ivar weights_a: the weights of the combinations, (A,).
+    :ivar weights_b: (B,).
+    :ivar shares: the sum over the runouts of the first range's share
+      of the pot, (A, B).
+    :ivar counts: the number of runouts, (A, B). Zero for pairs of
+      combinations that share a card.
+    """
+
+    def __init__(self, combos_a, weights_a, combos_b, weights_b, exact=True):
+        self.exact = exact
+        self.combos_a = combos_a
+        self.combos_b = combos_b
+        self.weights_a = weights_a
+        self.weights_b = weights_b
+        self.shares = numpy.zeros((len(combos_a), len(combos_b)))
+        self.counts = numpy.zeros((len(combos_a), len(combos_b)), dtype=numpy.int64)
+
+    def add(self, shares, counts):
+        """Add a partial result."""
+        self.shares += shares
+        self.counts += counts
+
+    @property
+    def runouts(self):
+        """Total number of matchups, runouts times pairs."""
+        return int(self.counts.sum())
+
+    def matrix(self):
+        """The equity of each combination of the first range against
+        each combination of the second.
+
+        :returns: (A, B) float array, NaN for pairs of combinations
+          that share a card.
+        """
+
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            return numpy.where(self.counts > 0, self.shares / self.counts, numpy.nan)
+
+    def combo_equity(self):
+        """The equity of each combination of the first range against
+        the whole second range.
+
+        :returns: (A,) float array, NaN for combinations that are
+          blocked by the whole second range.
+        """
+
+        # Every deal (pair of combinations and runout) is equally
+        # likely, up to the weights of the combinations.
+        shares = self.shares.dot(self.weights_b)
+        counts = self.counts.dot(self.weights_b)
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            return numpy.where(counts > 0, shares / counts, numpy.nan)
+
+    @property
+    def equity(self):
+        """The equity of the first range against the second, (a, b)
+        with a + b = 1.
+        """
+
+        shares = self.weights_a.dot(self.shares).dot(self.weights_b)
+        counts = self.weights_a.dot(self.counts).dot(self.weights_b)
+        if counts == 0:
+            raise ValueError('no possible matchups')
+        a = float(shares / counts)
+        return a, 1.0 - a
+
+    def __repr__(self):
+        return '<RangeEquityResult %dx%d runouts=%s>' % (
+            len(self.combos_a), len(self.combos_b), self.runouts)
+
+
+def _combos(r):
+    combos = [(a, b) for a, b, _ in r.combos()]
+    weights = [w for _, _, w in r.combos()]
+    return (numpy.array(combos, dtype=numpy.int8).reshape(-1, 2),
+            numpy.array(weights, dtype=numpy.float64))
+
+
+def _runouts(stub, need, samples, rng):
+    # Yields runouts, tuples of need cards from stub.
+    if samples is None:
+        return itertools.combinations(stub, need)
+    return (rng.sample(stub, need) for _ in xrange(samples))
+
+
+def _scores(board, combos, runouts, mask):
+    # The scores of the combinations on the runouts, an (R, N) array,
+    # with the invalid combinations set to -1.
+    r, n = runouts.shape[0], combos.shape[0]
+    cards = numpy.empty((r, n, 7), dtype=numpy.int8)
+    cards[:, :, 0:2] = combos[numpy.newaxis, :, :]
+    cards[:, :, 2:2 + len(board)] = board
+    cards[:, :, 2 + len(board):] = runouts[:, numpy.newaxis, :]
+    # Only the valid rows, the lookups assume distinct cards.
+    valid = (_masks(runouts)[:, numpy.newaxis] & mask[numpy.newaxis, :]) == 0
+    scores = numpy.empty((r, n), dtype=numpy.int32)
+    scores.fill(-1)
+    scores[valid] = batch.evaluate(cards[valid])
+    return scores
+
+
+def _chunk_runouts(chunk_cells, a, b):
+    # Runouts per chunk, for ranges of a and b combinations.
+    return max(1, chunk_cells // max(a * b, 8 * (a + b)))
+
+
+def iter_range_equity(range_a, range_b, board=(), dead=(), samples=None,
+                      rng=random, chunk_cells=CHUNK_CELLS):
+    """Like range_equity() but yields the partial results as the
+    runouts are processed, as (result, runouts done). The result is
+    the same object every time, updated in place.
+    """
+
+    board = [_code(c) for c in board]
+    dead = [_code(c) for c in dead]
+    known = board + dead
+    if len(set(known)) != len(known):
+        raise ValueError('the same card is given more than once')
+    if len(board) > 5:
+        raise ValueError('the board has at most five cards')
+
+    range_a = range_a.remove(known)
+    range_b = range_b.remove(known)
+    combos_a, weights_a = _combos(range_a)
+    combos_b, weights_b = _combos(range_b)
+    if not len(combos_a) or not len(combos_b):
+        raise ValueError('a range is empty on this board')
+    result = RangeEquityResult(combos_a, weights_a, combos_b, weights_b,
+                               exact=samples is None)
+
+    mask_a = _masks(combos_a)
+    mask_b = _masks(combos_b)
+    # Pairs of combinations that share a card.
+    apart = (mask_a[:, numpy.newaxis] & mask_b[numpy.newaxis, :]) == 0
+
+    # The scores of all combinations in one array, so each
+    # combination is evaluated once per runout.
+    combos = numpy.concatenate([combos_a, combos_b])
+    mask = numpy.concatenate([mask_a, mask_b])
+    na = len(combos_a)
+
+    need = 5 - len(board)
+    stub = [c for c in xrange(52) if c not in known]
+    chunk = _chunk_runouts(chunk_cells, len(combos_a), len(combos_b))
+    runouts = _runouts(stub, need, samples, rng)
+    done = 0
+    while True:
+        block = list(itertools.islice(runouts, chunk))
+        if not block:
+            break
+        block = numpy.array(block, dtype=numpy.int8).reshape(len(block), need)
+        scores = _scores(board, combos, block, mask)
+        a = scores[:, :na, numpy.newaxis]
+        b = scores[:, numpy.newaxis, na:]
+        valid = (a >= 0) & (b >= 0)
+        wins = ((a > b) & valid).sum(axis=0)
+        ties = ((a == b) & valid).sum(axis=0)
+        counts = valid.sum(axis=0)
+        result.add((wins + 0.5 * ties) * apart, counts * apart)
+        done += len(block)
+        yield result, done
+
+
+def range_equity(range_a, range_b, board=(), dead=(), samples=None,
+                 rng=random, chunk_cells=CHUNK_CELLS):
+    """Calculate the equity of one range against another.
+
+    :param range_a: the first range.
+    :type range_a: pyker.ranges.HandRange.
+    :param range_b: the second range.
+    :type range_b: pyker.ranges.HandRange.
+    :param board: the known community cards, zero to five.
+    :type board: [Card] or [int].
+    :param dead: cards that can not be dealt.
+    :type dead: [Card] or [int].
+    :param samples: number of random runouts, or None to enumerate
+      them all.
+    :type samples: int.
+    :param rng: random generator for the samples.
+    :param chunk_cells: bounds the runouts processed at a time, to
+      this many divided by the larger of the number of pairs of
+      combinations and eight times the number of combinations.
+    :type chunk_cells: int.
+    :returns: RangeEquityResult.
+    :raises ValueError: if the same card is given more than once or a
+      range has no combinations left.
+    """
+
+    result = None
+    for result, _ in iter_range_equity(range_a, range_b, board, dead, samples,
+                                       rng, chunk_cells):
+        pass
+    return result
@@ -0,0 +1,420 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2011 Björn Edström <be@bjrn.se>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the University nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE REGENTS AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE REGENTS OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+
+""" hand ranges: weighted sets of hole card combinations.
+
+There are 1326 combinations of two hole cards, numbered by
+
+    combo_index(a, b) = b * (b - 1) / 2 + a
+
+for card codes a < b (see pyker.poker.Card.code). A HandRange is a
+weight between 0 and 1 for each of them, in an array, and has the
+combinations of nonzero weight as a bitset (a long with bit i set for
+combination i), so a set operation or removing the combinations
+blocked by some cards is a few operations on whole ranges.
+
+Ranges are written in the usual notation, a comma separated list of
+
+    AA, 77         a pair
+    TT+            a pair and all pairs above it
+    TT-77          pairs from TT down to 77
+    AKs, AKo, AK   suited, offsuit or either
+    ATs+           ATs, AJs, AQs and AKs: the kicker up to the King
+    A5s-A2s        A5s, A4s, A3s and A2s
+    76s-54s        76s, 65s and 54s: both ranks stepped together
+    AhKh           a single combination
+
+each optionally followed by :WEIGHT, such as AKo:0.5. Later entries
+replace the weights given by earlier entries.
+
+    >>> r = parse_range('TT+, AKs, KQo, 76s-54s')
+    >>> len(r)
+    58
+    >>> len(r.remove(string_to_cards('ah 7s 2c')))
+    53
+"""
+
+import array
+import bisect
+import random
+
+from pyker.poker import Card
+
+try:
+    import numpy
+except ImportError:
+    # Blocked combinations are then removed one at a time.
+    numpy = None
+
+
+COMBOS = 1326
+
+_RANK_CHARS = '23456789tjqka'
+
+
+def combo_index(a, b):
+    """Return the index of the combination of two card codes.
+    """
+
+    if a > b:
+        a, b = b, a
+    return b * (b - 1) // 2 + a
+
+
+def _make_combos():
+    cards = []
+    for b in xrange(52):
+        for a in xrange(b):
+            cards.append((a, b))
+    return cards
+
+# index -> (a, b)
+COMBO_CARDS = tuple(_make_combos())
+
+def _make_card_combos():
+    combos = [[] for _ in xrange(52)]
+    for i, (a, b) in enumerate(COMBO_CARDS):
+        combos[a].append(i)
+        combos[b].append(i)
+    return combos
+
+# card code -> indexes of the 51 combinations with it, and as a bitset
+_CARD_COMBOS = _make_card_combos()
+_CARD_BITS = [sum([1 << i for i in combos]) for combos in _CARD_COMBOS]
+
+_ALL_BITS = (1 << COMBOS) - 1
+
+if numpy is not None:
+    _CARD_INDEXES = [numpy.array(combos, dtype=numpy.intp) for combos in _CARD_COMBOS]
+
+
+def _code(card):
+    return card.code if isinstance(card, Card) else card
+
+
+def blocked_bits(cards):
+    """Return the bitset of the combinations with any of cards.
+
+    :param cards: Cards or card codes.
+    """
+
+    bits = 0
+    for card in cards:
+        bits |= _CARD_BITS[_code(card)]
+    return bits
+
+
+class HandRange(object):
+    """A range of hole cards. Ranges are not modified once created,
+    operations on them return new ranges.
+    """
+
+    __slots__ = ('weights', '_bits', '_cumulative')
+
+    def __init__(self, weights=None):
+        """Create a HandRange.
+
+        :param weights: the weight of each combination, 1326 floats
+          from 0 to 1. An empty range by default.
+        """
+
+        if weights is None:
+            weights = array.array('d', [0.0]) * COMBOS
+        elif not isinstance(weights, array.array) or weights.typecode != 'd':
+            weights = array.array('d', weights)
+        if len(weights) != COMBOS:
+            raise ValueError('a range has %d weights' % (COMBOS,))
+        self.weights = weights
+        self._bits = None
+        self._cumulative = None
+
+    @classmethod
+    def from_bits(cls, bits):
+        """Create a range with weight 1 for the combinations of the
+        bitset bits.
+        """
+
+        weights = array.array('d', [0.0]) * COMBOS
+        i = 0
+        while bits:
+            if bits & 0xffff:
+                for j in xrange(16):
+                    if bits >> j & 1:
+                        weights[i + j] = 1.0
+            bits >>= 16
+            i += 16
+        return cls(weights)
+
+    @classmethod
+    def parse(cls, s):
+        """See parse_range()."""
+        return parse_range(s)
+
+    @property
+    def bits(self):
+        """The combinations with nonzero weight, as a bitset."""
+
+        if self._bits is None:
+            w = self.weights
+            self._bits = sum([1 << i for i in xrange(COMBOS) if w[i]])
+        return self._bits
+
+    def __len__(self):
+        return bin(self.bits).count('1')
+
+    def __contains__(self, cards):
+        a, b = cards
+        return self.weights[combo_index(_code(a), _code(b))] > 0
+
+    def __eq__(self, other):
+        return isinstance(other, HandRange) and self.weights == other.weights
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return '<HandRange %d combos>' % (len(self),)
+
+    def weight(self, a, b):
+        """Return the weight of the combination of the cards a and b.
+        """
+
+        return self.weights[combo_index(_code(a), _code(b))]
+
+    def total(self):
+        """Return the sum of the weights."""
+        return sum(self.weights)
+
+    def combos(self):
+        """Yields (a, b, weight) for the combinations in the range,
+        where a and b are card codes.
+        """
+
+        w = self.weights
+        for i, (a, b) in enumerate(COMBO_CARDS):
+            if w[i]:
+                yield a, b, w[i]
+
+    def _mask(self, bits):
+        # A range with only the combinations in bits.
+        if bits == _ALL_BITS:
+            return self
+        weights = array.array('d', self.weights)
+        drop = self.bits & ~bits
+        i = 0
+        while drop:
+            if drop & 0xffff:
+                for j in xrange(16):
+                    if drop >> j & 1:
+                        weights[i + j] = 0.0
+            drop >>= 16
+            i += 16
+        return HandRange(weights)
+
+    def remove(self, cards):
+        """Return the range without the combinations with any of the
+        cards, such as the board or other dead cards.
+
+        With numpy, the blocked combinations are zeroed in the copied
+        weights in one operation, which is several times faster than
+        the loop used without it when many cards are removed.
+
+        :param cards: Cards or card codes.
+        """
+
+        weights = self.weights[:]
+        codes = [_code(card) for card in cards]
+        if numpy is not None and codes:
+            blocked = numpy.concatenate([_CARD_INDEXES[c] for c in codes])
+            numpy.frombuffer(weights, dtype=numpy.float64)[blocked] = 0.0
+        else:
+            for c in codes:
+                for i in _CARD_COMBOS[c]:
+                    weights[i] = 0.0
+        return HandRange(weights)
+
+    def union(self, other):
+        """Return the union of two ranges, with the highest weight of
+        each combination.
+        """
+
+        return HandRange(array.array('d', map(max, self.weights, other.weights)))
+
+    def intersection(self, other):
+        """Return the intersection of two ranges, with the lowest
+        weight of each combination.
+        """
+
+        if self.bits & other.bits == 0:
+            return HandRange()
+        return HandRange(array.array('d', map(min, self.weights, other.weights)))
+
+    def difference(self, other):
+        """Return the combinations of this range not in other."""
+
+        return self._mask(_ALL_BITS & ~other.bits)
+
+    __or__ = union
+    __and__ = intersection
+    __sub__ = difference
+
+    def sample(self, rng=random, dead=()):
+        """Draw a combination at random, proportionally to the
+        weights, without any of the dead cards.
+
+        :param rng: random generator, such as a random.Random.
+        :param dead: Cards or card codes that can not be drawn.
+        :returns: (a, b), card codes.
+        :raises ValueError: if no combination is possible.
+        """
+
+        if self._cumulative is None:
+            cumulative = []
+            total = 0.0
+            for w in self.weights:
+                total += w
+                cumulative.append(total)
+            self._cumulative = cumulative
+        cumulative = self._cumulative
+        total = cumulative[-1]
+
+        blocked = blocked_bits(dead) if dead else 0
+        if total > 0 and self.bits & ~blocked:
+            # Draw, and draw again if the cards are dead. If most of
+            # the range is dead, this is slow, so give up and draw
+            # from the range without the dead cards.
+            for _ in xrange(20):
+                i = bisect.bisect_right(cumulative, rng.random() * total)
+                i = min(i, COMBOS - 1)
+                if not blocked >> i & 1 and self.weights[i]:
+                    return COMBO_CARDS[i]
+            return self.remove(dead).sample(rng)
+        raise ValueError('no combination left in the range')
+
+
+def _parse_rank(c):
+    i = _RANK_CHARS.find(c.lower())
+    if i < 0:
+        raise ValueError('invalid rank %s' % (c,))
+    return i # 0 for Two, 12 for Ace
+
+
+def _rank_combos(high, low, kind):
+    # Combinations of two ranks (0-12), kind 's', 'o' or '' for both.
+    combos = []
+    for s1 in xrange(4):
+        for s2 in xrange(4):
+            if high == low:
+                if s1 >= s2:
+                    continue
+            elif kind == 's' and s1 != s2 or kind == 'o' and s1 == s2:
+                continue
+            combos.append(combo_index(high * 4 + s1, low * 4 + s2))
+    return combos
+
+
+def _parse_hand(s):
+    # 'AKs' -> (12, 11, 's'), 'TT' -> (8, 8, '')
+    if len(s) not in (2, 3):
+        raise ValueError('invalid hand %s' % (s,))
+    high, low = _parse_rank(s[0]), _parse_rank(s[1])
+    kind = s[2:].lower()
+    if kind not in ('', 's', 'o') or high == low and kind:
+        raise ValueError('invalid hand %s' % (s,))
+    if low > high:
+        high, low = low, high
+    return high, low, kind
+
+
+def _expand(token):
+    # Expand a token of the notation to a list of combinations.
+    if len(token) == 4 and token[1].lower() in 'cdhs' and token[3].lower() in 'cdhs':
+        a, b = Card.from_string(token[:2]).code, Card.from_string(token[2:]).code
+        if a == b:
+            raise ValueError('invalid combination %s' % (token,))
+        return [combo_index(a, b)]
+
+    if token.endswith('+'):
+        high, low, kind = _parse_hand(token[:-1])
+        if high == low:
+            hands = [(r, r) for r in xrange(high, 13)]
+        else:
+            hands = [(high, r) for r in xrange(low, high)]
+    elif '-' in token:
+        first, _, last = token.partition('-')
+        high, low, kind = _parse_hand(first.strip())
+        high2, low2, kind2 = _parse_hand(last.strip())
+        if kind != kind2:
+            raise ValueError('invalid range %s' % (token,))
+        if high == low and high2 == low2:
+            hands = [(r, r) for r in xrange(min(high, high2), max(high, high2) + 1)]
+        elif high == high2 and high != low and high2 != low2:
+            hands = [(high, r) for r in xrange(min(low, low2), max(low, low2) + 1)]
+        elif high - low == high2 - low2 and high != low:
+            gap = high - low
+            hands = [(r, r - gap) for r in xrange(min(high, high2), max(high, high2) + 1)]
+        else:
+            raise ValueError('invalid range %s' % (token,))
+    else:
+        high, low, kind = _parse_hand(token)
+        hands = [(high, low)]
+
+    combos = []
+    for high, low in hands:
+        combos.extend(_rank_combos(high, low, kind))
+    return combos
+
+
+def parse_range(s):
+    """Parse a range in the usual notation, see the module
+    documentation.
+
+    :returns: HandRange.
+    :raises ValueError: if the notation is invalid.
+    """
+
+    weights = array.array('d', [0.0]) * COMBOS
+    for token in s.split(','):
+        token = token.strip()
+        if not token:
+            continue
+        weight = 1.0
+        if ':' in token:
+            token, _, w = token.partition(':')
+            try:
+                weight = float(w)
+            except ValueError:
+                raise ValueError('invalid weight %s' % (w,))
+            if not 0.0 <= weight <= 1.0:
+                raise ValueError('weight must be from 0 to 1: %s' % (w,))
+            token = token.strip()
+        for i in _expand(token):
+            weights[i] = weight
+    return HandRange(weights)
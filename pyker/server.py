@@ -0,0 +1,750 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2011 Björn Edström <be@bjrn.se>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the University nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE REGENTS AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE REGENTS OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+
+""" a server running many tables concurrently in one process.
+
+Each table is a Game driven step by step by an event loop: the game
+runs until a player is to act, and then waits for the player's
+decision or for the action to time out, while the loop serves the
+other tables. A player that does not act in time checks if possible
+and folds otherwise, and so does a player without a connection.
+
+Clients exchange JSON objects with the server, one per line. They
+send
+
+    {"op": "join", "table": NAME, "seat": SEAT, "name": NAME}
+    {"op": "act", "table": NAME, "action": ACTION, "chips": CHIPS}
+
+where chips is only given for "bet" and "raise", and receive the
+events of the game (see pyker.game.print_event) as
+
+    {"table": NAME, "event": EVENT, "args": [...]}
+
+with players given as seat numbers and cards as strings. The hole
+cards are only sent to their owner. A player to act also receives
+
+    {"table": NAME, "event": "act", "args": [SEAT, OPTIONS, TIMEOUT,
+                                             CHIPS, TO CALL, POT]}
+
+and errors are reported as {"error": MESSAGE}. A table that stops
+because of an error in the game sends {"table": NAME, "error":
+MESSAGE} to its players.
+
+The transport is pluggable: TCPTransport serves clients over TCP,
+LocalTransport serves clients in the same process, such as bots for
+load testing. Each connection has a bounded output buffer, and a
+client that does not keep up with its events is disconnected instead
+of holding up the loop, and so the other tables.
+
+The latency from a decision arriving at the transport to having the
+resulting events queued for every client at the table, including
+the time waiting for the loop, is kept in Server.latency.
+
+This is a select style event loop rather than one based on asyncio,
+since pyker runs on Python 2.
+"""
+
+import collections
+import errno
+import heapq
+import itertools
+import json
+import logging
+import random
+import select
+import socket
+import time
+
+from pyker.game import Game, GameError, GameRules, Player, PlayerState, Table
+from pyker.poker import Card, HandClass
+
+
+log = logging.getLogger(__name__)
+
+
+class LatencyStats(object):
+    """Percentiles of latencies, over a window of the latest samples.
+    """
+
+    def __init__(self, window=100000):
+        self.window = window
+        self.samples = []
+        self.next = 0 # where the next sample goes, once full
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        if len(self.samples) < self.window:
+            self.samples.append(seconds)
+        else:
+            self.samples[self.next] = seconds
+            self.next = (self.next + 1) % self.window
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, p):
+        """Return the p:th percentile (0-100) of the window, or 0.0
+        if there are no samples.
+        """
+
+        return _percentile(sorted(self.samples), p)
+
+    def summary(self):
+        """Return count, mean, max and the 50th, 90th and 99th
+        percentiles in seconds as a dict.
+        """
+
+        ordered = sorted(self.samples)
+        return {'count': self.count,
+                'mean': self.total / self.count if self.count else 0.0,
+                'max': self.max,
+                'p50': _percentile(ordered, 50),
+                'p90': _percentile(ordered, 90),
+                'p99': _percentile(ordered, 99)}
+
+
+def _percentile(ordered, p):
+    if not ordered:
+        return 0.0
+    return ordered[int(round(p / 100.0 * (len(ordered) - 1)))]
+
+
+def _jsonable(value, seats):
+    if isinstance(value, PlayerState):
+        return seats[value]
+    if isinstance(value, Card):
+        return str(value)
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v, seats) for v in value]
+    if isinstance(value, dict):
+        return [[_jsonable(k, seats), _jsonable(v, seats)] for k, v in value.iteritems()]
+    return value
+
+
+def _encode(msg):
+    return json.dumps(msg, separators=(',', ':')) + '\n'
+
+
+class TableRunner(object):
+    """Runs the Game of one table of a Server.
+    """
+
+    def __init__(self, server, name, seats=6, big_blind=20, small_blind=10,
+                 chips=1000, action_timeout=30.0, hand_delay=0.0, hands=None,
+                 rng=None):
+        """Create a TableRunner, see Server.add_table().
+
+        :param chips: the chips of a player joining.
+        :param action_timeout: seconds a player has to act.
+        :param hand_delay: seconds between hands.
+        :param hands: stop after this many hands, or None to go on
+          while there are players.
+        :param rng: random generator for the deck, see Game.
+        """
+
+        self.server = server
+        self.name = name
+        self.chips = chips
+        self.action_timeout = action_timeout
+        self.hand_delay = hand_delay
+        self.max_hands = hands
+
+        self.table = Table(seats)
+        self.game = Game(self.table, GameRules(), sink=self._event, rng=rng)
+        self.game.set_blinds(big_blind, small_blind)
+
+        self.seats = {} # ps -> seat
+        self.conns = {} # seat -> connection
+        self.outgoing = [] # (data, seat or None for everyone)
+
+        self.actions = None # the betting round in progress
+        self.pending = None # the Action waiting for a decision
+        self.timer = None
+        self.running = False
+        self.hands = 0
+        self.error = None # why the table stopped, if it failed
+
+    def join(self, conn, seat, name):
+        if self.error is not None:
+            raise ValueError('table %s is stopped: %s' % (self.name, self.error))
+        if not 0 <= seat < self.table.num_seats:
+            raise ValueError('no seat %s' % (seat,))
+        ps = self.table.get(seat)
+        if ps is None:
+            ps = PlayerState(Player(name), self.chips)
+            self.table.join(seat, ps)
+            self.seats[ps] = seat
+        elif seat in self.conns:
+            raise ValueError('seat %s is taken' % (seat,))
+        elif ps.player.name != name:
+            raise ValueError('seat %s is taken' % (seat,))
+        # Otherwise a player coming back to the seat.
+        self.conns[seat] = conn
+        conn.tables.add(self)
+
+        if not self.running and (self.max_hands is None or
+                                 self.hands < self.max_hands):
+            self.running = True
+            self.server.call_later(0, self._advance)
+
+    def disconnected(self, conn):
+        for seat, c in self.conns.items():
+            if c is conn:
+                del self.conns[seat]
+                if self.pending is not None and self.seats[self.pending.ps] == seat:
+                    self._set_timer(0)
+
+    def act(self, conn, name, chips=None):
+        action = self.pending
+        if action is None or self.conns.get(self.seats[action.ps]) is not conn:
+            raise ValueError('not your turn')
+        if name not in action.options:
+            raise ValueError('invalid action %s' % (name,))
+        try:
+            f = getattr(action, 'action_' + name)
+            if name in ('bet', 'raise'):
+                f(int(chips))
+            else:
+                f()
+        except (GameError, TypeError, ValueError), e:
+            raise ValueError(str(e) or 'invalid action')
+        self._acted()
+
+    def _event(self, event, *args):
+        seats = self.seats
+        if event == 'hole':
+            ps = args[0]
+            seat = seats[ps]
+            self.outgoing.append((_encode({'table': self.name, 'event': event,
+                                           'args': [seat, map(str, ps.hole)]}), seat))
+            self.outgoing.append((_encode({'table': self.name, 'event': event,
+                                           'args': [seat]}), -seat - 1))
+            return
+        if event == 'hand':
+            ps, score = args
+            args = [seats[ps], map(str, ps.hole), score, str(HandClass.from_score(score))]
+        else:
+            args = _jsonable(list(args), seats)
+        self.outgoing.append((_encode({'table': self.name, 'event': event,
+                                       'args': args}), None))
+
+    def _flush(self):
+        # Send the events, with None for everyone, a seat for that
+        # seat only and -seat - 1 for everyone but that seat.
+        outgoing, self.outgoing = self.outgoing, []
+        conns = self.conns.items()
+        for data, to in outgoing:
+            if to is None:
+                for seat, conn in conns:
+                    conn.send(data)
+            elif to >= 0:
+                conn = self.conns.get(to)
+                if conn is not None:
+                    conn.send(data)
+            else:
+                for seat, conn in conns:
+                    if seat != -to - 1:
+                        conn.send(data)
+
+    def _set_timer(self, delay):
+        if self.timer is not None:
+            self.server.cancel(self.timer)
+        self.timer = self.server.call_later(delay, self._timeout)
+
+    def _timeout(self):
+        self.timer = None
+        action = self.pending
+        if action is None:
+            return
+        log.debug('table %s: seat %s timed out', self.name, self.seats[action.ps])
+        self.outgoing.append((_encode({'table': self.name, 'event': 'timeout',
+                                       'args': [self.seats[action.ps]]}), None))
+        if 'check' in action.options:
+            action.action_check()
+        else:
+            action.action_fold()
+        self._acted()
+
+    def _acted(self):
+        self.pending = None
+        if self.timer is not None:
+            self.server.cancel(self.timer)
+            self.timer = None
+        self._advance()
+
+    def _advance(self):
+        # Run the game until a player is to act, or the hand is over.
+        game = self.game
+        while True:
+            if self.actions is not None:
+                try:
+                    options, action = self.actions.next()
+                except StopIteration:
+                    self.actions = None
+                    continue
+                except GameError, e:
+                    self._fail(e)
+                    break
+                self.pending = action
+                ps = action.ps
+                seat = self.seats[ps]
+                bets = game.bets
+                to_call = max(bets.values()) - bets.get(ps, 0) if bets else 0
+                pot = sum([total for _, total in game.pots.list()])
+                self.outgoing.append((_encode({
+                    'table': self.name, 'event': 'act',
+                    'args': [seat, sorted(options), self.action_timeout,
+                             ps.chips, to_call, pot]}), seat))
+                self._set_timer(self.action_timeout if seat in self.conns else 0)
+                break
+
+            if game.state == 'init' and not self.conns:
+                # Nobody is watching: stop until someone joins.
+                self.running = False
+                break
+
+            try:
+                self.actions = game.game().next()
+            except GameError, e:
+                if game.state != 'init':
+                    self._fail(e)
+                    break
+                # Too few players with chips, wait for more.
+                self.running = False
+                break
+
+            if game.state == 'init':
+                # The hand is over, start the next one from the loop
+                # so other tables get their turn.
+                self.hands += 1
+                if self.max_hands is not None and self.hands >= self.max_hands:
+                    self.running = False
+                else:
+                    self.server.call_later(self.hand_delay, self._advance)
+                break
+
+        self._flush()
+
+    def _fail(self, e):
+        # Stop this table only, the other tables of the server go on.
+        log.exception('table %s: stopped by an error', self.name)
+        self.error = str(e) or e.__class__.__name__
+        self.actions = None
+        self.pending = None
+        self.running = False
+        if self.timer is not None:
+            self.server.cancel(self.timer)
+            self.timer = None
+        self.outgoing.append((_encode({'table': self.name, 'error': self.error}), None))
+
+
+class Server(object):
+    """An event loop running tables, serving clients over a
+    transport.
+    """
+
+    def __init__(self, transport, clock=time.time):
+        self.transport = transport
+        self.clock = clock
+        self.tables = {}
+        self.timers = [] # heap of [when, seq, callback]
+        self.seq = itertools.count()
+        self.latency = LatencyStats()
+        transport.attach(self)
+
+    def add_table(self, name, **kwargs):
+        """Add a table. The keyword arguments are passed on to
+        TableRunner.
+
+        :returns: TableRunner.
+        """
+
+        if name in self.tables:
+            raise ValueError('table %s exists' % (name,))
+        runner = self.tables[name] = TableRunner(self, name, **kwargs)
+        return runner
+
+    def call_later(self, delay, callback):
+        """Call callback after delay seconds.
+
+        :returns: a handle for cancel().
+        """
+
+        timer = [self.clock() + delay, self.seq.next(), callback]
+        heapq.heappush(self.timers, timer)
+        return timer
+
+    def cancel(self, timer):
+        timer[2] = None
+
+    def receive(self, conn, line, received=None):
+        """Handle a line received from a client.
+
+        :param received: when the transport received the line, by
+          the clock of the server. Now if not given.
+        """
+
+        start = received if received is not None else self.clock()
+        try:
+            msg = json.loads(line)
+            op = msg['op']
+            table = self.tables[msg['table']]
+            if op == 'join':
+                table.join(conn, int(msg['seat']), unicode(msg.get('name', '')))
+            elif op == 'act':
+                table.act(conn, msg['action'], msg.get('chips'))
+                self.latency.record(self.clock() - start)
+            else:
+                raise ValueError('unknown op %s' % (op,))
+        except (ValueError, KeyError, TypeError), e:
+            conn.send(_encode({'error': str(e)}))
+
+    def disconnected(self, conn):
+        for table in conn.tables:
+            table.disconnected(conn)
+        conn.tables.clear()
+
+    def run_once(self, max_wait=1.0):
+        """Run the timers that are due and poll the transport once,
+        waiting at most max_wait seconds for input.
+        """
+
+        now = self.clock()
+        timers = self.timers
+        while timers and timers[0][0] <= now:
+            when, _, callback = heapq.heappop(timers)
+            if callback is not None:
+                callback()
+        wait = max_wait
+        if timers:
+            wait = max(0.0, min(wait, timers[0][0] - self.clock()))
+        self.transport.poll(wait)
+
+    def run(self, duration=None):
+        """Run the loop, forever or for duration seconds."""
+
+        end = None if duration is None else self.clock() + duration
+        while end is None or self.clock() < end:
+            self.run_once()
+
+
+class _Connection(object):
+    def __init__(self, max_buffer):
+        self.max_buffer = max_buffer
+        self.tables = set()
+        self.closed = False
+
+
+class LocalConnection(_Connection):
+    """A connection to a client in the same process. The client is an
+    object with a method on_message(conn, line) which is called with
+    each line sent to it, and replies with conn.reply(msg).
+    """
+
+    def __init__(self, transport, client, max_buffer):
+        _Connection.__init__(self, max_buffer)
+        self.transport = transport
+        self.client = client
+        self.outbox = collections.deque()
+        self.buffered = 0
+        self.paused = False # a client not reading, for testing
+
+    def send(self, data):
+        if self.closed:
+            return False
+        if self.buffered + len(data) > self.max_buffer:
+            log.warning('client %r is too slow, disconnecting', self.client)
+            self.close()
+            return False
+        self.outbox.append(data)
+        self.buffered += len(data)
+        return True
+
+    def reply(self, msg):
+        if not self.closed:
+            # Timestamped with the server's clock, as the latency is
+            # measured with it.
+            server = self.transport.server
+            received = server.clock() if server is not None else None
+            self.transport.inbox.append((self, _encode(msg), received))
+
+    def _deliver(self):
+        while self.outbox and not self.paused and not self.closed:
+            data = self.outbox.popleft()
+            self.buffered -= len(data)
+            self.client.on_message(self, data)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.outbox.clear()
+            self.buffered = 0
+            self.transport.conns.remove(self)
+            self.transport.server.disconnected(self)
+
+
+class LocalTransport(object):
+    """Transport for clients in the same process.
+    """
+
+    def __init__(self, max_buffer=1 << 16):
+        self.max_buffer = max_buffer
+        self.conns = []
+        self.inbox = collections.deque()
+        self.server = None
+
+    def attach(self, server):
+        self.server = server
+
+    def connect(self, client):
+        """Connect a client.
+
+        :returns: LocalConnection.
+        """
+
+        conn = LocalConnection(self, client, self.max_buffer)
+        self.conns.append(conn)
+        return conn
+
+    def poll(self, timeout):
+        for conn in list(self.conns):
+            conn._deliver()
+        if not self.inbox:
+            if timeout > 0:
+                time.sleep(timeout)
+            return
+        inbox, self.inbox = self.inbox, collections.deque()
+        for conn, line, received in inbox:
+            if not conn.closed:
+                self.server.receive(conn, line, received)
+
+
+class TCPConnection(_Connection):
+    """A client connected over TCP.
+    """
+
+    def __init__(self, transport, sock, address, max_buffer):
+        _Connection.__init__(self, max_buffer)
+        self.transport = transport
+        self.sock = sock
+        self.address = address
+        self.inbuf = ''
+        self.outbuf = bytearray()
+
+    def __repr__(self):
+        return '<TCPConnection %s:%s>' % self.address[:2]
+
+    def send(self, data):
+        if self.closed:
+            return False
+        if len(self.outbuf) + len(data) > self.max_buffer:
+            log.warning('%r is too slow, disconnecting', self)
+            self.close()
+            return False
+        if not self.outbuf:
+            # Try to send right away, and only buffer what is left.
+            try:
+                sent = self.sock.send(data)
+            except socket.error, e:
+                if e.args[0] not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    self.close()
+                    return False
+                sent = 0
+            data = data[sent:]
+            if not data:
+                return True
+            self.transport._want_write(self, True)
+        self.outbuf.extend(data)
+        return True
+
+    def _on_writable(self):
+        try:
+            sent = self.sock.send(self.outbuf)
+        except socket.error, e:
+            if e.args[0] not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                self.close()
+            return
+        del self.outbuf[:sent]
+        if not self.outbuf:
+            self.transport._want_write(self, False)
+
+    def _on_readable(self):
+        try:
+            data = self.sock.recv(65536)
+        except socket.error, e:
+            if e.args[0] not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                self.close()
+            return
+        if not data:
+            self.close()
+            return
+        received = self.transport.server.clock()
+        lines = (self.inbuf + data).split('\n')
+        self.inbuf = lines.pop()
+        if len(self.inbuf) > self.max_buffer:
+            log.warning('%r sent too long a line, disconnecting', self)
+            self.close()
+            return
+        for line in lines:
+            if self.closed:
+                break
+            if line.strip():
+                self.transport.server.receive(self, line, received)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.transport._remove(self)
+            self.sock.close()
+            self.transport.server.disconnected(self)
+
+
+class TCPTransport(object):
+    """Transport serving clients over TCP, with JSON lines. Uses
+    select.poll, so it is not for Windows.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, max_buffer=1 << 20,
+                 backlog=128):
+        """Create a TCPTransport listening on host and port, port 0
+        picks a free port (see self.address).
+
+        :param max_buffer: bytes buffered for a client before it is
+          disconnected as too slow.
+        """
+
+        self.max_buffer = max_buffer
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((host, port))
+        self.sock.listen(backlog)
+        self.sock.setblocking(0)
+        self.address = self.sock.getsockname()
+        self.poller = select.poll()
+        self.poller.register(self.sock.fileno(), select.POLLIN)
+        self.conns = {} # fileno -> TCPConnection
+        self.server = None
+
+    def attach(self, server):
+        self.server = server
+
+    def _want_write(self, conn, want):
+        flags = select.POLLIN | (select.POLLOUT if want else 0)
+        self.poller.modify(conn.sock.fileno(), flags)
+
+    def _remove(self, conn):
+        fileno = conn.sock.fileno()
+        self.poller.unregister(fileno)
+        del self.conns[fileno]
+
+    def _accept(self):
+        while True:
+            try:
+                sock, address = self.sock.accept()
+            except socket.error, e:
+                if e.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    return
+                raise
+            sock.setblocking(0)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            conn = TCPConnection(self, sock, address, self.max_buffer)
+            self.conns[sock.fileno()] = conn
+            self.poller.register(sock.fileno(), select.POLLIN)
+
+    def poll(self, timeout):
+        try:
+            events = self.poller.poll(timeout * 1000)
+        except select.error, e:
+            if e.args[0] == errno.EINTR:
+                return
+            raise
+        listener = self.sock.fileno()
+        for fileno, flags in events:
+            if fileno == listener:
+                self._accept()
+                continue
+            conn = self.conns.get(fileno)
+            if conn is None:
+                continue
+            if flags & (select.POLLIN | select.POLLHUP | select.POLLERR):
+                conn._on_readable()
+            if flags & select.POLLOUT and not conn.closed:
+                conn._on_writable()
+
+    def close(self):
+        for conn in self.conns.values():
+            conn.close()
+        self.poller.unregister(self.sock.fileno())
+        self.sock.close()
+
+
+class BotClient(object):
+    """A LocalTransport client playing at random, for load testing.
+    """
+
+    def __init__(self, rng=None, fold=0.1, aggression=0.2):
+        self.rng = rng or random.Random()
+        self.fold = fold
+        self.aggression = aggression
+        self.seats = {} # table -> seat
+        self.errors = 0
+
+    def on_message(self, conn, line):
+        if '"act"' not in line and '"error"' not in line:
+            return
+        msg = json.loads(line)
+        if 'error' in msg:
+            self.errors += 1
+            return
+        if msg['event'] != 'act' or msg['args'][0] != self.seats.get(msg['table']):
+            return
+        seat, options, timeout, chips, to_call, pot = msg['args']
+        rng = self.rng
+        r = rng.random()
+        reply = {'op': 'act', 'table': msg['table']}
+        if r < self.aggression and chips > to_call:
+            name = 'bet' if 'bet' in options else 'raise'
+            reply['action'] = name
+            reply['chips'] = min(chips, to_call + rng.randint(1, max(1, pot)))
+        elif 'check' in options:
+            reply['action'] = 'check'
+        elif r < self.aggression + self.fold:
+            reply['action'] = 'fold'
+        else:
+            reply['action'] = 'call'
+        conn.reply(reply)
+
+    def join(self, conn, table, seat, name=None):
+        self.seats[table] = seat
+        conn.reply({'op': 'join', 'table': table, 'seat': seat,
+                    'name': name or 'bot%d' % (seat,)})
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2011 Björn Edström <be@bjrn.se>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the University nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE REGENTS AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE REGENTS OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+
+""" headless simulation of games between bots.
+
+A bot is a strategy: a callable strategy(game, ps, options) which is
+called when the player ps is to act, with the set of valid options,
+and returns the action to take. That is one of 'check', 'call' or
+'fold', or a tuple ('bet', chips) or ('raise', chips) where chips is
+the number of chips to put in.
+
+For example, to play 1000 hands between two bots without output:
+
+    >>> g = Game(table, GameRules(), sink=None)
+    >>> play(g, {ps1: calling_station, ps2: random_strategy()}, 1000)
+"""
+
+import random
+
+from pyker.game import GameError
+
+
+def play(game, strategies, hands=1):
+    """Play hands of a game, with the players' decisions made by
+    strategies.
+
+    :param game: the Game, normally created with sink=None.
+    :type game: Game.
+    :param strategies: the strategy of each player.
+    :type strategies: {PlayerState: callable}.
+    :param hands: the number of hands to play.
+    :type hands: int.
+    :returns: the number of hands played, which is less than hands if
+      too few players with chips were left.
+    """
+
+    played = 0
+    while played < hands:
+        try:
+            actions = game.game().next()
+        except GameError:
+            if game.state == 'init':
+                break
+            raise
+
+        if actions is not None:
+            for options, action in actions:
+                action.take(strategies[action.ps](game, action.ps, options))
+
+        if game.state == 'init':
+            played += 1
+
+    return played
+
+
+def calling_station(game, ps, options):
+    """A strategy that checks or calls, and never folds."""
+
+    return 'check' if 'check' in options else 'call'
+
+
+def random_strategy(rng=None, fold=0.1, aggression=0.2):
+    """Return a strategy that plays at random.
+
+    :param rng: a random.Random, for reproducible decisions.
+    :param fold: probability of folding to a bet.
+    :param aggression: probability of betting or raising, up to the
+      size of the pot.
+    """
+
+    rng = rng or random.Random()
+
+    def strategy(game, ps, options):
+        r = rng.random()
+        to_call = 0
+        if 'raise' in options:
+            to_call = max(game.bets.values()) - game.bets.get(ps, 0)
+        # A raise must put in more than the amount to call.
+        if r < aggression and ps.chips > to_call:
+            pot = sum([total for _, total in game.pots.list()])
+            chips = min(ps.chips, rng.randint(1, max(1, pot)))
+            if 'bet' in options:
+                return 'bet', chips
+            return 'raise', min(ps.chips, to_call + chips)
+        if 'check' in options:
+            return 'check'
+        if r < aggression + fold:
+            return 'fold'
+        return 'call'
+
+    return strategy
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2011 Björn Edström <be@bjrn.se>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. Neither the name of the University nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE REGENTS AND CONTRIBUTORS ``AS IS'' AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE REGENTS OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF
+# SUCH DAMAGE.
+
+
+""" instrumentation of the game state machine.
+
+A GameStats given to a Game (see pyker.game.Game) records where the
+time goes:
+
+    >>> stats = GameStats(profile_every=100)
+    >>> game = Game(table, rules, sink=None, stats=stats)
+    >>> ... play ...
+    >>> stats.write_prometheus('/var/lib/node_exporter/pyker.prom')
+    >>> print json.dumps(stats.to_json())
+    >>> stats.profile().sort_stats('cumulative').print_stats(20)
+
+It has histograms of the time spent in each state of the state
+machine (for the betting rounds, only the time spent in the game, not
+waiting for decisions) and taking each kind of action, counters of
+hands, pots, all-ins and actions, and the number of calls to
+pyker.evaluator. Without a GameStats, which is the default, a Game
+does no more than check that it has none.
+
+With profile_every=N, every N:th hand is run under cProfile, and the
+profiles are added up. Only one hand is profiled at a time in a
+process, so when many tables are run in one thread the hands that
+start while another is profiled are skipped.
+
+Several Games may share a GameStats.
+"""
+
+import bisect
+import cProfile
+import os
+import pstats
+import time
+
+
+# Upper bounds of the histogram buckets, in seconds.
+BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001,
+           0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# The Profile that is enabled, if any.
+_profiling = None
+
+
+class Histogram(object):
+    """A histogram of durations, with counts per bucket as in
+    Prometheus.
+    """
+
+    __slots__ = ('bounds', 'counts', 'count', 'sum')
+
+    def __init__(self, bounds=BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1) # the last is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def cumulative(self):
+        """Return [(upper bound, observations <= upper bound)], the last
+        with bound float('inf').
+        """
+
+        total = 0
+        buckets = []
+        for bound, n in zip(self.bounds + (float('inf'),), self.counts):
+            total += n
+            buckets.append((bound, total))
+        return buckets
+
+    def to_json(self):
+        return {'count': self.count, 'sum': self.sum,
+                'buckets': [[b if b != float('inf') else '+Inf', n]
+                            for b, n in self.cumulative()]}
+
+
+class GameStats(object):
+    """Timings and counters of one or more Games.
+
+    :ivar states: Histogram per state name, such as 'deal-flop' or
+      'betting-preflop'.
+    :ivar actions: Histogram per action, such as 'call'.
+    :ivar counters: dict of counter name to count: 'hands', 'pots'
+      (including side pots, at showdown), 'all-ins', 'profiled' (hands)
+      and 'evaluator-state', 'evaluator-add-card' and
+      'evaluator-score' for the evaluator calls.
+    """
+
+    COUNTERS = ('hands', 'pots', 'all-ins', 'profiled', 'evaluator-state',
+                'evaluator-add-card', 'evaluator-score')
+
+    def __init__(self, profile_every=0, clock=time.time, bounds=BUCKETS):
+        """Create a GameStats.
+
+        :param profile_every: profile one hand in this many, 0 for
+          none.
+        :type profile_every: int.
+        :param clock: function returning the time in seconds.
+        :param bounds: upper bounds of the histogram buckets.
+        """
+
+        self.profile_every = profile_every
+        self.clock = clock
+        self.bounds = bounds
+        self.states = {}
+        self.actions = {}
+        self.counters = dict.fromkeys(self.COUNTERS, 0)
+        self._profiler = None
+        self._stats = None
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def _observe(self, histograms, name, seconds):
+        try:
+            histograms[name].observe(seconds)
+        except KeyError:
+            histograms[name] = h = Histogram(self.bounds)
+            h.observe(seconds)
+
+    def observe_state(self, name, seconds):
+        self._observe(self.states, name, seconds)
+
+    def observe_action(self, name, seconds):
+        self._observe(self.actions, name, seconds)
+
+    def step(self, game, transition):
+        """Run a transition of the game state machine, timed. This is
+        what Game.game() does with stats.
+
+        :param game: the Game.
+        :param transition: generator of the transition, yielding
+          once: None or the actions of a betting round.
+        """
+
+        state = game.state
+        if state == 'betting' or game.acted is not None:
+            name = 'betting-' + game.sub_state
+        else:
+            name = state
+        new_hand = state == 'init' and game.acted is None
+        if new_hand:
+            self._start_hand()
+
+        clock = self.clock
+        start = clock()
+        try:
+            ret = transition.next()
+        except:
+            if new_hand:
+                self._end_hand(discard=True)
+            raise
+        if new_hand:
+            self.count('hands')
+        if ret is None:
+            self.observe_state(name, clock() - start)
+            if state == 'showdown':
+                self._end_hand()
+        else:
+            ret = self._round(name, ret, clock() - start)
+        yield ret
+
+    def _round(self, name, actions, elapsed):
+        # Time a betting round, the time the caller spends on each
+        # decision left out.
+        clock = self.clock
+        while True:
+            start = clock()
+            try:
+                item = actions.next()
+            except StopIteration:
+                self.observe_state(name, elapsed + clock() - start)
+                return
+            elapsed += clock() - start
+            yield item
+
+    def _start_hand(self):
+        global _profiling
+        if self.profile_every and _profiling is None and \
+                self.counters['hands'] % self.profile_every == 0:
+            _profiling = self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def _end_hand(self, discard=False):
+        global _profiling
+        if self._profiler is not None:
+            self._profiler.disable()
+            if discard:
+                pass
+            elif self._stats is None:
+                self._stats = pstats.Stats(self._profiler)
+            else:
+                self._stats.add(self._profiler)
+            _profiling = self._profiler = None
+            if not discard:
+                self.count('profiled')
+
+    def profile(self):
+        """Return the profiles of the sampled hands added up, as a
+        pstats.Stats, or None if no hand has been profiled.
+        """
+
+        return self._stats
+
+    def to_json(self):
+        """Return the stats as a dict that can be serialized to
+        JSON.
+        """
+
+        return {
+            'counters': dict(self.counters),
+            'states': dict((name, h.to_json()) for name, h in self.states.iteritems()),
+            'actions': dict((name, h.to_json()) for name, h in self.actions.iteritems()),
+            }
+
+    def prometheus(self, prefix='pyker'):
+        """Return the stats in the Prometheus text format.
+        """
+
+        lines = []
+        for name in sorted(self.counters):
+            metric = '%s_%s_total' % (prefix, name.replace('-', '_'))
+            lines.append('# TYPE %s counter' % (metric,))
+            lines.append('%s %d' % (metric, self.counters[name]))
+
+        for kind, histograms in (('state', self.states), ('action', self.actions)):
+            metric = '%s_%s_seconds' % (prefix, kind)
+            lines.append('# TYPE %s histogram' % (metric,))
+            for name in sorted(histograms):
+                h = histograms[name]
+                for bound, n in h.cumulative():
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append('%s_bucket{%s="%s",le="%s"} %d' % (metric, kind, name, le, n))
+                lines.append('%s_sum{%s="%s"} %r' % (metric, kind, name, h.sum))
+                lines.append('%s_count{%s="%s"} %d' % (metric, kind, name, h.count))
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path, prefix='pyker'):
+        """Write the stats in the Prometheus text format to a file,
+        replacing it atomically, as for the node exporter's textfile
+        collector.
+        """
+
+        tmp = '%s.%d.tmp' % (path, os.getpid())
+        with open(tmp, 'w') as f:
+            f.write(self.prometheus(prefix))
+        os.rename(tmp, path)
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2011 Björn Edström <be@bjrn.se>
+
+import itertools
+import random
+import unittest
+
+import pyker.equity as equity
+import pyker.evaluator as evaluator
+from pyker.poker import string_to_cards
+
+try:
+    import numpy
+    import pyker.batch as batch
+except ImportError:
+    numpy = None
+
+
+@unittest.skipIf(numpy is None, 'numpy is not installed')
+class BatchTest(unittest.TestCase):
+    def hands(self, n, k, seed):
+        rng = random.Random(seed)
+        return numpy.array([rng.sample(xrange(52), k) for _ in xrange(n)],
+                           dtype=numpy.uint8)
+
+    def test_matches_evaluator(self):
+        for k in (5, 6, 7):
+            hands = self.hands(3000, k, k)
+            scores = batch.evaluate(hands, chunk_size=1000)
+            self.assertEquals((3000,), scores.shape)
+            for row, score in zip(hands.tolist(), scores.tolist()):
+                self.assertEquals(evaluator.evaluate(row), score)
+
+    def test_categories(self):
+        hands = numpy.array([[0, 5, 8, 12, 48],     # wheel
+                             [2, 6, 10, 14, 50],    # steel wheel
+                             [0, 1, 2, 3, 4]])      # quads
+        scores, cats = batch.evaluate(hands, categories=True)
+        self.assertEquals([evaluator.STRAIGHT, evaluator.STRAIGHT_FLUSH,
+                           evaluator.FOUR_OF_A_KIND], cats.tolist())
+
+    def test_iter_evaluate(self):
+        hands = self.hands(100, 7, 0)
+        chunks = [hands[:30], hands[30:]]
+        streamed = numpy.concatenate(list(batch.iter_evaluate(chunks)))
+        self.assertEquals(batch.evaluate(hands).tolist(), streamed.tolist())
+
+    def test_bad_shape(self):
+        self.assertRaises(ValueError, batch.evaluate, numpy.zeros((3, 4)))
+
+    def test_boards(self):
+        boards = batch.Boards()
+        hole = [12, 49]
+        scores = boards.scores(hole)
+        for i, board in enumerate(itertools.combinations(xrange(52), 5)):
+            if i % 997 == 0 and not set(hole) & set(board):
+                self.assertEquals(evaluator.evaluate(hole + list(board)), scores[i])
+
+    def test_heads_up_counts(self):
+        for a, b in [('ah kh', 'qh jh'), ('ah ad', 'kh kd')]:
+            holes = [string_to_cards(a), string_to_cards(b)]
+            r = equity.exact_equity(holes)
+            self.assertEquals((r.wins[0], r.ties[0]),
+                              batch.heads_up_counts(*[[c.code for c in hole] for hole in holes]))
+
+
+if __name__ == '__main__':
+    unittest.main()
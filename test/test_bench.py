@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2011 Björn Edström <be@bjrn.se>
+
+import unittest
+
+import pyker.bench as bench
+
+
+class BenchTest(unittest.TestCase):
+    def test_run(self):
+        results = bench.run(['eval7', 'pots6'], scale=0.01, repeat=1)
+        for name in ('eval7', 'pots6'):
+            r = results['results'][name]
+            self.assertTrue(r['ops'] > 0)
+            self.assertTrue(r['ops_per_sec'] > 0)
+            self.assertTrue(r['peak_rss_kb'] > 0)
+
+    def test_compare(self):
+        def results(**ops):
+            return {'results': dict((k, {'ops_per_sec': v}) for k, v in ops.items())}
+
+        rows = bench.compare(results(a=85.0, b=95.0, c=1.0),
+                             results(a=100.0, b=100.0), threshold=0.1)
+        self.assertEquals([('a', 85.0, 100.0, 0.85, True),
+                           ('b', 95.0, 100.0, 0.95, False)], rows)
+
+
+if __name__ == '__main__':
+    unittest.main()
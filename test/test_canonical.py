@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2011 Björn Edström <be@bjrn.se>
+
+import itertools
+import random
+import unittest
+
+from pyker.canonical import *
+from pyker.poker import *
+
+
+def codes(s):
+    return [c.code for c in string_to_cards(s)]
+
+
+class CanonicalTest(unittest.TestCase):
+    def test_flops(self):
+        flops = itertools.combinations(range(52), 3)
+        self.assertEquals(1755, len(set(canonical_key([f]) for f in flops)))
+
+    def test_isomorphic(self):
+        a = canonicalize([codes('ah kh'), codes('2h 7h 9c')])
+        b = canonicalize([codes('as ks'), codes('9d 2s 7s')])
+        self.assertEquals(a[:2], b[:2])
+        self.assertEquals(a[0], canonical_key([codes('ah kh'), codes('2h 7h 9c')]))
+
+        # Not the same: the flush draw is in the other player's hand.
+        c = canonicalize([codes('ah kd'), codes('2h 7h 9c')])
+        self.assertNotEquals(a[0], c[0])
+        # Groups matter.
+        self.assertNotEquals(canonical_key([codes('ah kh'), codes('2h')]),
+                             canonical_key([codes('ah'), codes('kh 2h')]))
+
+    def test_perm(self):
+        rng = random.Random(1)
+        for _ in xrange(100):
+            cards = rng.sample(range(52), 7)
+            key, canon, perm = canonicalize([cards[:2], cards[2:]])
+            self.assertEquals(sorted(perm), range(4))
+            mapped = [(c & ~3) | perm[c & 3] for c in cards]
+            self.assertEquals(canon, (tuple(sorted(mapped[:2])), tuple(sorted(mapped[2:]))))
+
+
+class LRUCacheTest(unittest.TestCase):
+    def test_evict(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEquals(1, cache.get('a'))
+        cache.put('c', 3) # evicts b, the least recently used
+        self.assertEquals(None, cache.get('b'))
+        self.assertEquals(3, cache.get('c'))
+        self.assertEquals(1, cache.get('a'))
+        self.assertEquals(2, len(cache))
+        self.assertEquals((3, 1, 1), (cache.hits, cache.misses, cache.evictions))
+        self.assertEquals(0.75, cache.stats()['hit_rate'])
+
+        cache.clear()
+        self.assertEquals(0, len(cache))
+        self.assertEquals(0.0, cache.hit_rate)
+
+
+class IsoCacheTest(unittest.TestCase):
+    def test_best_from_seven(self):
+        cache = IsoCache(1000)
+        rng = random.Random(2)
+        for _ in xrange(200):
+            cards = rng.sample(CARDS, 7)
+            expected = Hand.best_from_seven(*cards)
+            hand = cache.best_from_seven(*cards)
+            self.assertEquals(expected.score(), hand.score())
+            self.assertTrue(set(hand.cards) <= set(cards))
+
+        cards = string_to_cards('ah kh qh jh 2c 3d 4s')
+        cache.best_from_seven(*cards)
+        hand = cache.best_from_seven(*string_to_cards('as ks qs js 2c 3d 4h'))
+        self.assertEquals(1, cache.hits)
+        self.assertEquals(set(string_to_cards('as ks qs js 4h')), set(hand.cards))
+
+    def test_exact_equity(self):
+        cache = IsoCache(10)
+        board = string_to_cards('2h 7h 9c')
+        a = cache.exact_equity([string_to_cards('ah kh'), string_to_cards('qs qd')], board)
+        b = cache.exact_equity([string_to_cards('ad kd'), string_to_cards('qs qh')],
+                               string_to_cards('2d 7d 9c'))
+        self.assertTrue(a is b)
+        self.assertEquals((1, 1), (cache.hits, cache.misses))
+
+        # The players are not interchangeable.
+        c = cache.exact_equity([string_to_cards('qs qd'), string_to_cards('ah kh')], board)
+        self.assertAlmostEquals(a.equity[0], c.equity[1])
+        self.assertEquals(2, cache.misses)
+
+
+if __name__ == '__main__':
+    unittest.main()
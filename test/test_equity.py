@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2011 Björn Edström <be@bjrn.se>
+
+import itertools
+import unittest
+
+import pyker.equity
+import pyker.evaluator as evaluator
+from pyker.equity import *
+from pyker.poker import *
+
+
+class EquityTest(unittest.TestCase):
+    def test_pair_vs_overcards(self):
+        r = equity([string_to_cards('qs qd'), string_to_cards('ah kc')],
+                   trials=20000, seed=1, processes=1)
+        self.assertEquals(20000, r.trials)
+        # Queens are about 57% against ace king offsuit.
+        self.assertTrue(0.54 < r.equity[0] < 0.60, r.equity)
+        self.assertAlmostEquals(1.0, sum(r.equity))
+        for e, (lo, hi) in zip(r.equity, r.interval()):
+            self.assertTrue(lo < e < hi)
+
+    def test_reproducible(self):
+        args = ([string_to_cards('7s 7d')],)
+        kwargs = dict(opponents=2, trials=3000, seed=5, batch_size=500)
+        r1 = equity(*args, processes=1, **kwargs)
+        r2 = equity(*args, processes=2, **kwargs)
+        self.assertEquals(r1.shares, r2.shares)
+        self.assertEquals(3, len(r1.equity))
+
+    def test_batch_size(self):
+        for trials, processes in [(100000, 32), (100000, 4), (10**7, 64)]:
+            size = pyker.equity._batch_size(trials, processes)
+            self.assertTrue((trials + size - 1) // size >= processes)
+        self.assertEquals(1000, pyker.equity._batch_size(5000, 8))
+
+    def test_target_stderr(self):
+        r = equity([string_to_cards('as ad'), string_to_cards('2c 7h')],
+                   trials=100000, target_stderr=0.01, seed=3,
+                   processes=1, batch_size=1000)
+        self.assertTrue(r.trials < 100000)
+        self.assertTrue(max(r.stderr) <= 0.01)
+
+    def test_river(self):
+        r = equity([string_to_cards('as ad'), string_to_cards('kc kd')],
+                   board=string_to_cards('2c 7h 9s ks 3d'),
+                   trials=10, processes=1)
+        self.assertEquals([0.0, 1.0], r.equity)
+
+    def test_bad_input(self):
+        self.assertRaises(ValueError, equity,
+                          [string_to_cards('as ad'), string_to_cards('as kd')])
+        self.assertRaises(ValueError, equity, [string_to_cards('as ad')])
+
+
+class ExactEquityTest(unittest.TestCase):
+    def brute_force(self, holes, board):
+        holes = [[c.code for c in hole] for hole in holes]
+        board = [c.code for c in board]
+        known = sum(holes, []) + board
+        stub = [c for c in xrange(52) if c not in known]
+        wins = [0] * len(holes)
+        runouts = 0
+        for runout in itertools.combinations(stub, 5 - len(board)):
+            scores = [evaluator.evaluate7(hole + board + list(runout))
+                      for hole in holes]
+            if scores.count(max(scores)) == 1:
+                wins[scores.index(max(scores))] += 1
+            runouts += 1
+        return runouts, wins
+
+    def test_matches_brute_force(self):
+        for holes, board in [(['ah kh', 'qh jh'], '2c 5d 9s'),
+                             (['as ad', 'kc kd', '7h 8h'], '2c 3c 9h'),
+                             (['5s 6s', '5d 6d'], '7c 8c 2h')]:
+            holes = map(string_to_cards, holes)
+            board = string_to_cards(board)
+            r = exact_equity(holes, board)
+            self.assertEquals(self.brute_force(holes, board), (r.trials, r.wins))
+            self.assertAlmostEquals(1.0, sum(r.equity))
+            self.assertEquals([0.0] * len(holes), r.stderr)
+
+    def test_suit_classes(self):
+        # Clubs, diamonds and spades are interchangeable, so only one
+        # runout of each class of up to six is evaluated.
+        holes = map(string_to_cards, ['ah kh', 'qh jh'])
+        board = string_to_cards('2h 3h 4d')
+        r = exact_equity(holes, board)
+        self.assertEquals(self.brute_force(holes, board), (r.trials, r.wins))
+        self.assertEquals(587, r.evaluated)
+
+        r = exact_equity(holes)
+        self.assertEquals(1712304, r.trials)
+        self.assertTrue(r.evaluated * 5 < r.trials)
+
+        # No suits are interchangeable.
+        r = exact_equity(map(string_to_cards, ['ah kd', 'qs jc']),
+                         string_to_cards('2h 3d 4c'))
+        self.assertEquals(r.trials, r.evaluated)
+
+    def test_split(self):
+        r = exact_equity(map(string_to_cards, ['5s 6s', '5d 6d']),
+                         string_to_cards('7c 8c 9h th'))
+        self.assertEquals(44, r.trials)
+        self.assertEquals([0, 0], r.wins)
+        self.assertEquals([0.5, 0.5], r.equity)
+
+
+if __name__ == '__main__':
+    unittest.main()
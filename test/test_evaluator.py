@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2011 Björn Edström <be@bjrn.se>
+
+import itertools
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import pyker.evaluator as evaluator
+from pyker.poker import *
+
+
+def codes(s):
+    return [c.code for c in string_to_cards(s)]
+
+
+class EvaluatorTest(unittest.TestCase):
+    def test_evaluate5(self):
+        for s, cls in [('7h 8h 9h th jh', StraightFlush),
+                       ('ah 2h 3h 4h 5h', StraightFlush),
+                       ('7h 7s 7c 7d jh', FourOfAKind),
+                       ('3h 3c 3s tc th', FullHouse),
+                       ('7h 8h 2h th jh', Flush),
+                       ('9c 8h 7d td jh', Straight),
+                       ('ac 2h 3d 4d 5h', Straight),
+                       ('3c 3h 3d td js', ThreeOfAKind),
+                       ('2c 2s 3d 3h jd', TwoPair),
+                       ('7c 4s 4d th jd', Pair),
+                       ('kc as 9d 3h 2d', Highest)]:
+            score = evaluator.evaluate5(codes(s))
+            self.assertEquals(cls, HandClass.from_score(score).__class__)
+            self.assertEquals(evaluator.category(score), cls.SCORE)
+
+    def test_matches_hand_class(self):
+        rng = random.Random(1)
+        for _ in xrange(2000):
+            cards = rng.sample(CARDS, 5)
+            score = evaluator.evaluate5([c.code for c in cards])
+            hc = Hand(cards).classify()
+            self.assertEquals(score, hc.score())
+            self.assertEquals(hc, HandClass.from_score(score))
+
+    def test_order_independent(self):
+        hand = codes('kc kd 9d 9h 2d')
+        scores = set(evaluator.evaluate5(p) for p in itertools.permutations(hand))
+        self.assertEquals(1, len(scores))
+
+    def test_evaluate7(self):
+        rng = random.Random(2)
+        for _ in xrange(2000):
+            cards = rng.sample(xrange(52), 7)
+            best = max(evaluator.evaluate5(h)
+                       for h in itertools.combinations(cards, 5))
+            self.assertEquals(best, evaluator.evaluate7(cards))
+            self.assertEquals(best, evaluator.evaluate(cards))
+
+            score, hand = evaluator.best_five(cards)
+            self.assertEquals(best, score)
+            self.assertEquals(best, evaluator.evaluate5(hand))
+            self.assertTrue(set(hand) <= set(cards))
+
+    def test_score_ranks(self):
+        rank_key = evaluator.tables()['rank_key']
+        rng = random.Random(4)
+        for _ in xrange(2000):
+            cards = rng.sample(xrange(52), 7)
+            score = evaluator.score_ranks(sum(rank_key[c] for c in cards))
+            if max(len([c for c in cards if c & 3 == s]) for s in xrange(4)) < 5:
+                self.assertEquals(evaluator.evaluate7(cards), score)
+            else:
+                self.assertTrue(score <= evaluator.evaluate7(cards))
+
+    def test_evaluate6(self):
+        rng = random.Random(3)
+        for _ in xrange(1000):
+            cards = rng.sample(xrange(52), 6)
+            best = max(evaluator.evaluate5(h)
+                       for h in itertools.combinations(cards, 5))
+            self.assertEquals(best, evaluator.evaluate(cards))
+
+    def test_seven_card_flush(self):
+        score = evaluator.evaluate7(codes('2h 3h 4h 5h 9h ah 5c'))
+        self.assertEquals(StraightFlush(Rank(5)), HandClass.from_score(score))
+
+        score = evaluator.evaluate7(codes('2h 7h 4h 5h 9h ah as'))
+        self.assertEquals(Flush, HandClass.from_score(score).__class__)
+
+
+class TablesTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'evaluator.tables')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_save_and_read(self):
+        evaluator.save_tables(self.path)
+        self.assertEquals(evaluator._build_tables(),
+                          evaluator._read_tables(self.path))
+
+    def test_corrupt(self):
+        evaluator.save_tables(self.path)
+        with open(self.path, 'r+b') as f:
+            f.seek(-1, os.SEEK_END)
+            f.write('x')
+        self.assertRaises(ValueError, evaluator._read_tables, self.path)
+
+    def test_lazy_build(self):
+        old = os.environ.get('PYKER_TABLES')
+        os.environ['PYKER_TABLES'] = self.path
+        try:
+            evaluator._load_tables()
+            self.assertTrue(os.path.exists(self.path))
+            self.assertEquals(StraightFlush(Rank('a')),
+                              HandClass.from_score(evaluator.evaluate5(codes('ah kh qh jh th'))))
+        finally:
+            if old is None:
+                del os.environ['PYKER_TABLES']
+            else:
+                os.environ['PYKER_TABLES'] = old
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2011 Björn Edström <be@bjrn.se>
+
+import random
+import unittest
+
+import pyker.evaluator as evaluator
+from pyker.game import *
+from pyker.sim import *
+
+
+class SimTest(unittest.TestCase):
+    def setUp(self):
+        random.seed(1)
+        self.events = []
+        self.table = Table(6)
+        self.game = Game(self.table, GameRules(),
+                         sink=lambda event, *args: self.events.append((event, args)))
+        self.game.set_blinds(20, 10)
+        self.players = []
+        self.strategies = {}
+        for i in xrange(6):
+            ps = PlayerState(Player('p%d' % i), 500)
+            self.table.join(i, ps)
+            self.players.append(ps)
+            self.strategies[ps] = random_strategy(random.Random(i))
+
+    def total(self):
+        return sum(ps.chips for ps in self.players)
+
+    def test_chips_conserved(self):
+        for _ in xrange(100):
+            if play(self.game, self.strategies, 1) == 0:
+                break
+            self.assertEquals(3000, self.total())
+
+    def test_plays_until_too_few_players(self):
+        played = play(self.game, self.strategies, 100000)
+        self.assertTrue(played < 100000)
+        self.assertEquals(1, len([ps for ps in self.players if ps.chips]))
+
+    def test_folded_players_do_not_act(self):
+        folded = set()
+        def sink(event, *args):
+            if event == 'action' and args[1] == 'fold':
+                folded.add(args[0])
+            elif event == 'to-act':
+                self.assertTrue(args[0] not in folded)
+            elif event == 'state' and args[0] == 'INIT':
+                folded.clear()
+        self.game.sink = sink
+        play(self.game, self.strategies, 50)
+
+    def test_events(self):
+        play(self.game, dict.fromkeys(self.players, calling_station), 1)
+        events = [e for e, _ in self.events]
+        self.assertEquals(('INIT',), self.events[0][1])
+        self.assertEquals(6, events.count('hole'))
+        self.assertEquals(['small', 'big'], [args[1] for e, args in self.events if e == 'blind'])
+        self.assertEquals(6, events.count('hand'))
+        self.assertTrue('won' in events)
+
+    def test_headless(self):
+        self.game.sink = None
+        self.assertEquals(10, play(self.game, dict.fromkeys(self.players, calling_station), 10))
+        self.assertEquals(3000, self.total())
+        self.assertEquals([], self.events)
+
+
+class ShowdownTest(unittest.TestCase):
+    def setUp(self):
+        self.events = []
+        self.table = Table(3)
+        self.game = Game(self.table, GameRules(),
+                         sink=lambda event, *args: self.events.append((event, args)))
+        self.players = []
+        for i, chips in enumerate([1000, 1000, 50]):
+            ps = PlayerState(Player('p%d' % i), chips)
+            self.table.join(i, ps)
+            self.players.append(ps)
+
+        self.game._state_init()
+        self.game.dealer = 0
+
+    def deal(self, *holes):
+        for ps, hole in zip(self.players, holes):
+            ps.hole = string_to_cards(hole)
+            self.game.hand_states[ps] = evaluator.state([c.code for c in ps.hole])
+        board = string_to_cards('ah kd qc js 2h')
+        self.game.flop = board[:3]
+        self.game.turn, self.game.river = board[3:]
+        for card in board:
+            self.game._add_community(card)
+
+    def test_split_odd_chips(self):
+        p0, p1, p2 = self.players
+        # Everyone plays the straight on the board.
+        self.deal('3c 4c', '3d 4d', '3h 4h')
+        self.game.post(p0, 101)
+        self.game.post(p1, 100)
+        self.game.post(p2, 100)
+        self.game._state_showdown()
+
+        # The odd chip of the side pot goes to the first player left
+        # of the button.
+        won = [args for e, args in self.events if e == 'won']
+        self.assertEquals([(p1, 50), (p2, 50), (p0, 50), (p1, 51), (p0, 50)], won)
+        self.assertEquals([999, 1001, 50], [ps.chips for ps in self.players])
+
+    def test_split_button_after_empty_seat(self):
+        # The dealer seat is empty or busted, so the button is the next
+        # player, and the odd chip goes to the player after that.
+        for busted in (None, PlayerState(Player('busted'), 0)):
+            self.events = []
+            self.table = Table(4)
+            self.game = Game(self.table, GameRules(),
+                             sink=lambda event, *args: self.events.append((event, args)))
+            if busted is not None:
+                self.table.join(0, busted)
+            self.players = []
+            for i in xrange(3):
+                ps = PlayerState(Player('p%d' % i), 1000)
+                self.table.join(i + 1, ps)
+                self.players.append(ps)
+            self.game._state_init()
+            self.game.dealer = 0
+
+            p0, p1, p2 = self.players
+            self.deal('3c 4c', '3d 4d', '3h 4h')
+            self.game.post(p0, 100)
+            self.game.post(p1, 100)
+            self.game.post(p2, 101)
+            self.game._state_showdown()
+
+            won = [args for e, args in self.events if e == 'won']
+            self.assertEquals([(p1, 101), (p2, 100), (p0, 100)], won)
+
+    def test_side_pots(self):
+        p0, p1, p2 = self.players
+        self.deal('tc 4c', # straight
+                  'ad ac', # three of a kind
+                  'th 9h') # straight, all-in
+        self.game.post(p0, 300)
+        self.game.post(p1, 300)
+        self.game.post(p2, 300)
+        self.game._state_showdown()
+
+        self.assertEquals([1000 - 300 + 75 + 500, 700, 75],
+                          [ps.chips for ps in self.players])
+
+
+class HandStrengthTest(unittest.TestCase):
+    def test_scores_every_street(self):
+        random.seed(4)
+        table = Table(4)
+        players = []
+        for i in xrange(4):
+            ps = PlayerState(Player('p%d' % i), 1000)
+            table.join(i, ps)
+            players.append(ps)
+
+        checked = []
+        def strategy(game, ps, options):
+            board = [c.code for c in game.flop]
+            board += [c.code for c in (game.turn, game.river) if c is not None]
+            if board:
+                score = evaluator.evaluate([c.code for c in ps.hole] + board)
+                self.assertEquals(score, game.hand_score(ps))
+                self.assertEquals(HandClass.from_score(score), game.hand_class(ps))
+            else:
+                self.assertEquals(None, game.hand_score(ps))
+            checked.append(len(board))
+            return calling_station(game, ps, options)
+
+        game = Game(table, GameRules(), sink=None)
+        game.set_blinds(20, 10)
+        play(game, dict.fromkeys(players, strategy), 5)
+        self.assertEquals(set([0, 3, 4, 5]), set(checked))
+
+
+class GameStateTest(unittest.TestCase):
+    def setUp(self):
+        self.table = Table(5)
+        self.game = Game(self.table, GameRules(), sink=None, rng=random.Random(7))
+        self.game.set_blinds(20, 10)
+        self.strategies = {}
+        for i in xrange(4):
+            ps = PlayerState(Player('p%d' % i), 500 + 100 * i)
+            self.table.join(i if i < 2 else i + 1, ps)
+            self.strategies[ps] = random_strategy(random.Random(i), fold=0.05)
+
+    def play_hand(self):
+        # Play a hand, taking a snapshot at every decision.
+        snapshots = []
+        decisions = []
+        while True:
+            actions = self.game.game().next()
+            if actions is not None:
+                for options, action in actions:
+                    snapshots.append(self.game.snapshot())
+                    decision = self.strategies[action.ps](self.game, action.ps, options)
+                    decisions.append((self.table.seats.index(action.ps), decision))
+                    action.take(decision)
+            if self.game.state == 'init':
+                return snapshots, decisions
+
+    def test_apply(self):
+        for _ in xrange(10):
+            snapshots, decisions = self.play_hand()
+            chips = self.game.snapshot().chips
+            for k, st in enumerate(snapshots):
+                for seat, decision in decisions[k:]:
+                    self.assertEquals(seat, st.to_act)
+                    st = st.apply(decision)
+                self.assertTrue(st.hand_over)
+                self.assertEquals(None, st.to_act)
+                self.assertEquals(chips, st.chips)
+
+    def test_fork(self):
+        self.play_hand()
+        snapshots, decisions = self.play_hand()
+        board = self.game.flop + [self.game.turn, self.game.river]
+        chips = [ps.chips for ps in self.table.seats if ps is not None]
+
+        st = snapshots[len(snapshots) // 2]
+        game = st.fork()
+        seats = game.table.seats
+        rest = iter(decisions[len(snapshots) // 2:])
+        def strategy(game, ps, options):
+            seat, decision = rest.next()
+            self.assertTrue(seats[seat] is ps)
+            return decision
+        play(game, dict((ps, strategy) for ps in seats if ps is not None), 1)
+        self.assertEquals(board, game.flop + [game.turn, game.river])
+        self.assertEquals(chips, [ps.chips for ps in seats if ps is not None])
+
+        # The snapshot is not changed by forking or applying.
+        self.assertEquals(st.chips, snapshots[len(snapshots) // 2].fork().snapshot().chips)
+        a = st.apply('fold').chips
+        self.assertEquals(a, st.apply('fold').chips)
+
+    def test_advance(self):
+        st = self.game.snapshot().advance()
+        self.assertFalse(st.hand_over)
+        self.assertTrue(st.to_act is not None)
+        self.assertTrue(st.options)
+
+
+if __name__ == '__main__':
+    unittest.main()
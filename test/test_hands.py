@@ -2,6 +2,7 @@
 #
 # Copyright (c) 2011 Björn Edström <be@bjrn.se>
 
+import random
 import unittest
 
 from pyker.poker import *
@@ -24,6 +25,12 @@ class HandTest(unittest.TestCase):
         self.assertEquals(Pair, C('7c 4s 4d th jd'))
         self.assertEquals(Highest, C('kc as 9d 3h 2d'))
 
+    def test_from_score_range(self):
+        self.assertEquals(Highest, HandClass.from_score(0).__class__)
+        self.assertEquals(StraightFlush, HandClass.from_score(9 * 13**5 - 1).__class__)
+        self.assertRaises(ValueError, HandClass.from_score, -1)
+        self.assertRaises(ValueError, HandClass.from_score, 9 * 13**5)
+
     def test_relative(self):
         H = lambda s: Hand.best_from_seven(*string_to_cards(s))
 
@@ -67,6 +74,100 @@ class HandTest(unittest.TestCase):
         C = lambda s: Hand.from_string(s).classify()
         self.assertEquals('Straight Flush, Jack High', str(C('7h 8h 9h th jh')))
 
+    def test_interned(self):
+        self.assertTrue(Rank('j') is Rank.from_string('J'))
+        self.assertTrue(Card(Rank(8), 'h') is Card.from_string('8h'))
+        self.assertEquals(52, len(set(CARDS)))
+
+        for code, card in enumerate(CARDS):
+            self.assertEquals(code, card.code)
+            self.assertTrue(card is card_from_code(code))
+            self.assertTrue(card is Card.from_string(str(card)))
+
+        self.assertEquals(sorted(CARDS, key=lambda c: (c.rank, c.suit)),
+                          list(CARDS))
+
+        self.assertRaises(ValueError, Card.from_string, '1h')
+        self.assertRaises(ValueError, Card.from_string, 'ax')
+
+    def test_value_types(self):
+        h1 = Hand.from_string('ah kh qh jh th')
+        h2 = Hand.from_string('th jh qh kh ah')
+        h3 = Hand.from_string('as ks qs js ts')
+        h4 = Hand.from_string('ks qs js ts 9s')
+        self.assertEquals(h1, h2)
+        self.assertEquals(1, len(set([h1, h2])))
+
+        # Equal strength, different cards.
+        self.assertEquals(h1, h3)
+        self.assertFalse(h1 != h3)
+        self.assertEquals(hash(h1), hash(h3))
+        self.assertFalse(h1 < h3 or h3 < h1)
+        self.assertTrue(h1 <= h3 and h1 >= h3)
+        self.assertEquals(h1.sort_key(), h3.sort_key())
+
+        self.assertNotEquals(h1, h4)
+        self.assertTrue(h4 < h1 and h1 > h4)
+
+        self.assertRaises(AttributeError, setattr, h1, 'cards', h3.cards)
+        self.assertRaises(AttributeError, setattr, h1.classify(), 'highest', Rank(2))
+        self.assertTrue(h1.classify() is h1.classify())
+
+        hc = h1.classify()
+        self.assertEquals(hc, StraightFlush(Rank('a')))
+        self.assertEquals(hash(hc), hash(StraightFlush(Rank('a'))))
+        self.assertEquals({hc: 1}, {StraightFlush(Rank('a')): 1})
+
+        hands = [Hand.from_string(s) for s in ('7c 4s 4d th jd', '2c 2s 3d 3h jd',
+                                               'kc as 9d 3h 2d', '3h 3c 3s tc th')]
+        ordered = sorted(hands)
+        self.assertEquals(ordered, sorted(hands, key=Hand.sort_key))
+        self.assertEquals([Highest, Pair, TwoPair, FullHouse],
+                          [h.classify().__class__ for h in ordered])
+        self.assertEquals(sorted(h.classify() for h in hands),
+                          [h.classify() for h in ordered])
+
+
+class DeckTest(unittest.TestCase):
+    def test_deal_all(self):
+        deck = Deck(rng=random.Random(1))
+        self.assertEquals(52, len(deck))
+        cards = deck.deal_many(50)
+        cards.append(deck.deal())
+        deck.burn()
+        self.assertEquals(0, len(deck))
+        self.assertEquals(sorted(CARDS), sorted(cards + [deck.cards[51]]))
+        self.assertRaises(ValueError, deck.deal)
+
+        deck.reset()
+        self.assertEquals(52, len(deck))
+        self.assertEquals(52, len(set(deck.deal_many(52))))
+
+    def test_dead(self):
+        dead = string_to_cards('as ks 2c')
+        deck = Deck(rng=random.Random(2))
+        for _ in xrange(20):
+            deck.reset(dead)
+            self.assertEquals(49, len(deck))
+            cards = deck.deal_many(49)
+            self.assertFalse(set(cards) & set(dead))
+            self.assertRaises(ValueError, deck.deal)
+
+    def test_seeded(self):
+        deal = lambda seed: Deck(rng=random.Random(seed)).deal_many(9)
+        self.assertEquals(deal(5), deal(5))
+        self.assertNotEquals(deal(5), deal(6))
+
+    def test_uniform(self):
+        # Every card is about equally likely to be the first dealt.
+        deck = Deck(range(4), rng=random.Random(3))
+        counts = [0] * 4
+        for _ in xrange(4000):
+            deck.reset()
+            counts[deck.deal()] += 1
+        for n in counts:
+            self.assertTrue(900 < n < 1100, counts)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2011 Björn Edström <be@bjrn.se>
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from pyker.game import *
+from pyker.history import *
+from pyker.sim import *
+
+
+class HistoryTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'hands.pkh')
+
+        random.seed(3)
+        self.table = Table(6)
+        self.game = Game(self.table, GameRules(), sink=None)
+        self.game.set_blinds(20, 10)
+        self.strategies = {}
+        for i in xrange(6):
+            ps = PlayerState(Player('p%d' % i), 1000)
+            self.table.join(i, ps)
+            self.strategies[ps] = random_strategy(random.Random(i))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def record(self, hands, close=True):
+        writer = HistoryWriter(open(self.path, 'wb'), buffer_size=256)
+        writer.attach(self.game)
+        played = play(self.game, self.strategies, hands)
+        if close:
+            writer.close()
+        else:
+            writer.flush()
+        return played
+
+    def test_encode(self):
+        hand = HandRecord(9, 3, 10, 20,
+                          [(1, 1000, (0, 51)), (3, 200000, (12, 13))],
+                          [1, 2, 3, 4, 5],
+                          [(0, 'raise', 300), (1, 'call', None),
+                           (1, 'bet', 1), (0, 'fold', None)])
+        data = hand.encode()
+        self.assertEquals((hand, len(data)), HandRecord.decode(data))
+        self.assertTrue(len(data) < 40)
+
+    def test_read(self):
+        played = self.record(600)
+        reader = HistoryReader(self.path)
+        hands = list(reader)
+        self.assertEquals(played, len(reader))
+        self.assertEquals(played, len(hands))
+        for i in [0, 1, 255, 256, 257, played - 1]:
+            self.assertEquals(hands[i], reader[i])
+        self.assertEquals(hands[-1], reader[-1])
+        self.assertRaises(IndexError, lambda: reader[played])
+
+        # Tens of bytes per hand.
+        self.assertTrue(os.path.getsize(self.path) < 80 * played)
+        reader.close()
+
+    def test_replay(self):
+        played = self.record(100)
+        reader = HistoryReader(self.path)
+        for i in xrange(played - 1):
+            game = reader.replay(i)
+            # The stacks after the replay are those at the start of
+            # the next hand.
+            stacks = dict((seat, chips) for seat, chips, _ in reader[i + 1].players)
+            for seat, ps in enumerate(game.table.seats):
+                if ps is not None:
+                    self.assertEquals(stacks.get(seat, 0), ps.chips)
+        reader.close()
+
+    def test_replay_events(self):
+        events = []
+        self.game.sink = lambda event, *args: events.append(event)
+        self.record(1)
+        replayed = []
+        reader = HistoryReader(self.path)
+        reader.replay(0, lambda event, *args: replayed.append(event))
+        self.assertEquals(events, replayed)
+        reader.close()
+
+    def test_not_closed(self):
+        played = self.record(50, close=False)
+        with open(self.path, 'ab') as f:
+            f.write('\x50\x01') # part of a record
+        reader = HistoryReader(self.path)
+        self.assertEquals(played, len(reader))
+        self.assertEquals(reader[played - 1], list(reader)[-1])
+        reader.close()
+
+    def test_bad_file(self):
+        with open(self.path, 'wb') as f:
+            f.write('not a hand history')
+        self.assertRaises(ValueError, HistoryReader, self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2011 Björn Edström <be@bjrn.se>
+
+import itertools
+import random
+import unittest
+
+import pyker.evaluator as evaluator
+import pyker.omaha as omaha
+from pyker.equity import equity
+from pyker.poker import *
+
+
+def naive(hole, board):
+    return max(evaluator.evaluate5(two + three)
+               for two in itertools.combinations(hole, 2)
+               for three in itertools.combinations(board, 3))
+
+
+class OmahaTest(unittest.TestCase):
+    def test_random(self):
+        rng = random.Random(1)
+        for _ in xrange(2000):
+            size = rng.choice([4, 5])
+            cards = rng.sample(range(52), size + rng.choice([3, 4, 5]))
+            hole, board = cards[:size], cards[size:]
+            self.assertEquals(naive(hole, board), omaha.evaluate(hole, board))
+
+    def test_flush_boards(self):
+        # Boards with three or more of a suit, some paired.
+        rng = random.Random(2)
+        hearts = [c for c in xrange(52) if c & 3 == 2]
+        for _ in xrange(1000):
+            cards = rng.sample(hearts, 5) + rng.sample(range(52), 6)
+            cards = list(set(cards))[:9]
+            rng.shuffle(cards)
+            hole, board = cards[:4], cards[4:]
+            self.assertEquals(naive(hole, board), omaha.evaluate(hole, board))
+
+    def test_must_use_two(self):
+        # One heart in the hand is no flush, four aces on the board
+        # are only trips, and the board straight does not play.
+        C = lambda s: [c.code for c in string_to_cards(s)]
+        score = omaha.evaluate(C('ah 2c 8d 9s'), C('kh qh jh th 4c'))
+        self.assertEquals(evaluator.STRAIGHT, evaluator.category(score))
+        self.assertEquals(Straight(Rank('q')).score(), score)
+
+        score = omaha.evaluate(C('2c 3d 7s 8s'), C('ah ac ad as kh'))
+        self.assertEquals(ThreeOfAKind(Rank('a'), (Rank(8), Rank(7))).score(), score)
+
+        hand = Hand.best_from_omaha(string_to_cards('2c 3d 7s 8s'),
+                                    string_to_cards('9c th jd 4h 5s'))
+        self.assertEquals(Straight(Rank('j')), hand.classify())
+
+    def test_many(self):
+        rng = random.Random(3)
+        cards = rng.sample(range(52), 5 + 4 * 5)
+        board, holes = cards[:5], [cards[i:i + 4] for i in xrange(5, 25, 4)]
+        self.assertEquals([omaha.evaluate(hole, board) for hole in holes],
+                          omaha.evaluate_many(holes, board))
+        self.assertRaises(ValueError, omaha.evaluate_many, [cards[5:8]], board)
+
+    def test_equity(self):
+        holes = [string_to_cards('ah as kh ks'), string_to_cards('7c 8d 9c td')]
+        r = equity(holes, trials=4000, seed=1, processes=1, omaha=True)
+        self.assertEquals(4000, r.trials)
+        self.assertAlmostEquals(1.0, sum(r.equity))
+        # Aces are a small favourite in Omaha.
+        self.assertTrue(0.5 < r.equity[0] < 0.7)
+
+        r = equity(holes[:1], opponents=2, trials=1000, seed=1,
+                   processes=1, omaha=True)
+        self.assertEquals(3, len(r.equity))
+        self.assertRaises(ValueError, equity, holes, omaha=False)
+
+
+if __name__ == '__main__':
+    unittest.main()
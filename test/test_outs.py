@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2011 Björn Edström <be@bjrn.se>
+
+import unittest
+
+import pyker.evaluator as evaluator
+from pyker.equity import exact_equity
+from pyker.outs import *
+from pyker.poker import *
+
+
+def names(cards):
+    return sorted([str(CARDS[c] if isinstance(c, int) else c) for c in cards])
+
+
+class OutsTest(unittest.TestCase):
+    def test_flush_draw(self):
+        holes = [string_to_cards('ah kh'), string_to_cards('qs qd')]
+        r = analyze(holes, string_to_cards('2h 7h qc'))
+        self.assertEquals([1], r.leaders)
+        self.assertEquals(45, len(r.runouts))
+
+        # The queen of hearts makes the flush, but also quads.
+        outs = r.outs(0)
+        self.assertEquals([Flush], outs.keys())
+        self.assertEquals(names(string_to_cards('3h 4h 5h 6h 8h 9h th jh')),
+                          names(outs[Flush]))
+
+        improvements = r.improvements(1)
+        self.assertEquals(['qh'], names(improvements[FourOfAKind]))
+        self.assertEquals(6, len(improvements[FullHouse]))
+
+        for a, b in zip(exact_equity(holes, board=string_to_cards('2h 7h qc')).equity,
+                        r.equity):
+            self.assertAlmostEquals(a, b)
+
+    def test_scores(self):
+        holes = [[c.code for c in string_to_cards(s)] for s in ('ah kh', 'qs qd', '9s 8s')]
+        board = [c.code for c in string_to_cards('2h 7h qc 6s')]
+        r = analyze(holes, board)
+        for runout in r.runouts:
+            scores = [evaluator.evaluate(hole + board + [runout.card]) for hole in holes]
+            self.assertEquals(scores, runout.scores)
+            best = max(scores)
+            self.assertEquals([i for i, s in enumerate(scores) if s == best],
+                              runout.winners)
+            self.assertAlmostEquals(1.0, sum(runout.equity))
+
+        # The hole cards of every player are left out of the deck.
+        dealt = set(runout.card for runout in r.runouts)
+        self.assertEquals(52 - 6 - 4, len(dealt))
+        self.assertFalse(dealt & set(sum(holes, []) + board))
+
+        # A ten or a five gives the straight, but not in hearts.
+        self.assertEquals(names(string_to_cards('tc td ts 5c 5d 5s')),
+                          names(r.outs(2)[Straight]))
+        # The six of hearts pairs the board for a full house.
+        self.assertEquals(names(string_to_cards('3h 4h 5h 8h 9h th jh')),
+                          names(r.outs(0)[Flush]))
+        self.assertEquals([1], r.leaders)
+
+        exact = exact_equity([[CARDS[c] for c in hole] for hole in holes],
+                             board=[CARDS[c] for c in board])
+        for a, b in zip(exact.equity, r.equity):
+            self.assertAlmostEquals(a, b)
+
+    def test_errors(self):
+        holes = [string_to_cards('ah kh'), string_to_cards('qs qd')]
+        self.assertRaises(ValueError, analyze, holes, string_to_cards('2h 7h'))
+        self.assertRaises(ValueError, analyze, holes, string_to_cards('2h 7h qs'))
+        self.assertRaises(ValueError, analyze, holes, string_to_cards('2h 7h 9s'),
+                          dead=string_to_cards('2h'))
+
+
+if __name__ == '__main__':
+    unittest.main()
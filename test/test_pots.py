@@ -111,5 +111,69 @@ class PotsTest(unittest.TestCase):
         self.assertEquals(100, p.pots[0][p2])
         self.assertEquals(200, p.pots[1][p2])
 
+    def test_all_in_below_side_pot(self):
+        # A short all-in after a side pot exists ends up in the right
+        # place in the order of the pots.
+        self.p.post(self.p1, 500)
+        self.p.post(self.p3, 500)
+        p6 = PS('player6', 100)
+        self.p.post(p6, 500)
+        self.p.post(self.p4, 500)
+
+        self.assertEquals(3, len(self.p.pots))
+        self.assertEquals([True, True, False],
+                          [self.p.pots_limited[i] for i in range(3)])
+        self.assertEquals(100, self.p.pots[0][p6])
+        self.assertEquals(200, self.p.pots[1][self.p4])
+        self.assertTrue(p6 not in self.p.pots[1])
+        self.assertEquals(200, self.p.pots[2][self.p4])
+        self.assertEquals([400, 600, 400], [total for _, total in self.p.list()])
+
+    def test_add_pot(self):
+        self.p.add_pot({self.p1: 100, self.p2: 100}, limited=True)
+        self.p.post(self.p1, 300)
+        self.p.post(self.p4, 300)
+
+        self.assertEquals({self.p1: 100, self.p2: 100, self.p4: 100}, self.p.pots[0])
+        self.assertEquals({self.p1: 300, self.p4: 200}, self.p.pots[1])
+        self.assertEquals(700, self.p1.chips)
+
+    def test_settle(self):
+        self.p.post(self.p1, 500)
+        self.p.post(self.p3, 500)
+        self.p.post(self.p2, 500)
+        self.p.post(self.p4, 700)
+
+        # p3 wins the main pot, p1 and p2 split the side pot and p4
+        # gets back the uncalled part of the bet.
+        result = self.p.settle([[self.p3], [self.p1, self.p2], [self.p4]])
+        self.assertEquals([(1200, [(self.p3, 1200)]),
+                           (600, [(self.p1, 300), (self.p2, 300)]),
+                           (200, [(self.p4, 200)])], result)
+
+    def test_settle_odd_chips(self):
+        p6 = PS('player6', 0)
+        self.p.post(self.p1, 101)
+        self.p.post(self.p4, 101)
+        self.p.add_pot({p6: 100})
+
+        result = self.p.settle([[self.p4, self.p1], [p6]])
+        self.assertEquals([(302, [(self.p4, 151), (self.p1, 151)])], result)
+
+        result = self.p.settle([[self.p1, self.p4, p6]])
+        self.assertEquals([(302, [(self.p1, 101), (self.p4, 101), (p6, 100)])], result)
+
+    def test_settle_folded(self):
+        self.p.post(self.p3, 300)
+        self.p.post(self.p1, 500)
+        self.p.post(self.p4, 500)
+
+        # Everyone with a stake in the side pot has folded.
+        result = self.p.settle([[self.p3]])
+        self.assertEquals((900, [(self.p3, 900)]), result[0])
+        self.assertEquals(400, result[1][0])
+        self.assertEquals(sorted([(self.p1, 200), (self.p4, 200)]),
+                          sorted(result[1][1]))
+
 if __name__ == '__main__':
     unittest.main()
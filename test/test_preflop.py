@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2011 Björn Edström <be@bjrn.se>
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import pyker.preflop
+from pyker.poker import *
+from pyker.preflop import *
+
+
+def fake_counts(hole_a, hole_b):
+    # Stands in for the exact equity, which takes seconds per
+    # matchup: the higher hand wins every runout, and equal hands tie.
+    a = sorted([c >> 2 for c in hole_a], reverse=True)
+    b = sorted([c >> 2 for c in hole_b], reverse=True)
+    if a > b:
+        return RUNOUTS, 0
+    if a < b:
+        return 0, 0
+    return 0, RUNOUTS
+
+
+class ClassTest(unittest.TestCase):
+    def test_classes(self):
+        C = lambda s: class_index(*string_to_cards(s))
+        self.assertEquals(169, len(set(class_name(i) for i in xrange(169))))
+        for i in xrange(169):
+            self.assertEquals(i, parse_class(class_name(i)))
+        self.assertEquals('AKs', class_name(C('ah kh')))
+        self.assertEquals('AKo', class_name(C('kd ah')))
+        self.assertEquals('22', class_name(C('2c 2s')))
+        self.assertEquals(parse_class('kqo'), C('qd kc'))
+        for s in ('AAs', 'AK', 'A', 'XKs', 'AKx'):
+            self.assertRaises(ValueError, parse_class, s)
+
+    def test_matchups(self):
+        m = matchups()
+        self.assertEquals(47008, len(m))
+        self.assertEquals(1326 * 1225, sum(n for _, _, _, n in m))
+
+
+class TableTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'preflop.table')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_generate(self):
+        checkpoint = self.path + '.checkpoint'
+        left = generate(self.path, limit=1000, compute=fake_counts)
+        self.assertEquals(47008 - 1000, left)
+        self.assertFalse(os.path.exists(self.path))
+        self.assertEquals(1000, len(read_checkpoint(checkpoint)))
+
+        # A partly written matchup is dropped when resuming.
+        with open(checkpoint, 'ab') as f:
+            f.write('\x01\x02')
+        self.assertEquals(0, generate(self.path, jobs=2, batch_size=1000,
+                                      compute=fake_counts))
+        self.assertFalse(os.path.exists(checkpoint))
+
+        t = PreflopTable.load(self.path)
+        self.assertEquals(47008, len(t))
+        H = lambda s: string_to_cards(s)
+        self.assertEquals((RUNOUTS, 0, 0), t.counts(H('ah kh'), H('qs qd')))
+        self.assertEquals((0, RUNOUTS, 0), t.counts(H('qs qd'), H('ah kh')))
+        self.assertEquals(0.5, t.equity(H('ah kh'), H('as kd')))
+        self.assertEquals(1.0, t.equity([c.code for c in H('ad 2c')], H('kd qd')))
+        self.assertRaises(ValueError, t.counts, H('ah kh'), H('ah qd'))
+
+        # Classes average over the hole cards.
+        self.assertEquals(1.0, t.class_equity('AKs', 'QQ'))
+        self.assertEquals(0.0, t.class_equity('72o', 'A2s'))
+        self.assertAlmostEquals(0.5, t.class_equity('AKo', 'AKs'))
+
+        with open(self.path, 'r+b') as f:
+            f.seek(100)
+            f.write('x')
+        self.assertRaises(ValueError, PreflopTable.load, self.path)
+
+
+class ShippedTableTest(unittest.TestCase):
+    def test_shipped(self):
+        t = PreflopTable.load(os.path.join(os.path.dirname(pyker.preflop.__file__),
+                                           'preflop.table'))
+        self.assertEquals(47008, len(t))
+        H = lambda s: string_to_cards(s)
+        self.assertEquals((1410336, RUNOUTS - 1410336 - 9308, 9308),
+                          t.counts(H('ah ad'), H('kh kd')))
+        self.assertEquals((1124180, RUNOUTS - 1124180 - 10327, 10327),
+                          t.counts(H('as ks'), H('qs js')))
+        self.assertAlmostEquals(0.82, t.class_equity('AA', 'KK'), 2)
+        self.assertAlmostEquals(1.0, t.class_equity('AA', 'KK') + t.class_equity('KK', 'AA'), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
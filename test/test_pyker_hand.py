@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2011 Björn Edström <be@bjrn.se>
+
+import os
+import subprocess
+import sys
+import unittest
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, 'scripts', 'pyker-hand')
+
+
+def run(args, stdin=''):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    p = subprocess.Popen([sys.executable, SCRIPT] + args, env=env,
+                         stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                         stderr=subprocess.PIPE)
+    out, err = p.communicate(stdin)
+    return p.returncode, out, err
+
+
+class PykerHandTest(unittest.TestCase):
+    def test_classify(self):
+        code, out, err = run(['classify', 'ah kh qh jh th', '2c 2s 3d 3h jd'])
+        self.assertEquals(0, code)
+        lines = out.splitlines()
+        self.assertTrue(lines[0].endswith('Straight Flush, Ace High'))
+        self.assertTrue('Two Pair' in lines[1])
+
+    def test_classify_duplicates(self):
+        code, out, err = run(['classify', 'ah ah ah ah ah'])
+        self.assertNotEquals(0, code)
+        self.assertEquals('', out)
+        self.assertTrue('more than once' in err)
+
+        code, out, err = run(['classify', 'ah kh qh jh'])
+        self.assertNotEquals(0, code)
+        self.assertTrue('requires 5 cards' in err)
+
+    def test_best_duplicates(self):
+        code, out, err = run(['best', '-c', 'ah kd 2c 3s', 'ah 9c'])
+        self.assertNotEquals(0, code)
+        self.assertTrue('more than once' in err)
+
+    def test_stream(self):
+        lines = ['ah kh qh jh th', 'ah ah kd kd 2c', '2c 2s 3d 3h jd',
+                 'xx', 'ah kh qh jh', '7c 4s 4d th jd']
+        code, out, err = run(['--stdin', '-b', '4', 'classify'], '\n'.join(lines) + '\n')
+        self.assertEquals(0, code)
+        scores = [int(line.split('\t')[0]) for line in out.splitlines()]
+        self.assertEquals(len(lines), len(scores))
+        self.assertEquals([-1, -1, -1], [scores[1], scores[3], scores[4]])
+        self.assertTrue(scores[0] > scores[2] > scores[5] >= 0)
+        self.assertEquals(3, err.count('WARN'))
+        self.assertTrue('line 2:' in err)
+
+    def test_stream_best(self):
+        lines = ['ah kh', 'ah 2c', '2d 3c', '9s 9d']
+        code, out, err = run(['--stdin', '-f', 'jsonl', '-c', 'qh jh th 2d', 'best'],
+                             '\n'.join(lines) + '\n')
+        self.assertEquals(0, code)
+        out = out.splitlines()
+        self.assertTrue('Straight Flush' in out[0])
+        self.assertTrue('"score": -1' in out[2])
+        self.assertTrue('Pair' in out[3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2011 Björn Edström <be@bjrn.se>
+
+import random
+import unittest
+
+import pyker.equity as equity
+from pyker.poker import *
+from pyker.ranges import parse_range
+
+try:
+    import numpy
+    from pyker.rangeequity import range_equity, iter_range_equity
+except ImportError:
+    numpy = None
+
+
+@unittest.skipIf(numpy is None, 'numpy is not installed')
+class RangeEquityTest(unittest.TestCase):
+    def test_matches_exact_equity(self):
+        board = string_to_cards('ah 7s 2c 9d')
+        r = range_equity(parse_range('TT+, AKs'), parse_range('77-55, AT+'),
+                         board=board, chunk_cells=5000)
+        self.assertTrue(r.exact)
+        m = r.matrix()
+        self.assertEquals((len(r.combos_a), len(r.combos_b)), m.shape)
+
+        rng = random.Random(1)
+        for _ in xrange(10):
+            i = rng.randrange(len(r.combos_a))
+            j = rng.randrange(len(r.combos_b))
+            hole_a = [CARDS[c] for c in r.combos_a[i]]
+            hole_b = [CARDS[c] for c in r.combos_b[j]]
+            if set(hole_a) & set(hole_b):
+                self.assertTrue(numpy.isnan(m[i, j]))
+                self.assertEquals(0, r.counts[i, j])
+                continue
+            e = equity.exact_equity([hole_a, hole_b], board=board)
+            self.assertAlmostEquals(e.equity[0], m[i, j])
+
+    def test_aggregate(self):
+        board = string_to_cards('ks 8h 3d')
+        a = parse_range('QQ, AK:0.5')
+        b = parse_range('KK, 88')
+        r = range_equity(a, b, board=board)
+        ea, eb = r.equity
+        self.assertAlmostEquals(1.0, ea + eb)
+
+        # The aggregate weights every matchup by its combinations.
+        total = count = 0.0
+        for i, (wa, row) in enumerate(zip(r.weights_a, r.shares)):
+            for j, wb in enumerate(r.weights_b):
+                total += wa * wb * row[j]
+                count += wa * wb * r.counts[i, j]
+        self.assertAlmostEquals(total / count, ea)
+
+        # Blockers: the board and the dead cards are removed.
+        self.assertEquals(6 + 6 * 2, len(r.combos_a))
+        self.assertEquals(3 + 3, len(r.combos_b))
+        self.assertEquals(len(r.combos_a), len(r.combo_equity()))
+
+    def test_symmetric(self):
+        a = parse_range('99+, AQs+')
+        r = range_equity(a, a, board=string_to_cards('2c 5d 9h th'))
+        self.assertAlmostEquals(0.5, r.equity[0])
+        m = r.matrix()
+        done = ~numpy.isnan(m)
+        self.assertTrue(numpy.allclose(m[done], 1.0 - m.T[done]))
+
+    def test_sampled(self):
+        r = range_equity(parse_range('AA'), parse_range('KK'), samples=3000,
+                         rng=random.Random(2))
+        self.assertFalse(r.exact)
+        self.assertTrue(0.79 < r.equity[0] < 0.85, r.equity)
+
+    def test_streaming(self):
+        board = string_to_cards('ah 7s 2c')
+        steps = list(iter_range_equity(parse_range('AK'), parse_range('77'),
+                                       board=board, chunk_cells=2000))
+        self.assertTrue(len(steps) > 1)
+        self.assertEquals(49 * 48 / 2, steps[-1][1])
+
+    def test_chunk_bounded(self):
+        # One combination against six: the chunks are bounded by the
+        # combinations scored per runout, not only by the pairs.
+        steps = list(iter_range_equity(parse_range('AhKh'), parse_range('QQ'),
+                                       samples=200000, rng=random.Random(1)))
+        done = [0] + [n for _, n in steps]
+        self.assertEquals(200000, done[-1])
+        self.assertTrue(max(b - a for a, b in zip(done, done[1:])) <= 150000)
+        self.assertEquals(1, steps[-1][0].counts.shape[0])
+
+    def test_errors(self):
+        board = string_to_cards('ah ad 2c')
+        self.assertRaises(ValueError, range_equity, parse_range('AA'),
+                          parse_range('KK'), board=board + [CARDS[51]])
+        self.assertRaises(ValueError, range_equity, parse_range('AA'),
+                          parse_range('KK'), board=board, dead=board[:1])
+
+
+if __name__ == '__main__':
+    unittest.main()
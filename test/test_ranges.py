@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2011 Björn Edström <be@bjrn.se>
+
+import random
+import unittest
+
+import pyker.ranges
+from pyker.poker import *
+from pyker.ranges import *
+
+
+class ParseTest(unittest.TestCase):
+    def test_sizes(self):
+        N = lambda s: len(parse_range(s))
+
+        self.assertEquals(6, N('AA'))
+        self.assertEquals(30, N('TT+'))
+        self.assertEquals(24, N('TT-77'))
+        self.assertEquals(78, N('22+'))
+        self.assertEquals(4, N('AKs'))
+        self.assertEquals(12, N('AKo'))
+        self.assertEquals(16, N('AK'))
+        self.assertEquals(16, N('ATs+'))
+        self.assertEquals(16, N('A5s-A2s'))
+        self.assertEquals(12, N('76s-54s'))
+        self.assertEquals(1, N('AhKh'))
+        self.assertEquals(58, N('TT+, AKs, KQo, 76s-54s'))
+        self.assertEquals(COMBOS, N('22+, A2+, K2+, Q2+, J2+, T2+, 92+, 82+, 72+, 62+, 52+, 42+, 32'))
+
+    def test_combos(self):
+        r = parse_range('76s-54s')
+        hands = set()
+        for a, b, weight in r.combos():
+            a, b = card_from_code(a), card_from_code(b)
+            self.assertEquals(a.suit, b.suit)
+            self.assertEquals(1, abs(a.rank.rank - b.rank.rank))
+            self.assertEquals(1.0, weight)
+            hands.add(max(a.rank, b.rank))
+        self.assertEquals(set([Rank(5), Rank(6), Rank(7)]), hands)
+
+        self.assertTrue(string_to_cards('7h 6h') in r)
+        self.assertFalse(string_to_cards('7h 6s') in r)
+
+    def test_weights(self):
+        r = parse_range('AK:0.5, AKs')
+        ah, kh, ks = string_to_cards('ah kh ks')
+        self.assertEquals(1.0, r.weight(ah, kh))
+        self.assertEquals(0.5, r.weight(ah, ks))
+        self.assertEquals(4 + 12 * 0.5, r.total())
+
+    def test_errors(self):
+        for s in ('AAs', 'AKx', 'A', '1K', 'TT-AKs', 'AKs-QJo', 'AK:2', 'AK:x', 'AhAh', 'AKs-72s'):
+            self.assertRaises(ValueError, parse_range, s)
+
+
+class OperationsTest(unittest.TestCase):
+    def test_remove(self):
+        r = parse_range('TT+, AKs, KQo, 76s-54s')
+        board = string_to_cards('ah 7s 2c')
+        left = r.remove(board)
+        self.assertEquals(53, len(left))
+        for a, b, _ in left.combos():
+            self.assertFalse(set([a, b]) & set(c.code for c in board))
+        self.assertEquals(58, len(r))
+
+    def test_remove_without_numpy(self):
+        r = parse_range('22+, A2+:0.5, K9s+')
+        cards = range(0, 52, 3)
+        fast = r.remove(cards)
+        saved, pyker.ranges.numpy = pyker.ranges.numpy, None
+        try:
+            slow = r.remove(cards)
+        finally:
+            pyker.ranges.numpy = saved
+        self.assertEquals(list(slow.weights), list(fast.weights))
+        self.assertEquals(parse_range('22+, A2+:0.5, K9s+').weights, r.weights)
+        self.assertEquals(r.weights, r.remove([]).weights)
+
+    def test_set_operations(self):
+        a = parse_range('TT+, AKs')
+        b = parse_range('QQ+:0.5, AK, 22')
+        self.assertEquals(len(parse_range('TT+, AK, 22')), len(a | b))
+        self.assertEquals(len(parse_range('QQ+, AKs')), len(a & b))
+        self.assertEquals(len(parse_range('TT-JJ')), len(a - b))
+
+        ah, ad, kh = string_to_cards('ah ad kh')
+        self.assertEquals(1.0, (a | b).weight(ah, ad))
+        self.assertEquals(0.5, (a & b).weight(ah, ad))
+        self.assertEquals(1.0, (a & b).weight(ah, kh))
+
+        self.assertEquals(a, HandRange.from_bits(a.bits))
+        self.assertEquals(0, len(a & parse_range('72o')))
+
+    def test_sample(self):
+        rng = random.Random(1)
+        r = parse_range('AA, KK:0.5')
+        counts = {}
+        for _ in xrange(3000):
+            a, b = r.sample(rng)
+            rank = card_from_code(a).rank
+            self.assertEquals(rank, card_from_code(b).rank)
+            counts[rank] = counts.get(rank, 0) + 1
+        self.assertTrue(1800 < counts[Rank('a')] < 2200, counts)
+
+        # Dead cards are never drawn.
+        dead = [c.code for c in string_to_cards('as ah ad')]
+        for _ in xrange(200):
+            a, b = r.sample(rng, dead)
+            self.assertEquals(Rank('k'), card_from_code(a).rank)
+
+        dead = [c.code for c in string_to_cards('as ah ad ks kh kd')]
+        self.assertRaises(ValueError, r.sample, rng, dead)
+        self.assertRaises(ValueError, HandRange().sample, rng)
+
+
+if __name__ == '__main__':
+    unittest.main()
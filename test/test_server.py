@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2011 Björn Edström <be@bjrn.se>
+
+import json
+import random
+import socket
+import time
+import unittest
+
+from pyker.server import *
+
+
+def run_until(server, done, limit=20.0):
+    end = time.time() + limit
+    while not done() and time.time() < end:
+        server.run_once(0.001)
+    return done()
+
+
+class Silent(object):
+    def __init__(self):
+        self.events = []
+
+    def on_message(self, conn, line):
+        self.events.append(json.loads(line))
+
+
+class LocalServerTest(unittest.TestCase):
+    def setUp(self):
+        random.seed(1)
+        self.transport = LocalTransport()
+        self.server = Server(self.transport)
+
+    def test_many_tables(self):
+        runners = []
+        for t in xrange(20):
+            name = 't%d' % t
+            runners.append(self.server.add_table(name, seats=4, hands=5,
+                                                 rng=random.Random(t)))
+            for seat in xrange(4):
+                bot = BotClient(random.Random(t * 10 + seat))
+                bot.join(self.transport.connect(bot), name, seat)
+
+        # Tables stop after 5 hands, or when one player has all chips.
+        self.assertTrue(run_until(self.server, lambda: all(r.hands and not r.running for r in runners)))
+        for runner in runners:
+            self.assertEquals(4000, sum(ps.chips for ps in runner.seats))
+            self.assertTrue(runner.hands == 5 or
+                            len([ps for ps in runner.seats if ps.chips]) == 1)
+        self.assertTrue(self.server.latency.count > 100)
+        summary = self.server.latency.summary()
+        self.assertTrue(summary['p50'] <= summary['p99'] <= summary['max'])
+
+    def test_injected_clock(self):
+        ticks = iter(xrange(1000000))
+        self.server = Server(self.transport, clock=lambda: ticks.next() * 0.001)
+        runner = self.server.add_table('t', seats=2, hands=3, rng=random.Random(1))
+        for seat in xrange(2):
+            bot = BotClient(random.Random(seat))
+            bot.join(self.transport.connect(bot), 't', seat)
+        self.assertTrue(run_until(self.server, lambda: runner.hands and not runner.running))
+        # Replies are timestamped with the same clock as the latency.
+        self.assertTrue(self.server.latency.count > 0)
+        self.assertTrue(0.0 <= min(self.server.latency.samples))
+        self.assertTrue(self.server.latency.max < 1.0)
+
+    def test_timeout(self):
+        runner = self.server.add_table('t', seats=2, hands=3, action_timeout=0.01)
+        bot = BotClient(random.Random(1))
+        bot.join(self.transport.connect(bot), 't', 0)
+        silent = Silent()
+        conn = self.transport.connect(silent)
+        conn.reply({'op': 'join', 'table': 't', 'seat': 1, 'name': 'silent'})
+
+        self.assertTrue(run_until(self.server, lambda: runner.hands == 3))
+        events = [m.get('event') for m in silent.events]
+        self.assertTrue('timeout' in events)
+        # Hole cards are only sent to their owner.
+        holes = [m['args'] for m in silent.events if m.get('event') == 'hole']
+        self.assertTrue([1, 2] == map(len, holes[:2]) or [2, 1] == map(len, holes[:2]))
+
+    def test_slow_client(self):
+        self.transport.max_buffer = 2000
+        slow = Silent()
+        slow_conn = self.transport.connect(slow)
+        slow_conn.paused = True
+        runners = []
+        for name in ('a', 'b'):
+            runners.append(self.server.add_table(name, seats=2, hands=20, action_timeout=0.01))
+            bot = BotClient(random.Random(2))
+            bot.join(self.transport.connect(bot), name, 0)
+        slow_conn.reply({'op': 'join', 'table': 'a', 'seat': 1, 'name': 'slow'})
+        bot = BotClient(random.Random(3))
+        bot.join(self.transport.connect(bot), 'b', 1)
+
+        # The slow client is dropped and times out instead of holding
+        # up the tables.
+        self.assertTrue(run_until(self.server, lambda: all(r.hands == 20 for r in runners)))
+        self.assertTrue(slow_conn.closed)
+        self.assertEquals({}, dict((s, c) for s, c in runners[0].conns.items() if c is slow_conn))
+
+    def test_game_error_stops_one_table(self):
+        runners = []
+        watchers = []
+        for name in ('a', 'b'):
+            runners.append(self.server.add_table(name, seats=2, hands=5,
+                                                 rng=random.Random(1)))
+            watcher = Silent()
+            watchers.append(watcher)
+            self.transport.connect(watcher).reply({'op': 'join', 'table': name,
+                                                   'seat': 0, 'name': 'w'})
+            bot = BotClient(random.Random(2))
+            bot.join(self.transport.connect(bot), name, 1)
+
+        def broken():
+            raise GameError('broken deck')
+        runners[0].game._state_deal_flop = broken
+
+        # Table b plays on, table a stops with an error to its players.
+        # The silent watchers time out and fold or check.
+        runners[0].action_timeout = runners[1].action_timeout = 0.001
+        self.assertTrue(run_until(self.server, lambda: runners[1].hands == 5 and
+                                  not runners[1].running))
+        self.assertFalse(runners[0].running)
+        self.assertEquals('broken deck', runners[0].error)
+        self.assertTrue({'table': 'a', 'error': 'broken deck'} in watchers[0].events)
+        self.assertFalse(any('error' in m for m in watchers[1].events))
+
+        conn = self.transport.connect(watchers[0])
+        conn.reply({'op': 'join', 'table': 'a', 'seat': 0, 'name': 'w'})
+        run_until(self.server, lambda: 'stopped' in str(watchers[0].events[-1]), 1.0)
+        self.assertTrue('stopped' in watchers[0].events[-1]['error'])
+
+    def test_errors(self):
+        self.server.add_table('t', seats=2)
+        client = Silent()
+        conn = self.transport.connect(client)
+        conn.reply({'op': 'join', 'table': 'nope', 'seat': 0})
+        conn.reply({'op': 'join', 'table': 't', 'seat': 7})
+        conn.reply({'op': 'act', 'table': 't', 'action': 'call'})
+        self.transport.inbox.append((conn, 'not json\n', time.time()))
+        for _ in xrange(5):
+            self.server.run_once(0)
+        self.assertEquals(4, len([m for m in client.events if 'error' in m]))
+
+    def test_invalid_amounts(self):
+        runner = self.server.add_table('t', seats=2, hands=1, action_timeout=60)
+        clients = [Silent(), Silent()]
+        conns = []
+        for seat, client in enumerate(clients):
+            conn = self.transport.connect(client)
+            conn.reply({'op': 'join', 'table': 't', 'seat': seat, 'name': 'p%d' % seat})
+            conns.append(conn)
+
+        def to_act():
+            for seat, client in enumerate(clients):
+                for m in client.events:
+                    if m.get('event') == 'act' and m['args'][0] == seat:
+                        return seat, m['args']
+        self.assertTrue(run_until(self.server, lambda: to_act() is not None))
+        seat, (_, options, _, chips, to_call, _) = to_act()
+        name = 'raise' if 'raise' in options else 'bet'
+        bets = dict(runner.game.bets)
+        contributions = dict(runner.game.pots.contrib)
+
+        # Negative, zero and (for a raise) no more than a call are
+        # refused, and nothing is posted.
+        for amount in (-500, 0, to_call):
+            conns[seat].reply({'op': 'act', 'table': 't', 'action': name, 'chips': amount})
+        for _ in xrange(5):
+            self.server.run_once(0)
+        self.assertEquals(3, len([m for m in clients[seat].events if 'error' in m]))
+        self.assertEquals(bets, runner.game.bets)
+        self.assertEquals(contributions, runner.game.pots.contrib)
+        self.assertTrue(runner.game.pending is not None)
+
+
+class TCPServerTest(unittest.TestCase):
+    def test_play(self):
+        transport = TCPTransport()
+        server = Server(transport)
+        runner = server.add_table('t', seats=2, hands=2, rng=random.Random(1))
+
+        clients = []
+        for seat in xrange(2):
+            sock = socket.create_connection(transport.address)
+            sock.setblocking(0)
+            sock.sendall(json.dumps({'op': 'join', 'table': 't', 'seat': seat,
+                                     'name': 'p%d' % seat}) + '\n')
+            clients.append([sock, ''])
+
+        events = []
+        def step():
+            for seat, client in enumerate(clients):
+                sock, buf = client
+                try:
+                    buf += sock.recv(65536)
+                except socket.error:
+                    pass
+                lines = buf.split('\n')
+                client[1] = lines.pop()
+                for line in lines:
+                    msg = json.loads(line)
+                    events.append(msg['event'])
+                    if msg['event'] == 'act' and msg['args'][0] == seat:
+                        action = 'check' if 'check' in msg['args'][1] else 'call'
+                        sock.sendall(json.dumps({'op': 'act', 'table': 't',
+                                                 'action': action}) + '\n')
+            return runner.hands == 2
+
+        self.assertTrue(run_until(server, step))
+        self.assertTrue('river' in events and 'won' in events)
+        self.assertFalse('timeout' in events)
+        self.assertEquals(2000, sum(ps.chips for ps in runner.seats))
+
+        for sock, _ in clients:
+            sock.close()
+        run_until(server, lambda: not runner.conns, 5.0)
+        self.assertEquals({}, runner.conns)
+        transport.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2011 Björn Edström <be@bjrn.se>
+
+import json
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from pyker.game import *
+from pyker.sim import *
+from pyker.stats import *
+
+
+class Clock(object):
+    # A clock that advances a millisecond per reading.
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        self.now += 0.001
+        return self.now
+
+
+class GameStatsTest(unittest.TestCase):
+    def setUp(self):
+        self.table = Table(4)
+        self.players = []
+        self.strategies = {}
+        for i in xrange(4):
+            ps = PlayerState(Player('p%d' % i), 1000)
+            self.table.join(i, ps)
+            self.players.append(ps)
+            self.strategies[ps] = self.counted(random_strategy(random.Random(i)))
+        self.actions = 0
+
+    def counted(self, strategy):
+        def f(game, ps, options):
+            self.actions += 1
+            return strategy(game, ps, options)
+        return f
+
+    def play(self, stats, hands):
+        game = Game(self.table, GameRules(), sink=None,
+                    rng=random.Random(1), stats=stats)
+        game.set_blinds(20, 10)
+        return play(game, self.strategies, hands)
+
+    def test_counters(self):
+        stats = GameStats(clock=Clock())
+        played = self.play(stats, 200)
+        c = stats.counters
+        self.assertEquals(played, c['hands'])
+        self.assertTrue(c['pots'] >= played)
+        self.assertTrue(c['all-ins'] > 0)
+        # Two hole cards per player, then the board card by card.
+        self.assertTrue(c['evaluator-state'] >= 2 * played)
+        self.assertTrue(c['evaluator-add-card'] > c['evaluator-score'])
+        self.assertEquals(0, c['profiled'])
+        self.assertEquals(None, stats.profile())
+
+    def test_histograms(self):
+        stats = GameStats(clock=Clock())
+        played = self.play(stats, 50)
+        self.assertEquals(set(['init', 'deal-hole', 'blinds', 'deal-flop',
+                               'deal-turn', 'deal-river', 'showdown',
+                               'betting-preflop', 'betting-flop',
+                               'betting-turn', 'betting-river']),
+                          set(stats.states))
+        for name, h in stats.states.iteritems():
+            self.assertEquals(played, h.count, name)
+            self.assertEquals(h.count, h.cumulative()[-1][1])
+        # Without betting, a transition reads the clock twice.
+        self.assertAlmostEquals(0.001 * played, stats.states['deal-flop'].sum)
+
+        self.assertEquals(self.actions, sum([h.count for h in stats.actions.values()]))
+        self.assertTrue(set(stats.actions) <= set(['check', 'call', 'bet', 'raise', 'fold']))
+
+    def test_export(self):
+        stats = GameStats()
+        self.play(stats, 20)
+        data = json.loads(json.dumps(stats.to_json()))
+        self.assertEquals(20, data['counters']['hands'])
+        self.assertEquals(20, data['states']['showdown']['count'])
+        self.assertEquals('+Inf', data['states']['showdown']['buckets'][-1][0])
+
+        text = stats.prometheus()
+        self.assertTrue('pyker_hands_total 20\n' in text)
+        self.assertTrue('pyker_state_seconds_count{state="showdown"} 20\n' in text)
+        self.assertTrue('pyker_state_seconds_bucket{state="showdown",le="+Inf"} 20\n' in text)
+
+        d = tempfile.mkdtemp()
+        try:
+            path = os.path.join(d, 'pyker.prom')
+            stats.write_prometheus(path)
+            with open(path) as f:
+                self.assertEquals(text, f.read())
+            self.assertEquals(['pyker.prom'], os.listdir(d))
+        finally:
+            shutil.rmtree(d)
+
+    def test_profile(self):
+        stats = GameStats(profile_every=5)
+        played = self.play(stats, 20)
+        self.assertEquals(20, played)
+        self.assertEquals(4, stats.counters['profiled'])
+        p = stats.profile()
+        self.assertTrue(any(func[2] == '_state_showdown' for func in p.stats))
+
+    def test_disabled(self):
+        game = Game(self.table, GameRules(), sink=None)
+        self.assertEquals(None, game.stats)
+        self.assertEquals(0, play(game, self.strategies, 0))
+
+
+class HistogramTest(unittest.TestCase):
+    def test_buckets(self):
+        h = Histogram((1.0, 2.0))
+        for v in (0.5, 1.0, 1.5, 3.0):
+            h.observe(v)
+        self.assertEquals([(1.0, 2), (2.0, 3), (float('inf'), 4)], h.cumulative())
+        self.assertEquals(6.0, h.sum)
+
+
+if __name__ == '__main__':
+    unittest.main()